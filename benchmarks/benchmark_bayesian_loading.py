@@ -0,0 +1,131 @@
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Tuple
+
+import btrack
+import numpy as np
+import skimage.io as io
+
+# we only want the timings in the output
+os.environ.setdefault("__VERBOSE", "3")
+
+from benchmark_lineages import fake_tracking_output
+from midap.tracking.bayesian_tracking import FRAME_PROPERTIES, BayesianCellTracking
+from midap.tracking.tracking_data import IMAGE_DTYPE, LABEL_DTYPE
+
+# Functions
+###########
+
+
+def write_frames(folder: Path, frames: int, n_cells: int):
+    """
+    Writes fake raw images and segmentations to a folder
+    :param folder: The folder
+    :param frames: The number of frames
+    :param n_cells: The number of cells per frame
+    :return: The lists of the image and segmentation files
+    """
+
+    inputs, _ = fake_tracking_output(n_frames=frames, n_cells=n_cells)
+    imgs, segs = [], []
+    for frame, inp in enumerate(inputs):
+        imgs.append(str(folder.joinpath(f"img_{frame:04d}.tif")))
+        segs.append(str(folder.joinpath(f"seg_{frame:04d}.tif")))
+        io.imsave(imgs[-1], inp[..., 0].astype(np.float32), check_contrast=False)
+        io.imsave(segs[-1], inp[..., 1].astype(np.uint16), check_contrast=False)
+
+    return imgs, segs
+
+
+def stacked_loading(imgs: list, segs: list):
+    """
+    Loads all frames into stacks and creates the objects from the stacks, this is how the frames were loaded before
+    :param imgs: The image files
+    :param segs: The segmentation files
+    :return: The btrack objects
+    """
+
+    tracking = BayesianCellTracking.__new__(BayesianCellTracking)
+    super(BayesianCellTracking, tracking).__init__(
+        imgs=imgs, segs=segs, model_weights=None, cache_size=1
+    )
+    raws, labels = [], []
+    for frame in range(tracking.num_time_steps):
+        r, s = tracking.load_frame(frame, label=True)
+        raws.append(r)
+        labels.append(s)
+    seg_imgs = np.array(labels, dtype=LABEL_DTYPE)
+    raw_imgs = np.array(raws, dtype=IMAGE_DTYPE)
+
+    return btrack.utils.segmentation_to_objects(
+        segmentation=seg_imgs,
+        intensity_image=raw_imgs,
+        properties=FRAME_PROPERTIES,
+        assign_class_ID=True,
+    )
+
+
+def lean_loading(imgs: list, segs: list):
+    """
+    Loads the frames frame by frame like BayesianCellTracking
+    :param imgs: The image files
+    :param segs: The segmentation files
+    :return: The btrack objects
+    """
+
+    tracking = BayesianCellTracking(
+        imgs=imgs, segs=segs, model_weights=None, cache_size=1
+    )
+    return btrack.dataio.localizations_to_objects(tracking.localizations)
+
+
+def main(frames: int, cells: Tuple[int]):
+    """
+    Benchmarks the peak memory and the time of the frame by frame loading of the Bayesian tracking against the loading
+    into full stacks
+    :param frames: The number of frames
+    :param cells: The numbers of cells per frame to benchmark
+    """
+
+    print(f"{'cells':>8} {'loading':>8} {'time [s]':>9} {'peak [MB]':>10}")
+    for n_cells in cells:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            imgs, segs = write_frames(Path(tmp_dir), frames=frames, n_cells=n_cells)
+
+            objects = []
+            for name, func in [("stacked", stacked_loading), ("lean", lean_loading)]:
+                tracemalloc.start()
+                start = time.perf_counter()
+                objects.append(func(imgs, segs))
+                t_load = time.perf_counter() - start
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+                print(f"{n_cells:>8} {name:>8} {t_load:>9.3f} {peak / 1e6:>10.1f}")
+
+            # both need to give the same objects
+            for obj_stacked, obj_lean in zip(*objects):
+                assert obj_stacked.to_dict() == obj_lean.to_dict()
+
+
+if __name__ == "__main__":
+    # arg parsing
+    parser = argparse.ArgumentParser(
+        description="Benchmark the loading of the frames of the Bayesian tracking."
+    )
+    parser.add_argument("--frames", type=int, default=20, help="The number of frames")
+    parser.add_argument(
+        "--cells",
+        type=int,
+        nargs="+",
+        default=[100, 400, 1600],
+        help="The numbers of cells per frame to benchmark",
+    )
+    args = parser.parse_args()
+
+    # call the main
+    main(**vars(args))
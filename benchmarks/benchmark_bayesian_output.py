@@ -0,0 +1,234 @@
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+# we only want the timings in the output
+os.environ.setdefault("__VERBOSE", "3")
+
+from midap.tracking.bayesian_tracking import BayesianCellTracking
+
+# Classes
+#########
+
+
+class FakeBayesianTracking(BayesianCellTracking):
+    """
+    A Bayesian tracking without data that only converts tracks
+    """
+
+    def __init__(self, n_frames: int, max_label: int):
+        """
+        Initializes the class with an empty label stack
+        :param n_frames: The number of frames
+        :param max_label: The maximum label of the segmentations
+        """
+
+        self.seg_imgs = np.zeros((n_frames, 1, max_label + 1), dtype=np.int32)
+        self.seg_imgs[:, 0] = np.arange(max_label + 1)
+
+
+# Functions
+###########
+
+
+def fake_tracks(n_tracks: int, n_frames: int, seed=42):
+    """
+    Creates fake btrack tracks with dummies, splits and parents that come after or are missing
+    :param n_tracks: The number of tracks
+    :param n_frames: The number of frames
+    :param seed: The seed for the random number generator
+    :return: A list of dicts with the keys of the btrack tracks that are used
+    """
+
+    rng = np.random.default_rng(seed)
+
+    tracks = []
+    n_children = np.zeros(n_tracks + 1, dtype=int)
+    for track_id in rng.permutation(np.arange(1, n_tracks + 1)):
+        start = rng.integers(0, n_frames - 1)
+        stop = rng.integers(start + 1, n_frames + 1)
+        steps = list(range(start, stop))
+
+        # a third of the tracks are daughters of a random track (possibly missing) with at most 2 daughters
+        parent = track_id
+        if rng.random() < 0.33:
+            candidate = rng.integers(1, n_tracks + 10)
+            if candidate != track_id and (
+                candidate > n_tracks or n_children[candidate] < 2
+            ):
+                parent = candidate
+                if candidate <= n_tracks:
+                    n_children[candidate] += 1
+
+        tracks.append(
+            {
+                "ID": int(track_id),
+                "parent": int(parent),
+                "t": steps,
+                "dummy": list(rng.random(len(steps)) < 0.05),
+                "class_id": list(rng.integers(1, 100, size=len(steps)).astype(float)),
+            }
+        )
+
+    return tracks
+
+
+def loop_output(tracks: list):
+    """
+    Creates the midap data frame with a loop over all detections, this is how the data frame was created before it
+    was vectorized (without the label stack)
+    :param tracks: The tracks generated from btrack
+    :return: The midap data frame
+    """
+
+    columns = [
+        "frame",
+        "labelID",
+        "trackID",
+        "lineageID",
+        "trackID_d1",
+        "trackID_d2",
+        "split",
+        "trackID_mother",
+        "first_frame",
+        "last_frame",
+    ]
+    df = pd.DataFrame(columns=columns)
+
+    global_id = 1
+    lineage_id = 1
+    for track in tracks:
+        parent_id = None
+        steps = track["t"]
+        for i, t in enumerate(steps):
+            if track["dummy"][i]:
+                continue
+
+            df.loc[global_id, "frame"] = t
+            df.loc[global_id, "labelID"] = int(track["class_id"][i])
+            df.loc[global_id, "trackID"] = track["ID"]
+            df.loc[global_id, "first_frame"] = min(steps)
+            df.loc[global_id, "last_frame"] = max(steps)
+            df.loc[global_id, "split"] = 0
+
+            if track["parent"] != track["ID"]:
+                parent_id = track["parent"]
+                df.loc[global_id, "lineageID"] = df.loc[
+                    df["trackID"] == parent_id, "lineageID"
+                ].max()
+                df.loc[global_id, "trackID_mother"] = df.loc[
+                    df["trackID"] == parent_id, "trackID"
+                ].max()
+            else:
+                df.loc[global_id, "lineageID"] = lineage_id
+            global_id += 1
+
+        if parent_id is not None:
+            last_frame = df.loc[df["trackID"] == parent_id, "last_frame"].max()
+            df.loc[
+                (df["trackID"] == parent_id) & (df["frame"] == last_frame), "split"
+            ] = 1
+            if df.loc[(df["trackID"] == parent_id), "trackID_d1"].isna().all():
+                df.loc[(df["trackID"] == parent_id), "trackID_d1"] = track["ID"]
+            elif df.loc[(df["trackID"] == parent_id), "trackID_d2"].isna().all():
+                df.loc[(df["trackID"] == parent_id), "trackID_d2"] = track["ID"]
+            else:
+                raise ValueError(
+                    f"Cell with trackID {parent_id} splits into more than 2 cells!"
+                )
+        else:
+            lineage_id += 1
+
+    return df
+
+
+def to_csv(df: pd.DataFrame, csv_file: Path):
+    """
+    Writes the data frame like BayesianCellTracking.store_lineages
+    :param df: The data frame
+    :param csv_file: The csv file
+    :return: The content of the csv file
+    """
+
+    df.to_csv(csv_file, index=True, index_label="globalID")
+    return csv_file.read_text()
+
+
+def main(frames: int, detections: Tuple[int], loop_max=10_000, repeats=1):
+    """
+    Benchmarks the vectorized conversion of the btrack tracks to the midap data frame
+    :param frames: The number of frames
+    :param detections: The (approximate) numbers of detections to benchmark
+    :param loop_max: The maximum number of detections for which the loop is run
+    :param repeats: The number of repetitions, the best time is reported
+    """
+
+    # compile the label transformation
+    FakeBayesianTracking(n_frames=frames, max_label=100).generate_midap_output(
+        tracks=fake_tracks(n_tracks=10, n_frames=frames)
+    )
+
+    print(
+        f"{'detections':>11} {'tracks':>7} {'loop [s]':>9} {'vectorized [s]':>15} {'speedup':>8}"
+    )
+    for n_detections in detections:
+        tracks = fake_tracks(n_tracks=3 * n_detections // frames, n_frames=frames)
+        tracking = FakeBayesianTracking(n_frames=frames, max_label=100)
+
+        t_vec = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            df, _ = tracking.generate_midap_output(tracks=tracks)
+            t_vec.append(time.perf_counter() - start)
+        t_vec = np.min(t_vec)
+
+        # the loop is too slow for many detections
+        t_loop = np.nan
+        if len(df) <= loop_max:
+            start = time.perf_counter()
+            df_loop = loop_output(tracks=tracks)
+            t_loop = time.perf_counter() - start
+
+            # both versions need to write the same csv
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                assert to_csv(df, Path(tmp_dir).joinpath("vec.csv")) == to_csv(
+                    df_loop, Path(tmp_dir).joinpath("loop.csv")
+                )
+
+        print(
+            f"{len(df):>11} {len(tracks):>7} {t_loop:>9.3f} {t_vec:>15.3f} {t_loop / t_vec:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    # arg parsing
+    parser = argparse.ArgumentParser(
+        description="Benchmark the conversion of the btrack tracks to the midap data frame."
+    )
+    parser.add_argument("--frames", type=int, default=100, help="The number of frames")
+    parser.add_argument(
+        "--detections",
+        type=int,
+        nargs="+",
+        default=[1_000, 10_000, 100_000, 1_000_000],
+        help="The (approximate) numbers of detections to benchmark",
+    )
+    parser.add_argument(
+        "--loop_max",
+        type=int,
+        default=10_000,
+        help="The maximum number of detections for which the loop is run",
+    )
+    parser.add_argument(
+        "--repeats", type=int, default=1, help="Number of repetitions per setting"
+    )
+    args = parser.parse_args()
+
+    # call the main
+    main(**vars(args))
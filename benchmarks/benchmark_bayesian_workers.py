@@ -0,0 +1,81 @@
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+
+# we only want the timings in the output
+os.environ.setdefault("__VERBOSE", "3")
+
+from benchmark_bayesian_loading import write_frames
+from midap.tracking.bayesian_tracking import BayesianCellTracking
+
+# Functions
+###########
+
+
+def main(frames: int, cells: int, workers: Tuple[int], repeats=1):
+    """
+    Benchmarks the extraction of the btrack objects of the Bayesian tracking with different numbers of worker processes
+    :param frames: The number of frames
+    :param cells: The number of cells per frame
+    :param workers: The numbers of worker processes to benchmark
+    :param repeats: The number of repetitions, the best time is reported
+    """
+
+    print(f"CPUs available: {len(os.sched_getaffinity(0))}")
+    print(f"{'workers':>8} {'time [s]':>9} {'speedup':>8} {'efficiency':>11}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        imgs, segs = write_frames(Path(tmp_dir), frames=frames, n_cells=cells)
+
+        t_serial = None
+        reference = None
+        for num_workers in workers:
+            times = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                tracking = BayesianCellTracking(
+                    imgs=imgs, segs=segs, model_weights=None, num_workers=num_workers
+                )
+                times.append(time.perf_counter() - start)
+            t_workers = np.min(times)
+
+            # all numbers of workers need to give the same localizations
+            if reference is None:
+                t_serial = t_workers
+                reference = tracking.localizations
+            for key, values in reference.items():
+                assert np.array_equal(values, tracking.localizations[key])
+
+            speedup = t_serial / t_workers
+            print(
+                f"{num_workers:>8} {t_workers:>9.3f} {speedup:>8.1f} {speedup / num_workers:>11.2f}"
+            )
+
+
+if __name__ == "__main__":
+    # arg parsing
+    parser = argparse.ArgumentParser(
+        description="Benchmark the parallel object extraction of the Bayesian tracking."
+    )
+    parser.add_argument("--frames", type=int, default=64, help="The number of frames")
+    parser.add_argument(
+        "--cells", type=int, default=400, help="The number of cells per frame"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=[1, 2, 4, 8],
+        help="The numbers of worker processes to benchmark, the first is the reference",
+    )
+    parser.add_argument(
+        "--repeats", type=int, default=1, help="Number of repetitions per setting"
+    )
+    args = parser.parse_args()
+
+    # call the main
+    main(**vars(args))
@@ -0,0 +1,191 @@
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Tuple
+
+import h5py
+import numpy as np
+import pandas as pd
+from skimage.measure import regionprops
+
+# we only want the timings in the output
+os.environ.setdefault("__VERBOSE", "3")
+
+from midap.tracking.cell_props import CellProps
+
+# Functions
+###########
+
+
+def write_tracking_output(
+    folder: Path, n_frames: int, n_cells: int, cell_size=5, seed=42
+):
+    """
+    Writes a fake tracking output file and table, every cell occupies a square slot in a grid and carries a random
+    track ID, the rows of the table are shuffled
+    :param folder: The folder
+    :param n_frames: The number of frames
+    :param n_cells: The number of cells per frame
+    :param cell_size: The size of the square cells in pixels
+    :param seed: The seed for the random number generator
+    :return: The data file and the csv file
+    """
+
+    rng = np.random.default_rng(seed)
+
+    # we create a grid with twice as many slots as cells
+    slot = cell_size + 2
+    n_rows = int(np.ceil(np.sqrt(2 * n_cells)))
+    shape = (n_rows * slot, n_rows * slot)
+
+    labels = np.zeros((n_frames,) + shape, dtype=np.int32)
+    frames, track_ids = [], []
+    for frame in range(n_frames):
+        slots = rng.choice(n_rows * n_rows, size=n_cells, replace=False)
+        ids = rng.choice(np.arange(1, 5 * n_cells), size=n_cells, replace=False)
+        for s, track_id in zip(slots, ids):
+            row, col = slot * (s // n_rows) + 1, slot * (s % n_rows) + 1
+            labels[frame, row : row + cell_size, col : col + cell_size] = track_id
+        frames.append(np.full(n_cells, frame))
+        track_ids.append(ids)
+
+    data_file = folder.joinpath("tracking.h5")
+    with h5py.File(data_file, "w") as f:
+        f.create_dataset("labels", data=labels)
+        f.create_dataset(
+            "images", data=rng.random(labels.shape, dtype=np.float32), dtype=np.float32
+        )
+
+    csv_file = folder.joinpath("track_output.csv")
+    df = pd.DataFrame(
+        {"frame": np.concatenate(frames), "trackID": np.concatenate(track_ids)}
+    )
+    df = df.sample(frac=1.0, random_state=seed).reset_index(drop=True)
+    df.to_csv(csv_file, index=True, index_label="globalID")
+
+    return data_file, csv_file
+
+
+def loop_add_cell_probs(data_file: Path, csv_file: Path, out_file: Path):
+    """
+    Adds the cell properties with a loop over all cells of all frames that scans the table for every property, this is
+    how the properties were added before they were vectorized
+    :param data_file: The tracking output file
+    :param csv_file: The tracking table
+    :param out_file: The CSV output file
+    """
+
+    df = pd.read_csv(csv_file)
+    new_cols = [
+        "area",
+        "edges_min_row",
+        "edges_min_col",
+        "edges_max_row",
+        "edges_max_col",
+        "intensity_max",
+        "intensity_mean",
+        "intensity_min",
+        "minor_axis_length",
+        "major_axis_length",
+    ]
+    for new_col in new_cols:
+        df[new_col] = np.nan
+
+    with h5py.File(data_file, "r") as f:
+        for frame_num, (l, i) in enumerate(zip(f["labels"], f["images"])):
+            for prop in regionprops(l, intensity_image=i):
+                mask = (df["frame"] == frame_num) & (df["trackID"] == prop.label)
+                assert np.sum(mask) == 1
+                df.loc[mask, "x"] = prop.centroid[0]
+                df.loc[mask, "y"] = prop.centroid[1]
+                min_row, min_col, max_row, max_col = prop.bbox
+                df.loc[mask, "edges_min_row"] = min_row
+                df.loc[mask, "edges_min_col"] = min_col
+                df.loc[mask, "edges_max_row"] = max_row
+                df.loc[mask, "edges_max_col"] = max_col
+                df.loc[mask, "area"] = prop.area
+                df.loc[mask, "intensity_max"] = prop.intensity_max
+                df.loc[mask, "intensity_mean"] = prop.intensity_mean
+                df.loc[mask, "intensity_min"] = prop.intensity_min
+                df.loc[mask, "minor_axis_length"] = prop.minor_axis_length
+                df.loc[mask, "major_axis_length"] = prop.major_axis_length
+
+    df.to_csv(out_file, index=True)
+
+
+def main(frames: Tuple[int], cells: Tuple[int], loop_max=20_000):
+    """
+    Benchmarks the vectorized cell properties against a loop over all cells, the time per cell of the vectorized
+    version should stay constant
+    :param frames: The numbers of frames to benchmark
+    :param cells: The numbers of cells per frame to benchmark
+    :param loop_max: The maximum number of cells (over all frames) for which the loop is run
+    """
+
+    print(
+        f"{'frames':>7} {'cells':>6} {'total':>8} {'loop [s]':>9} {'vectorized [s]':>15} "
+        f"{'us/cell':>8} {'speedup':>8}"
+    )
+    for n_frames in frames:
+        for n_cells in cells:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                data_file, csv_file = write_tracking_output(
+                    Path(tmp_dir), n_frames=n_frames, n_cells=n_cells
+                )
+                vec_file = Path(tmp_dir).joinpath("vec.csv")
+                loop_file = Path(tmp_dir).joinpath("loop.csv")
+
+                start = time.perf_counter()
+                CellProps(data_file=data_file, csv_file=csv_file).add_cell_probs(
+                    vec_file
+                )
+                t_vec = time.perf_counter() - start
+
+                # the loop is too slow for many cells
+                n_total = n_frames * n_cells
+                t_loop = np.nan
+                if n_total <= loop_max:
+                    start = time.perf_counter()
+                    loop_add_cell_probs(data_file, csv_file, loop_file)
+                    t_loop = time.perf_counter() - start
+
+                    # both versions need to write the same csv
+                    assert vec_file.read_text() == loop_file.read_text()
+
+                print(
+                    f"{n_frames:>7} {n_cells:>6} {n_total:>8} {t_loop:>9.3f} {t_vec:>15.3f} "
+                    f"{1e6 * t_vec / n_total:>8.1f} {t_loop / t_vec:>8.1f}"
+                )
+
+
+if __name__ == "__main__":
+    # arg parsing
+    parser = argparse.ArgumentParser(
+        description="Benchmark the cell properties added to the tracking table."
+    )
+    parser.add_argument(
+        "--frames",
+        type=int,
+        nargs="+",
+        default=[10, 40],
+        help="The numbers of frames to benchmark",
+    )
+    parser.add_argument(
+        "--cells",
+        type=int,
+        nargs="+",
+        default=[100, 400, 1600],
+        help="The numbers of cells per frame to benchmark",
+    )
+    parser.add_argument(
+        "--loop_max",
+        type=int,
+        default=20_000,
+        help="The maximum number of cells (over all frames) for which the loop is run",
+    )
+    args = parser.parse_args()
+
+    # call the main
+    main(**vars(args))
@@ -0,0 +1,187 @@
+import argparse
+import os
+import time
+from typing import Tuple
+
+import numpy as np
+from skimage.measure import label, regionprops
+
+# we only want the timings in the output
+os.environ.setdefault("__VERBOSE", "3")
+
+from benchmark_lineages import fake_tracking_output
+from midap.tracking.base_tracking import DeltaTypeTracking
+from midap.tracking.tracking_data import IMAGE_DTYPE
+
+# Classes
+#########
+
+
+class FakeTracking(DeltaTypeTracking):
+    """
+    A tracking class without data and model that is only used to crop
+    """
+
+    def __init__(self, input_size: Tuple[int, int, int]):
+        """
+        Initializes the class
+        :param input_size: The input size of the network
+        """
+
+        super().__init__(imgs=[], segs=[], model_weights=None, input_size=input_size)
+
+    def load_model(self):
+        """
+        There is no model
+        """
+        pass
+
+
+# Functions
+###########
+
+
+def prepare_frame(tracking: DeltaTypeTracking, n_cells: int):
+    """
+    Creates a frame and everything that is needed to crop it
+    :param tracking: The tracking instance
+    :param n_cells: The number of cells in the frame
+    :return: A dict with the images, the labels and the cell properties of both frames and the stacked frame
+    """
+
+    inputs, _ = fake_tracking_output(n_frames=2, n_cells=n_cells)
+    img_prev, lab_prev, img_cur, seg_cur = np.moveaxis(inputs[0], -1, 0)
+    label_prev = label(lab_prev > 0, connectivity=1)
+    label_cur = label(seg_cur > 0, connectivity=1)
+
+    return {
+        "img_prev": img_prev,
+        "img_cur": img_cur,
+        "label_prev": label_prev,
+        "label_cur": label_cur,
+        "whole_frame": np.stack(
+            [img_prev, label_prev, img_cur, label_cur], axis=-1
+        ).astype(IMAGE_DTYPE),
+        "props_prev": tracking.get_label_table(label_prev),
+        "props_curr": tracking.get_label_table(label_cur),
+    }
+
+
+def loop_crops(tracking: DeltaTypeTracking, frame: dict):
+    """
+    Creates the input crops with a loop over all cells and removes the cut cells with regionprops, this is how the
+    crops were created before they were vectorized
+    :param tracking: The tracking instance
+    :param frame: The frame created with prepare_frame
+    :return: The input crops and crop boxes
+    """
+
+    img_prev, img_cur = frame["img_prev"], frame["img_cur"]
+    label_prev, label_cur = frame["label_prev"], frame["label_cur"]
+    areas = {r.label: r.area for r in regionprops(label_cur)}
+
+    n_rows, n_cols = tracking.input_size[:2]
+    num_cells = len(frame["props_prev"]["centroid"])
+    inputs = np.zeros((num_cells, n_rows, n_cols, 4), dtype=IMAGE_DTYPE)
+    crop_boxes = np.zeros((num_cells, 4), dtype=int)
+    for cell_ix, (row, col) in enumerate(frame["props_prev"]["centroid"]):
+        min_row = min(max(0, int(row - n_rows / 2)), img_cur.shape[0] - n_rows)
+        min_col = min(max(0, int(col - n_cols / 2)), img_cur.shape[1] - n_cols)
+        crop = (slice(min_row, min_row + n_rows), slice(min_col, min_col + n_cols))
+
+        # remove the cells whose area in the crop is smaller than the full area
+        seg_crop = label_cur[crop]
+        seg_clean = seg_crop.copy()
+        for r in regionprops(seg_crop):
+            if r.area != areas[r.label]:
+                seg_clean[seg_crop == r.label] = 0
+
+        inputs[cell_ix, ..., 0] = img_prev[crop]
+        inputs[cell_ix, ..., 1] = label_prev[crop] == cell_ix + 1
+        inputs[cell_ix, ..., 2] = img_cur[crop]
+        inputs[cell_ix, ..., 3] = seg_clean > 0
+        crop_boxes[cell_ix] = min_row, min_col, min_row + n_rows, min_col + n_cols
+
+    return inputs, crop_boxes
+
+
+def vectorized_crops(tracking: DeltaTypeTracking, frame: dict):
+    """
+    Creates the input crops with a single gather like DeltaTypeTracking.gen_input_crop
+    :param tracking: The tracking instance
+    :param frame: The frame created with prepare_frame
+    :return: The input crops and crop boxes
+    """
+
+    crop_boxes = tracking.get_crop_boxes(
+        centroids=frame["props_prev"]["centroid"],
+        frame_shape=frame["label_cur"].shape,
+    )
+    inputs = np.ascontiguousarray(
+        tracking.extract_crops(frame["whole_frame"], crop_boxes=crop_boxes)
+    )
+    inputs[..., 1] = inputs[..., 1] == np.arange(1, len(inputs) + 1).reshape(-1, 1, 1)
+    inputs[..., 3] = tracking.clean_crop(
+        bboxes=frame["props_curr"]["bbox"],
+        seg_crops=tracking.extract_crops(frame["label_cur"], crop_boxes=crop_boxes),
+        crop_boxes=crop_boxes,
+    )
+
+    return inputs, crop_boxes
+
+
+def main(cells: Tuple[int], input_size=64, repeats=3):
+    """
+    Benchmarks the vectorized crop extraction of the tracking inputs against a loop over all cells
+    :param cells: The numbers of cells per frame to benchmark
+    :param input_size: The size of the crops
+    :param repeats: The number of repetitions, the best time is reported
+    """
+
+    tracking = FakeTracking(input_size=(input_size, input_size, 4))
+
+    print(f"{'cells':>8} {'loop [s]':>10} {'vectorized [s]':>15} {'speedup':>8}")
+    for n_cells in cells:
+        frame = prepare_frame(tracking=tracking, n_cells=n_cells)
+
+        times = []
+        outputs = []
+        for func in [loop_crops, vectorized_crops]:
+            t = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                out = func(tracking, frame)
+                t.append(time.perf_counter() - start)
+            times.append(np.min(t))
+            outputs.append(out)
+
+        # both versions need to create the same input
+        for loop_out, vec_out in zip(*outputs):
+            assert np.array_equal(loop_out, vec_out)
+        print(
+            f"{n_cells:>8} {times[0]:>10.3f} {times[1]:>15.3f} {times[0] / times[1]:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    # arg parsing
+    parser = argparse.ArgumentParser(
+        description="Benchmark the crop extraction of the delta type tracking."
+    )
+    parser.add_argument(
+        "--cells",
+        type=int,
+        nargs="+",
+        default=[100, 400, 1600, 6400],
+        help="The numbers of cells per frame to benchmark",
+    )
+    parser.add_argument(
+        "--input_size", type=int, default=64, help="The size of the crops"
+    )
+    parser.add_argument(
+        "--repeats", type=int, default=3, help="Number of repetitions per setting"
+    )
+    args = parser.parse_args()
+
+    # call the main
+    main(**vars(args))
@@ -0,0 +1,118 @@
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Tuple
+
+import h5py
+import numpy as np
+
+# we only want the timings in the output
+os.environ.setdefault("__VERBOSE", "3")
+
+from benchmark_lineages import fake_tracking_output
+from midap.tracking.delta_lineage import DeltaTypeLineages
+from midap.tracking.tracking_data import (
+    FRAME_LABEL_DTYPE,
+    IMAGE_DTYPE,
+    LABEL_DTYPE,
+    load_tracking_data,
+)
+
+# the dtypes of the inputs, results, images and labels
+DTYPES = {
+    "float64": (np.float64, np.float64, np.float64, np.int64),
+    "compact": (IMAGE_DTYPE, FRAME_LABEL_DTYPE, IMAGE_DTYPE, LABEL_DTYPE),
+}
+
+# Functions
+###########
+
+
+def best_time(func, repeats: int):
+    """
+    Times a function
+    :param func: The function to time, called without arguments
+    :param repeats: The number of repetitions
+    :return: The best time in seconds
+    """
+
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return np.min(times)
+
+
+def main(frames: int, cells: Tuple[int], repeats=3):
+    """
+    Benchmarks the memory and throughput of the tracking intermediates and outputs with the float64 dtypes of older
+    versions and the current compact dtypes
+    :param frames: The number of frames
+    :param cells: The numbers of cells per frame to benchmark
+    :param repeats: The number of repetitions, the best time is reported
+    """
+
+    print(
+        f"{'cells':>8} {'dtypes':>8} {'memory [MB]':>12} {'lineages [s]':>13} {'file [MB]':>10} "
+        f"{'write [s]':>10} {'read [s]':>9}"
+    )
+    for n_cells in cells:
+        inputs, results = fake_tracking_output(n_frames=frames, n_cells=n_cells)
+        for name, dtypes in DTYPES.items():
+            input_dtype, result_dtype, image_dtype, label_dtype = dtypes
+            inp = inputs.astype(input_dtype)
+            res = results.astype(result_dtype)
+            memory = (inp.nbytes + res.nbytes) / 1e6
+
+            # the lineage generation reads the intermediates
+            t_lin = best_time(
+                lambda: DeltaTypeLineages(inputs=inp, results=res, connectivity=1),
+                repeats=repeats,
+            )
+
+            # the output file
+            images = np.concatenate([inp[..., 0], inp[-1:, ..., 2]]).astype(image_dtype)
+            labels = np.concatenate([inp[..., 1], inp[-1:, ..., 1]]).astype(label_dtype)
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                data_file = Path(tmp_dir).joinpath("tracking_delta.h5")
+
+                def write():
+                    with h5py.File(data_file, "w") as hf:
+                        hf.create_dataset("images", data=images)
+                        hf.create_dataset("labels", data=labels)
+
+                t_write = best_time(write, repeats=repeats)
+                t_read = best_time(
+                    lambda: load_tracking_data(data_file), repeats=repeats
+                )
+                file_size = data_file.stat().st_size / 1e6
+
+            print(
+                f"{n_cells:>8} {name:>8} {memory:>12.1f} {t_lin:>13.3f} {file_size:>10.1f} "
+                f"{t_write:>10.3f} {t_read:>9.3f}"
+            )
+
+
+if __name__ == "__main__":
+    # arg parsing
+    parser = argparse.ArgumentParser(
+        description="Benchmark the float64 and the compact dtypes of the tracking intermediates and outputs."
+    )
+    parser.add_argument("--frames", type=int, default=20, help="The number of frames")
+    parser.add_argument(
+        "--cells",
+        type=int,
+        nargs="+",
+        default=[100, 400, 1600],
+        help="The numbers of cells per frame to benchmark",
+    )
+    parser.add_argument(
+        "--repeats", type=int, default=3, help="Number of repetitions per setting"
+    )
+    args = parser.parse_args()
+
+    # call the main
+    main(**vars(args))
@@ -0,0 +1,164 @@
+import argparse
+import os
+import time
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+from skimage.measure import regionprops_table
+
+# we only want the timings in the output
+os.environ.setdefault("__VERBOSE", "3")
+
+from midap.tracking.tracking_analysis import FluoChangeAnalysis
+
+# Functions
+###########
+
+
+def fake_analysis(
+    n_frames: int, n_cells: int, n_channels: int, cell_size=5, seed=42
+) -> Tuple[FluoChangeAnalysis, pd.DataFrame]:
+    """
+    Creates a fluorescence analysis with fake images, every cell occupies a square slot in a grid and carries a random
+    track ID, the rows of the table are shuffled
+    :param n_frames: The number of frames
+    :param n_cells: The number of cells per frame
+    :param n_channels: The number of fluorescence channels
+    :param cell_size: The size of the square cells in pixels
+    :param seed: The seed for the random number generator
+    :return: The analysis with the loaded images and the output data frame
+    """
+
+    rng = np.random.default_rng(seed)
+
+    # we create a grid with twice as many slots as cells
+    slot = cell_size + 2
+    n_rows = int(np.ceil(np.sqrt(2 * n_cells)))
+    shape = (n_rows * slot, n_rows * slot)
+
+    labels = np.zeros((n_frames,) + shape, dtype=np.int32)
+    frames, track_ids = [], []
+    for frame in range(n_frames):
+        slots = rng.choice(n_rows * n_rows, size=n_cells, replace=False)
+        ids = rng.choice(np.arange(1, 5 * n_cells), size=n_cells, replace=False)
+        for s, track_id in zip(slots, ids):
+            row, col = slot * (s // n_rows) + 1, slot * (s % n_rows) + 1
+            labels[frame, row : row + cell_size, col : col + cell_size] = track_id
+        frames.append(np.full(n_cells, frame))
+        track_ids.append(ids)
+
+    channels = ["ph"] + [f"fluo_{c}" for c in range(n_channels)]
+    fca = FluoChangeAnalysis(Path("."), channels, "delta")
+    fca.gen_column_names()
+    fca.labels_ref = labels
+    fca.images_fluo = rng.random((n_channels,) + labels.shape, dtype=np.float32)
+    fca.images_fluo_raw = rng.integers(
+        0, 2**16, size=(n_channels,) + labels.shape, dtype=np.uint16
+    )
+
+    df = pd.DataFrame(
+        {"frame": np.concatenate(frames), "trackID": np.concatenate(track_ids)}
+    )
+    df = df.sample(frac=1.0, random_state=seed).reset_index(drop=True)
+    for nc in fca.new_columns + fca.new_columns_raw:
+        df[nc] = np.nan
+
+    return fca, df
+
+
+def loop_add_fluo_intensity(fca: FluoChangeAnalysis, df_fluo_change: pd.DataFrame):
+    """
+    Adds the mean intensities with a loop over all cells that scans the table for every cell and channel, this is how
+    the intensities were added before they were vectorized
+    :param fca: The analysis with the loaded images
+    :param df_fluo_change: Tracking output with additional columns for fluo intensity
+    :return: The data frame with the intensities
+    """
+
+    for t in range(len(fca.labels_ref)):
+        props_ref = regionprops_table(fca.labels_ref[t], properties=["label", "coords"])
+        df_ref = pd.DataFrame(props_ref, index=props_ref["label"])
+
+        for l in df_ref.label:
+            coords = df_ref.loc[l].coords
+            mean_intensities = np.mean(
+                fca.images_fluo[:, t, coords[:, 0], coords[:, 1]], axis=1
+            )
+            mean_intensities_raw = np.mean(
+                fca.images_fluo_raw[:, t, coords[:, 0], coords[:, 1]], axis=1
+            )
+            mask = (df_fluo_change.trackID == l) & (df_fluo_change.frame == t)
+            for nc, mi in zip(fca.new_columns, mean_intensities):
+                df_fluo_change.loc[mask, nc] = mi
+            for nc, mi in zip(fca.new_columns_raw, mean_intensities_raw):
+                df_fluo_change.loc[mask, nc] = mi
+
+    return df_fluo_change
+
+
+def main(frames: int, cells: Tuple[int], channels=2, loop_max=20_000):
+    """
+    Benchmarks the vectorized mean intensities against a loop over all cells, the time per cell of the vectorized
+    version should stay constant
+    :param frames: The number of frames
+    :param cells: The numbers of cells per frame to benchmark
+    :param channels: The number of fluorescence channels
+    :param loop_max: The maximum number of cells (over all frames) for which the loop is run
+    """
+
+    print(
+        f"{'cells':>6} {'total':>8} {'loop [s]':>9} {'vectorized [s]':>15} {'us/cell':>8} {'speedup':>8}"
+    )
+    for n_cells in cells:
+        fca, df = fake_analysis(n_frames=frames, n_cells=n_cells, n_channels=channels)
+
+        start = time.perf_counter()
+        df_vec = fca.add_fluo_intensity(df.copy())
+        t_vec = time.perf_counter() - start
+
+        # the loop is too slow for many cells
+        n_total = frames * n_cells
+        t_loop = np.nan
+        if n_total <= loop_max:
+            start = time.perf_counter()
+            df_loop = loop_add_fluo_intensity(fca, df.copy())
+            t_loop = time.perf_counter() - start
+
+            # the raw counts are equal, the loop accumulated the float32 images in float32
+            assert df_vec[fca.new_columns_raw].equals(df_loop[fca.new_columns_raw])
+            assert np.allclose(df_vec[fca.new_columns], df_loop[fca.new_columns])
+
+        print(
+            f"{n_cells:>6} {n_total:>8} {t_loop:>9.3f} {t_vec:>15.3f} "
+            f"{1e6 * t_vec / n_total:>8.1f} {t_loop / t_vec:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    # arg parsing
+    parser = argparse.ArgumentParser(
+        description="Benchmark the mean intensities of the fluorescence analysis."
+    )
+    parser.add_argument("--frames", type=int, default=20, help="The number of frames")
+    parser.add_argument(
+        "--cells",
+        type=int,
+        nargs="+",
+        default=[100, 400, 1600, 6400],
+        help="The numbers of cells per frame to benchmark",
+    )
+    parser.add_argument(
+        "--channels", type=int, default=2, help="The number of fluorescence channels"
+    )
+    parser.add_argument(
+        "--loop_max",
+        type=int,
+        default=20_000,
+        help="The maximum number of cells (over all frames) for which the loop is run",
+    )
+    args = parser.parse_args()
+
+    # call the main
+    main(**vars(args))
@@ -0,0 +1,124 @@
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Tuple
+
+import h5py
+import skimage.io as io
+
+# we only want the timings in the output
+os.environ.setdefault("__VERBOSE", "3")
+
+from benchmark_fluo_intensity import fake_analysis
+from midap.apps import track_analysis
+
+# Functions
+###########
+
+
+def write_output_folder(folder: Path, n_frames: int, n_cells: int, n_channels: int):
+    """
+    Writes a fake output folder with the tracking output of the reference channel and the tracking outputs and raw
+    count images of the fluorescence channels
+    :param folder: The output folder
+    :param n_frames: The number of frames
+    :param n_cells: The number of cells per frame
+    :param n_channels: The number of fluorescence channels
+    :return: The channels
+    """
+
+    fca, df = fake_analysis(n_frames=n_frames, n_cells=n_cells, n_channels=n_channels)
+    fca.path = folder
+    fca.gen_pathnames()
+
+    fca.path_ref_h5.parent.mkdir(parents=True)
+    with h5py.File(fca.path_ref_h5, "w") as f:
+        f.create_dataset("images", data=fca.images_fluo[0])
+        f.create_dataset("labels", data=fca.labels_ref)
+    df.drop(columns=fca.new_columns + fca.new_columns_raw).to_csv(fca.path_ref_csv)
+
+    for path_h5, path_raw, images, images_raw in zip(
+        fca.paths_fluo_h5, fca.path_fluo_png, fca.images_fluo, fca.images_fluo_raw
+    ):
+        path_h5.parent.mkdir(parents=True)
+        with h5py.File(path_h5, "w") as f:
+            f.create_dataset("images", data=images)
+            f.create_dataset("labels", data=fca.labels_ref)
+        path_raw.mkdir()
+        for frame, img in enumerate(images_raw):
+            io.imsave(
+                path_raw.joinpath(f"frame_{frame:04d}.tif"), img, check_contrast=False
+            )
+
+    return fca.channels
+
+
+def main(frames: Tuple[int], cells=400, channels=2):
+    """
+    Benchmarks the peak memory and the time of the streaming fluorescence analysis against loading all images, the
+    images of the streaming do not grow with the number of frames, only the table with a row per cell and frame does
+    :param frames: The numbers of frames to benchmark
+    :param cells: The number of cells per frame
+    :param channels: The number of fluorescence channels
+    """
+
+    print(f"{'frames':>7} {'rows':>8} {'mode':>10} {'time [s]':>9} {'peak [MB]':>10}")
+    for n_frames in frames:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir)
+            channel_names = write_output_folder(
+                path, n_frames=n_frames, n_cells=cells, n_channels=channels
+            )
+            out_file = path.joinpath(
+                channel_names[0], "track_output", "track_output_delta_fluo_change.csv"
+            )
+
+            outputs = []
+            for streaming in [False, True]:
+                tracemalloc.start()
+                start = time.perf_counter()
+                track_analysis.main(
+                    path=path,
+                    channels=channel_names,
+                    tracking_class="delta",
+                    streaming=streaming,
+                )
+                t_run = time.perf_counter() - start
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                outputs.append(out_file.read_text())
+
+                mode = "streaming" if streaming else "loaded"
+                print(
+                    f"{n_frames:>7} {n_frames * cells:>8} {mode:>10} {t_run:>9.3f} {peak / 1e6:>10.1f}"
+                )
+
+            # both modes need to write the same csv
+            assert outputs[0] == outputs[1]
+
+
+if __name__ == "__main__":
+    # arg parsing
+    parser = argparse.ArgumentParser(
+        description="Benchmark the streaming of the fluorescence analysis."
+    )
+    parser.add_argument(
+        "--frames",
+        type=int,
+        nargs="+",
+        default=[10, 40, 160],
+        help="The numbers of frames to benchmark",
+    )
+    parser.add_argument(
+        "--cells", type=int, default=400, help="The number of cells per frame"
+    )
+    parser.add_argument(
+        "--channels", type=int, default=2, help="The number of fluorescence channels"
+    )
+    args = parser.parse_args()
+
+    # call the main
+    main(**vars(args))
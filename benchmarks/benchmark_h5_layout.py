@@ -0,0 +1,110 @@
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Tuple
+
+import h5py
+import numpy as np
+
+# we only want the timings in the output
+os.environ.setdefault("__VERBOSE", "3")
+
+from benchmark_lineages import fake_tracking_output
+from midap.tracking import tracking_data
+from midap.tracking.tracking_data import (
+    IMAGE_DTYPE,
+    LABEL_DTYPE,
+    create_frame_dataset,
+    load_tracking_data,
+)
+
+# Functions
+###########
+
+
+def main(frames: int, cells: Tuple[int], n_reads=100, seed=42):
+    """
+    Benchmarks the write and read times and the file sizes of the tracking output files with different compressions
+    :param frames: The number of frames
+    :param cells: The numbers of cells per frame to benchmark
+    :param n_reads: The number of random single frame reads
+    :param seed: The seed for the random frame selection
+    """
+
+    compressions = [None, "gzip", "lzf"]
+    if tracking_data.hdf5plugin is not None:
+        compressions.append("blosc")
+
+    rng = np.random.default_rng(seed)
+    print(
+        f"{'cells':>8} {'compression':>12} {'file [MB]':>10} {'write [s]':>10} {'read [s]':>9} "
+        f"{'frame [ms]':>11}"
+    )
+    for n_cells in cells:
+        # the images are the noisy cells and the labels a sparse label stack
+        inputs, _ = fake_tracking_output(n_frames=frames, n_cells=n_cells)
+        images = inputs[..., 0].astype(IMAGE_DTYPE)
+        labels = inputs[..., 1].astype(LABEL_DTYPE)
+        frame_indices = rng.integers(0, len(images), size=n_reads)
+
+        for compression in compressions:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                data_file = Path(tmp_dir).joinpath("tracking_delta.h5")
+
+                # write the file frame by frame like the lineages
+                start = time.perf_counter()
+                with h5py.File(data_file, "w") as hf:
+                    for name, data in [("images", images), ("labels", labels)]:
+                        dset = create_frame_dataset(
+                            hf,
+                            name,
+                            shape=data.shape,
+                            dtype=data.dtype,
+                            compression=compression,
+                        )
+                        for frame_index, frame in enumerate(data):
+                            dset[frame_index] = frame
+                t_write = time.perf_counter() - start
+                file_size = data_file.stat().st_size / 1e6
+
+                # read everything
+                start = time.perf_counter()
+                _ = load_tracking_data(data_file)
+                t_read = time.perf_counter() - start
+
+                # random access to single frames
+                start = time.perf_counter()
+                with h5py.File(data_file, "r") as hf:
+                    for frame_index in frame_indices:
+                        _ = hf["images"][frame_index]
+                        _ = hf["labels"][frame_index]
+                t_frame = (time.perf_counter() - start) / n_reads
+
+            print(
+                f"{n_cells:>8} {str(compression):>12} {file_size:>10.1f} {t_write:>10.3f} {t_read:>9.3f} "
+                f"{1e3 * t_frame:>11.3f}"
+            )
+
+
+if __name__ == "__main__":
+    # arg parsing
+    parser = argparse.ArgumentParser(
+        description="Benchmark the layouts and compressions of the tracking output files."
+    )
+    parser.add_argument("--frames", type=int, default=20, help="The number of frames")
+    parser.add_argument(
+        "--cells",
+        type=int,
+        nargs="+",
+        default=[100, 400, 1600],
+        help="The numbers of cells per frame to benchmark",
+    )
+    parser.add_argument(
+        "--n_reads", type=int, default=100, help="Number of random single frame reads"
+    )
+    args = parser.parse_args()
+
+    # call the main
+    main(**vars(args))
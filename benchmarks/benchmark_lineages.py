@@ -0,0 +1,148 @@
+import argparse
+import os
+import time
+from typing import Tuple
+
+import numpy as np
+from skimage.measure import label
+
+# we only want the timings in the output
+os.environ.setdefault("__VERBOSE", "3")
+
+from midap.tracking.delta_lineage import DeltaTypeLineages
+
+# Functions
+###########
+
+
+def fake_tracking_output(
+    n_frames: int,
+    n_cells: int,
+    cell_size=5,
+    split_prob=0.05,
+    seed=42,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Creates a fake tracking output in the format of DeltaTypeTracking.run_model_crop. Every cell occupies a square
+    slot in a grid, cells can split into a free slot or disappear.
+    :param n_frames: The number of frames
+    :param n_cells: The (approximate) number of cells per frame
+    :param cell_size: The size of the square cells in pixels
+    :param split_prob: The probability of a cell to split (or to disappear)
+    :param seed: The seed for the random number generator
+    :return: The inputs and results arrays
+    """
+
+    rng = np.random.default_rng(seed)
+
+    # we create a grid with twice as many slots as cells
+    slot = cell_size + 2
+    n_rows = int(np.ceil(np.sqrt(2 * n_cells)))
+    n_slots = n_rows * n_rows
+    shape = (n_rows * slot, n_rows * slot)
+
+    # the occupied slots of each frame and the slots of the daughters
+    occupied = rng.choice(n_slots, size=n_cells, replace=False)
+    frames = []
+    daughters = []
+    for _ in range(n_frames):
+        frames.append(occupied)
+        free = rng.permutation(np.setdiff1d(np.arange(n_slots), occupied))
+        event = rng.random(len(occupied))
+        split = event < split_prob
+        split[np.cumsum(split) > len(free)] = False
+        gone = (event > 1.0 - split_prob) & ~split
+        # daughter 1 stays in the slot, daughter 2 moves to a free slot, -1 marks no daughter
+        d1 = np.where(gone, -1, occupied)
+        d2 = np.full_like(occupied, -1)
+        d2[split] = free[: np.sum(split)]
+        daughters.append((d1, d2))
+        # keep the number of cells stable
+        occupied = np.concatenate([d1[d1 >= 0], d2[d2 >= 0]])
+        occupied = rng.permutation(occupied)[:n_cells]
+
+    def to_label(slots):
+        """
+        Renders the slots to a labelled image
+        :param slots: The occupied slots
+        :return: The labelled image and the label of all slots
+        """
+        img = np.zeros(shape, dtype=int)
+        for s in slots:
+            r, c = divmod(s, n_rows)
+            img[r * slot : r * slot + cell_size, c * slot : c * slot + cell_size] = 1
+        lab = label(img, connectivity=1)
+        lut = np.zeros(n_slots + 1, dtype=int)
+        r, c = np.divmod(slots, n_rows)
+        lut[slots] = lab[r * slot, c * slot]
+        return img, lab, lut
+
+    rendered = [to_label(s) for s in frames]
+    inputs = np.zeros((n_frames - 1,) + shape + (4,))
+    results = np.zeros((n_frames - 1,) + shape + (2,))
+    for t in range(n_frames - 1):
+        img_prev, lab_prev, lut_prev = rendered[t]
+        img_cur, lab_cur, lut_cur = rendered[t + 1]
+        inputs[t, ..., 0] = img_prev * rng.random(shape)
+        inputs[t, ..., 1] = lab_prev
+        inputs[t, ..., 2] = img_cur * rng.random(shape)
+        inputs[t, ..., 3] = img_cur
+        for num, d in enumerate(daughters[t]):
+            # only daughters that are still present in the next frame
+            mother = np.zeros(n_slots + 1, dtype=int)
+            valid = (d >= 0) & np.isin(d, frames[t + 1])
+            mother[lut_cur[d[valid]]] = lut_prev[frames[t][valid]]
+            results[t, ..., num] = mother[lab_cur] * (lab_cur > 0)
+
+    return inputs, results
+
+
+def main(frames: Tuple[int], cells: Tuple[int], repeats=3):
+    """
+    Benchmarks the lineage generation of the DeltaTypeLineages for different numbers of frames and cells
+    :param frames: The numbers of frames to benchmark
+    :param cells: The numbers of cells per frame to benchmark
+    :param repeats: The number of repetitions, the best time is reported
+    """
+
+    print(f"{'frames':>8} {'cells':>8} {'time [s]':>10} {'us / cell':>10}")
+    for n_frames in frames:
+        for n_cells in cells:
+            inputs, results = fake_tracking_output(n_frames=n_frames, n_cells=n_cells)
+            times = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                _ = DeltaTypeLineages(inputs=inputs, results=results, connectivity=1)
+                times.append(time.perf_counter() - start)
+            t = np.min(times)
+            print(
+                f"{n_frames:>8} {n_cells:>8} {t:>10.3f} {1e6 * t / (n_frames * n_cells):>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    # arg parsing
+    parser = argparse.ArgumentParser(
+        description="Benchmark the lineage generation of the delta type tracking."
+    )
+    parser.add_argument(
+        "--frames",
+        type=int,
+        nargs="+",
+        default=[10, 20, 40],
+        help="The numbers of frames to benchmark",
+    )
+    parser.add_argument(
+        "--cells",
+        type=int,
+        nargs="+",
+        default=[100, 200, 400],
+        help="The numbers of cells per frame to benchmark",
+    )
+    parser.add_argument(
+        "--repeats", type=int, default=3, help="Number of repetitions per setting"
+    )
+    args = parser.parse_args()
+
+    # call the main
+    main(**vars(args))
@@ -0,0 +1,193 @@
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+import skimage.io as io
+
+# we only want the timings in the output
+os.environ.setdefault("__VERBOSE", "3")
+
+from benchmark_lineages import fake_tracking_output
+from midap.tracking.base_tracking import DeltaTypeTracking
+
+# Classes
+#########
+
+
+class FakeModel:
+    """
+    A model that only sleeps to simulate the inference on an accelerator, the sleep releases the GIL
+    """
+
+    def __init__(self, time_per_batch: float):
+        """
+        Initializes the model
+        :param time_per_batch: The time in seconds needed for a single batch
+        """
+
+        self.time_per_batch = time_per_batch
+        self.num_batches = 0
+
+    def predict(self, x: np.ndarray, batch_size=32, **kwargs):
+        """
+        Predicts the candidates of all crops
+        :param x: The input crops
+        :param batch_size: The batch size
+        :return: The candidates as output
+        """
+
+        num_batches = int(np.ceil(len(x) / batch_size))
+        self.num_batches += num_batches
+        time.sleep(num_batches * self.time_per_batch)
+        return x[..., 3:4]
+
+
+class FakeTracking(DeltaTypeTracking):
+    """
+    A tracking class with a fake model that counts the reads of the files
+    """
+
+    def __init__(self, *args, time_per_batch: float, **kwargs):
+        """
+        Initializes the class
+        :param args: Arguments used for the base class init
+        :param time_per_batch: The time in seconds the fake model needs for a single batch
+        :param kwargs: Keyword arguments used for the base class init
+        """
+
+        super().__init__(*args, **kwargs)
+        self.time_per_batch = time_per_batch
+        self.num_reads = 0
+
+    def load_model(self):
+        """
+        Loads the fake model
+        """
+
+        self.model = FakeModel(time_per_batch=self.time_per_batch)
+
+    def load_frame(self, frame: int, label=False):
+        """
+        Loads a frame and counts the reads
+        """
+
+        self.num_reads += 2
+        return super().load_frame(frame, label=label)
+
+
+# Functions
+###########
+
+
+def serial_run(tracking: DeltaTypeTracking, batch_size: int):
+    """
+    Runs the tracking frame by frame without prefetching and batching, this is how the tracking was run before
+    :param tracking: The tracking instance
+    :param batch_size: The batch size of the model
+    """
+
+    for cur_frame in range(1, tracking.num_time_steps):
+        inputs, input_whole_frame, crop_boxes, label_frame = tracking.gen_input_crop(
+            cur_frame
+        )
+        results = tracking.model.predict(inputs, verbose=0, batch_size=batch_size)
+        tracking.transfer_results(
+            full_shape=input_whole_frame.shape[:2] + (2,),
+            inp=inputs,
+            res=results,
+            crop_boxes=crop_boxes,
+            label_frame=label_frame,
+        )
+
+
+def main(
+    frames: int,
+    cells: Tuple[int],
+    batch_size=128,
+    num_workers=4,
+    time_per_batch=0.02,
+):
+    """
+    Benchmarks the pipelined tracking against the serial tracking
+    :param frames: The number of frames
+    :param cells: The numbers of cells per frame to benchmark
+    :param batch_size: The batch size of the model
+    :param num_workers: The number of threads of the pipeline
+    :param time_per_batch: The time in seconds the fake model needs for a single batch
+    """
+
+    print(
+        f"{'cells':>8} {'mode':>9} {'time [s]':>9} {'batches':>8} {'reads':>6} {'speedup':>8}"
+    )
+    for n_cells in cells:
+        inputs, _ = fake_tracking_output(n_frames=frames, n_cells=n_cells)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # write the frames to disk
+            imgs, segs = [], []
+            for frame, inp in enumerate(inputs):
+                imgs.append(str(Path(tmp_dir).joinpath(f"img_{frame:04d}.tif")))
+                segs.append(str(Path(tmp_dir).joinpath(f"seg_{frame:04d}.tif")))
+                io.imsave(
+                    imgs[-1], inp[..., 0].astype(np.float32), check_contrast=False
+                )
+                io.imsave(segs[-1], inp[..., 1].astype(np.uint8), check_contrast=False)
+
+            times = []
+            for mode in ["serial", "pipeline"]:
+                tracking = FakeTracking(
+                    imgs=imgs,
+                    segs=segs,
+                    model_weights=None,
+                    time_per_batch=time_per_batch,
+                )
+                tracking.estimate_input_size()
+                tracking.get_model()
+
+                start = time.perf_counter()
+                if mode == "serial":
+                    serial_run(tracking, batch_size=batch_size)
+                else:
+                    tracking.run_model_crop(
+                        batch_size=batch_size, num_workers=num_workers
+                    )
+                times.append(time.perf_counter() - start)
+
+                print(
+                    f"{n_cells:>8} {mode:>9} {times[-1]:>9.3f} {tracking.model.num_batches:>8} "
+                    f"{tracking.num_reads:>6} {times[0] / times[-1]:>8.1f}"
+                )
+
+
+if __name__ == "__main__":
+    # arg parsing
+    parser = argparse.ArgumentParser(
+        description="Benchmark the pipelined inference of the delta type tracking."
+    )
+    parser.add_argument("--frames", type=int, default=20, help="The number of frames")
+    parser.add_argument(
+        "--cells",
+        type=int,
+        nargs="+",
+        default=[50, 200, 800],
+        help="The numbers of cells per frame to benchmark",
+    )
+    parser.add_argument(
+        "--batch_size", type=int, default=128, help="The batch size of the model"
+    )
+    parser.add_argument(
+        "--num_workers", type=int, default=4, help="The number of threads"
+    )
+    parser.add_argument(
+        "--time_per_batch",
+        type=float,
+        default=0.02,
+        help="The time in seconds the fake model needs for a single batch",
+    )
+    args = parser.parse_args()
+
+    # call the main
+    main(**vars(args))
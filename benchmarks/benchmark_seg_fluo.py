@@ -0,0 +1,229 @@
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+import skimage.io as io
+from skimage.measure import regionprops_table
+
+# we only want the timings in the output
+os.environ.setdefault("__VERBOSE", "3")
+
+from midap.apps import seg_fluo_change_analysis
+
+# Functions
+###########
+
+
+def write_channels(
+    folder: Path, n_frames: int, n_cells: int, n_channels: int, cell_size=5, seed=42
+):
+    """
+    Writes fake segmentations of a reference channel and images of the additional channels, every cell occupies a
+    square slot in a grid
+    :param folder: The output folder
+    :param n_frames: The number of frames
+    :param n_cells: The number of cells per frame
+    :param n_channels: The number of additional channels
+    :param cell_size: The size of the square cells in pixels
+    :param seed: The seed for the random number generator
+    :return: The channels
+    """
+
+    rng = np.random.default_rng(seed)
+    channels = ["ph"] + [f"fluo_{c}" for c in range(n_channels)]
+    for d in ["seg_im", "cut_im", "cut_im_rawcounts"]:
+        for channel in channels:
+            folder.joinpath(channel, d).mkdir(parents=True)
+
+    # we create a grid with twice as many slots as cells
+    slot = cell_size + 2
+    n_rows = int(np.ceil(np.sqrt(2 * n_cells)))
+    shape = (n_rows * slot, n_rows * slot)
+
+    for frame in range(n_frames):
+        seg = np.zeros(shape, dtype=np.uint16)
+        slots = rng.choice(n_rows * n_rows, size=n_cells, replace=False)
+        for cell_id, s in enumerate(slots):
+            row, col = slot * (s // n_rows) + 1, slot * (s % n_rows) + 1
+            seg[row : row + cell_size, col : col + cell_size] = cell_id + 1
+        io.imsave(
+            folder.joinpath(channels[0], "seg_im", f"pos_{frame:04d}_seg.tif"),
+            seg,
+            check_contrast=False,
+        )
+        for channel in channels[1:]:
+            io.imsave(
+                folder.joinpath(channel, "cut_im", f"pos_{frame:04d}_cut.tif"),
+                rng.random(shape, dtype=np.float32),
+                check_contrast=False,
+            )
+            io.imsave(
+                folder.joinpath(channel, "cut_im_rawcounts", f"pos_{frame:04d}.tif"),
+                rng.integers(0, 2**16, size=shape, dtype=np.uint16),
+                check_contrast=False,
+            )
+
+    return channels
+
+
+def loop_fluo_analysis_per_channel(path: Path, ref_channel: str, add_channel: str):
+    """
+    Loads the stacks of a channel and computes the intensities with a loop over all cells, the frames are appended to
+    the dataframe one by one, this is how every channel was analysed before it was vectorized
+    :param path: Path to output folder
+    :param ref_channel: The reference channel with the segmentations
+    :param add_channel: The additional channel
+    :return: The dataframe of the channel
+    """
+
+    stacks = []
+    for p in [
+        path.joinpath(ref_channel, "seg_im"),
+        path.joinpath(add_channel, "cut_im"),
+        path.joinpath(add_channel, "cut_im_rawcounts"),
+    ]:
+        stacks.append(
+            np.array([io.imread(p.joinpath(f)) for f in np.sort(os.listdir(p))])
+        )
+    segs_ref_ch, img_add_ch, img_add_ch_raw = stacks
+
+    df_all = pd.DataFrame()
+    for frame in range(len(segs_ref_ch)):
+        add_ch = img_add_ch[frame]
+        add_ch_raw = img_add_ch_raw[frame]
+        props = regionprops_table(
+            segs_ref_ch[frame],
+            intensity_image=add_ch_raw,
+            properties=(
+                "label",
+                "coords",
+                "area",
+                "bbox",
+                "intensity_max",
+                "intensity_mean",
+                "intensity_min",
+                "minor_axis_length",
+                "major_axis_length",
+                "centroid",
+            ),
+        )
+        df = pd.DataFrame(props).set_index("label")
+
+        intensities_add_ch = []
+        intensities_raw_add_ch = []
+        for i in df.index:
+            row, col = df.loc[i].coords.T
+            intensities_add_ch.append(np.mean(add_ch[row, col]))
+            intensities_raw_add_ch.append(np.mean(add_ch_raw[row, col]))
+
+        df["intensity_" + add_channel] = intensities_add_ch
+        df["intensity_raw_" + add_channel] = intensities_raw_add_ch
+        df["frame_number"] = [frame] * len(df.index)
+        df = df.rename(
+            columns={
+                "bbox-0": "min_row",
+                "bbox-1": "min_col",
+                "bbox-2": "max_row",
+                "bbox-3": "max_col",
+                "centroid-1": "x",
+                "centroid-0": "y",
+            }
+        )
+        df.drop(["coords"], axis=1, inplace=True)
+        df_all = pd.concat([df_all, df])
+
+    return df_all
+
+
+def loop_fluo_analysis(path: Path, channels: list):
+    """
+    Analyses every additional channel separately and combines the channels, this is how the main routine worked
+    before it was vectorized
+    :param path: Path to output folder
+    :param channels: The channels, the first is the reference channel
+    :return: The dataframe of all channels
+    """
+
+    df_all_channels = pd.DataFrame()
+    for add_channel in channels[1:]:
+        df = loop_fluo_analysis_per_channel(path, channels[0], add_channel)
+        df_all_channels = pd.concat([df_all_channels, df], axis=1)
+
+    return df_all_channels.loc[:, ~df_all_channels.columns.duplicated()].copy()
+
+
+def main(frames: Tuple[int], cells=400, channels=2, loop_max=200):
+    """
+    Benchmarks the single pass over the frames against the loop over all cells of every channel
+    :param frames: The numbers of frames to benchmark
+    :param cells: The number of cells per frame
+    :param channels: The number of additional channels
+    :param loop_max: The maximum number of frames for which the loop is run
+    """
+
+    print(
+        f"{'frames':>7} {'total':>6} {'loop [s]':>9} {'vectorized [s]':>15} {'speedup':>8}"
+    )
+    for n_frames in frames:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir)
+            channel_names = write_channels(
+                path, n_frames=n_frames, n_cells=cells, n_channels=channels
+            )
+
+            start = time.perf_counter()
+            df_vec = seg_fluo_change_analysis.fluo_analysis(
+                path=path, ref_channel=channel_names[0], add_channels=channel_names[1:]
+            )
+            t_vec = time.perf_counter() - start
+
+            # the loop is too slow for many frames
+            t_loop = np.nan
+            if n_frames <= loop_max:
+                start = time.perf_counter()
+                df_loop = loop_fluo_analysis(path, channel_names)
+                t_loop = time.perf_counter() - start
+
+                # the loop accumulated the float32 images in float32
+                assert df_vec.columns.equals(df_loop.columns)
+                assert df_vec.index.equals(df_loop.index)
+                assert np.allclose(df_vec, df_loop)
+
+            print(
+                f"{n_frames:>7} {n_frames * cells:>6} {t_loop:>9.3f} {t_vec:>15.3f} {t_loop / t_vec:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    # arg parsing
+    parser = argparse.ArgumentParser(
+        description="Benchmark the fluorescence analysis of the segmentations."
+    )
+    parser.add_argument(
+        "--frames",
+        type=int,
+        nargs="+",
+        default=[10, 40, 160],
+        help="The numbers of frames to benchmark",
+    )
+    parser.add_argument(
+        "--cells", type=int, default=400, help="The number of cells per frame"
+    )
+    parser.add_argument(
+        "--channels", type=int, default=2, help="The number of additional channels"
+    )
+    parser.add_argument(
+        "--loop_max",
+        type=int,
+        default=200,
+        help="The maximum number of frames for which the loop is run",
+    )
+    args = parser.parse_args()
+
+    # call the main
+    main(**vars(args))
@@ -0,0 +1,121 @@
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+import skimage.io as io
+from skimage.measure import regionprops
+
+# we only want the timings in the output
+os.environ.setdefault("__VERBOSE", "3")
+
+from benchmark_strack import fake_frames
+from midap.apps.segment_analysis import main as segment_analysis
+
+# Functions
+###########
+
+
+def loop_segment_analysis(path_seg: Path):
+    """
+    Counts the cells with np.unique and the killed cells with a full regionprops per frame, this is how the frames
+    were analysed before
+    :param path_seg: The directory containing the segmented images (labelled)
+    :return: The data frame of the cell numbers
+    """
+
+    num_cells = []
+    num_killed = []
+    for p in sorted(path_seg.iterdir()):
+        img = io.imread(p)
+        num_cells.append(len(np.unique(img)) - 1)
+        minor_to_major = np.array(
+            [
+                r.minor_axis_length / r.major_axis_length
+                for r in regionprops(img)
+                if r.major_axis_length > 0
+            ]
+        )
+        num_killed.append(len(np.where(minor_to_major > 0.7)[0]))
+
+    num_cells = np.array(num_cells)
+    num_killed = np.array(num_killed)
+    d = {
+        "all cells": num_cells,
+        "living cells": num_cells - num_killed,
+        "killed cells": num_killed,
+    }
+    return pd.DataFrame(data=d)
+
+
+def main(frames: int, cells: int, workers: Tuple[int], size=1024):
+    """
+    Benchmarks the segment analysis against the loop and with different numbers of worker processes
+    :param frames: The number of frames
+    :param cells: The number of cells per frame
+    :param workers: The numbers of worker processes to benchmark
+    :param size: The size of the frames
+    """
+
+    print(f"CPUs available: {len(os.sched_getaffinity(0))}")
+    print(f"{'mode':>8} {'workers':>8} {'time [s]':>9} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path_seg = Path(tmp_dir).joinpath("seg_im")
+        path_seg.mkdir()
+        for frame in range(frames):
+            seg, _ = fake_frames(n_cells=cells, size=size, seed=frame)
+            io.imsave(
+                path_seg.joinpath(f"frame_{frame:04d}_seg.tif"),
+                seg,
+                check_contrast=False,
+            )
+
+        start = time.perf_counter()
+        df_loop = loop_segment_analysis(path_seg)
+        t_loop = time.perf_counter() - start
+        print(f"{'loop':>8} {1:>8} {t_loop:>9.3f} {1.0:>8.1f}")
+
+        for num_workers in workers:
+            start = time.perf_counter()
+            segment_analysis(
+                path_seg=path_seg,
+                path_result=tmp_dir,
+                loglevel=3,
+                num_workers=num_workers,
+            )
+            t_workers = time.perf_counter() - start
+
+            # all versions need to count the same cells
+            df = pd.read_csv(Path(tmp_dir).joinpath("cell_number.csv"), index_col=0)
+            assert df.equals(df_loop)
+
+            print(
+                f"{'labeled':>8} {num_workers:>8} {t_workers:>9.3f} {t_loop / t_workers:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    # arg parsing
+    parser = argparse.ArgumentParser(
+        description="Benchmark the analysis of the segmentations."
+    )
+    parser.add_argument("--frames", type=int, default=100, help="The number of frames")
+    parser.add_argument(
+        "--cells", type=int, default=400, help="The number of cells per frame"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=[1, 2, 4, 8],
+        help="The numbers of worker processes to benchmark",
+    )
+    parser.add_argument("--size", type=int, default=1024, help="The size of the frames")
+    args = parser.parse_args()
+
+    # call the main
+    main(**vars(args))
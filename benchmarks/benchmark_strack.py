@@ -0,0 +1,224 @@
+import argparse
+import os
+import time
+from typing import Tuple
+
+import cv2
+import numpy as np
+from scipy.ndimage import find_objects
+from scipy.spatial.distance import cdist
+from skimage.draw import ellipse
+from skimage.measure import regionprops
+
+# we only want the timings in the output
+os.environ.setdefault("__VERBOSE", "3")
+
+from midap.tracking.strack.strack_script import (
+    get_cell_properties,
+    get_frame_links,
+    get_matching_percentages,
+    get_orientation,
+)
+
+# Functions
+###########
+
+
+def fake_frames(n_cells: int, size: int, seed=42):
+    """
+    Creates two labeled frames with rotated cells that move, grow and split
+    :param n_cells: The number of cells in the first frame
+    :param size: The size of the frames
+    :param seed: The seed for the random number generator
+    :return: The labeled images of both frames
+    """
+
+    rng = np.random.default_rng(seed)
+    rows, cols = rng.uniform(10, size - 10, size=(2, n_cells))
+    lengths = rng.uniform(5, 12, size=n_cells)
+    angles = rng.uniform(-np.pi, np.pi, size=n_cells)
+
+    img0 = np.zeros((size, size), dtype=np.uint16)
+    img1 = np.zeros_like(img0)
+    for num in range(n_cells):
+        rr, cc = ellipse(
+            rows[num], cols[num], lengths[num], 3.5, img0.shape, rotation=angles[num]
+        )
+        img0[rr, cc] = num + 1
+
+        # the cells move and the long ones split along their main axis
+        row, col = rows[num] + rng.normal(0, 2), cols[num] + rng.normal(0, 2)
+        if lengths[num] > 10:
+            shift = np.array([np.cos(angles[num]), np.sin(angles[num])]) * lengths[num]
+            centers = [(row, col) - shift / 2, (row, col) + shift / 2]
+            length = lengths[num] / 2 - 1
+        else:
+            centers = [(row, col)]
+            length = lengths[num] * 1.1
+        for center in centers:
+            rr, cc = ellipse(*center, length, 3.5, img1.shape, rotation=angles[num])
+            img1[rr, cc] = img1.max() + 1
+
+    return img0, img1
+
+
+def loop_features(img0: np.ndarray, img1: np.ndarray, max_dist: float):
+    """
+    Computes the centroids, the matching percentages and the orientations mask by mask with full-frame copies, this
+    is how the features were computed before they were vectorized
+    :param img0: The labeled image of the previous frame
+    :param img1: The labeled image of the current frame
+    :param max_dist: The maximum distance between two cells to be considered as the same cell
+    :return: The centroids of both frames, the distance matrix, the matching percentages and the orientations
+    """
+
+    unique0 = np.unique(img0)
+    unique1 = np.unique(img1)
+
+    # the centroids
+    centroids = []
+    for img, unique in [(img0, unique0), (img1, unique1)]:
+        my_array = np.empty((0, 2), int)
+        for mask_tmp in unique[1:]:
+            M = cv2.moments(np.where(img != mask_tmp, 0, img))
+            cx = int(M["m10"] / M["m00"])
+            cy = int(M["m01"] / M["m00"])
+            my_array = np.append(my_array, [[cx, cy]], axis=0)
+        centroids.append(my_array)
+    dist_mat = cdist(*centroids)
+
+    # the matching percentages
+    matching_pctgs = np.zeros(dist_mat.shape)
+    for idx0, mask0 in enumerate(unique0[1:]):
+        img_flattened0 = np.where(img0 != mask0, 0, img0).flatten()
+        img_flattened0[img_flattened0 != 0] = 1
+        img_flattened0 = img_flattened0.astype("float")
+        img_flattened0[img_flattened0 == 0] = "nan"
+        for idx1 in np.where(dist_mat[idx0, :] <= int(max_dist))[0]:
+            img_flattened1 = np.where(img1 != unique1[1:][idx1], 0, img1).flatten()
+            img_flattened1[img_flattened1 != 0] = 1
+            img_flattened1 = img_flattened1.astype("float")
+            img_differences = img_flattened0 == img_flattened1
+            matching_pctgs[idx0, idx1] = (
+                (len(img_differences[img_differences == True]))
+                / (len(img_flattened1[img_flattened1 != 0]))
+                * 100
+            )
+
+    # the orientations
+    orientations = np.array([])
+    for mask0 in unique0[1:]:
+        img_tmp0 = np.where(img0 != mask0, 0, img0)
+        img_tmp0[img_tmp0 != 0] = 1
+        orientations = np.append(
+            orientations, np.degrees(regionprops(img_tmp0)[0].orientation)
+        )
+
+    return centroids[0], centroids[1], dist_mat, matching_pctgs, orientations
+
+
+def vectorized_features(img0: np.ndarray, img1: np.ndarray, max_dist: float):
+    """
+    Computes the features like get_frame_links, the orientations of all cells of the previous frame are computed
+    :param img0: The labeled image of the previous frame
+    :param img1: The labeled image of the current frame
+    :param max_dist: The maximum distance between two cells to be considered as the same cell
+    :return: The centroids of both frames, the distance matrix, the matching percentages and the orientations
+    """
+
+    inverse0, centroids0, _ = get_cell_properties(img0)
+    inverse1, centroids1, areas1 = get_cell_properties(img1)
+    dist_mat = cdist(centroids0, centroids1)
+    rows, cols, pctgs = get_matching_percentages(
+        inverse0, inverse1, areas1, dist_mat=dist_mat, max_dist=max_dist
+    )
+    matching_pctgs = np.zeros(dist_mat.shape)
+    matching_pctgs[rows, cols] = pctgs
+    orientations0 = np.array(
+        [
+            get_orientation(inverse0[box] == num + 1)
+            for num, box in enumerate(find_objects(inverse0))
+        ]
+    )
+
+    return centroids0, centroids1, dist_mat, matching_pctgs, orientations0
+
+
+def main(
+    cells: Tuple[int], size=1024, max_dist=50.0, max_angle=30.0, loop_max=400, repeats=3
+):
+    """
+    Benchmarks the links between two frames of STrack against the features computed mask by mask
+    :param cells: The numbers of cells per frame to benchmark
+    :param size: The size of the frames
+    :param max_dist: The maximum distance between two cells to be considered as the same cell
+    :param max_angle: The maximum angle between two cells to be considered as the same cell
+    :param loop_max: The maximum number of cells for which the loop is run
+    :param repeats: The number of repetitions of the links, the best time is reported
+    """
+
+    print(
+        f"{'cells':>8} {'loop features [s]':>18} {'features [s]':>13} {'links [s]':>10} {'speedup':>8}"
+    )
+    for n_cells in cells:
+        img0, img1 = fake_frames(n_cells=n_cells, size=size)
+
+        t_vec = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            get_frame_links(img0, img1, tp=1, max_dist=max_dist, max_angle=max_angle)
+            t_vec.append(time.perf_counter() - start)
+        t_vec = np.min(t_vec)
+
+        start = time.perf_counter()
+        features = vectorized_features(img0, img1, max_dist=max_dist)
+        t_features = time.perf_counter() - start
+
+        # the loop is too slow for many cells
+        t_loop = np.nan
+        if n_cells <= loop_max:
+            start = time.perf_counter()
+            loop_out = loop_features(img0, img1, max_dist=max_dist)
+            t_loop = time.perf_counter() - start
+
+            # both versions need to give the same features
+            for loop_feature, feature in zip(loop_out, features):
+                assert np.array_equal(loop_feature, feature)
+
+        print(
+            f"{n_cells:>8} {t_loop:>18.3f} {t_features:>13.3f} {t_vec:>10.3f} {t_loop / t_vec:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    # arg parsing
+    parser = argparse.ArgumentParser(
+        description="Benchmark the links between two frames of STrack."
+    )
+    parser.add_argument(
+        "--cells",
+        type=int,
+        nargs="+",
+        default=[100, 400, 1600],
+        help="The numbers of cells per frame to benchmark",
+    )
+    parser.add_argument("--size", type=int, default=1024, help="The size of the frames")
+    parser.add_argument(
+        "--max_dist", type=float, default=50.0, help="The maximum linking distance"
+    )
+    parser.add_argument(
+        "--max_angle", type=float, default=30.0, help="The maximum linking angle"
+    )
+    parser.add_argument(
+        "--loop_max",
+        type=int,
+        default=400,
+        help="The maximum number of cells for which the loop is run",
+    )
+    parser.add_argument(
+        "--repeats", type=int, default=3, help="Number of repetitions per setting"
+    )
+    args = parser.parse_args()
+
+    # call the main
+    main(**vars(args))
@@ -0,0 +1,87 @@
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+import skimage.io as io
+
+# we only want the timings in the output
+os.environ.setdefault("__VERBOSE", "3")
+
+from benchmark_strack import fake_frames
+from midap.tracking.strack.strack_script import run_strack
+
+# Functions
+###########
+
+
+def main(frames: int, cells: int, workers: Tuple[int], size=1024, repeats=1):
+    """
+    Benchmarks STrack with different numbers of worker processes for the frame pairs
+    :param frames: The number of frames
+    :param cells: The number of cells in the first frame of every pair
+    :param workers: The numbers of worker processes to benchmark
+    :param size: The size of the frames
+    :param repeats: The number of repetitions, the best time is reported
+    """
+
+    print(f"CPUs available: {len(os.sched_getaffinity(0))}")
+    print(f"{'workers':>8} {'time [s]':>9} {'speedup':>8} {'efficiency':>11}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # every frame is the split of a new random frame, this is enough to time the pairs
+        files = []
+        for frame in range(frames):
+            _, img = fake_frames(n_cells=cells, size=size, seed=frame)
+            files.append(Path(tmp_dir).joinpath(f"seg_{frame:04d}.tif"))
+            io.imsave(files[-1], img, check_contrast=False)
+
+        t_serial = None
+        reference = None
+        for num_workers in workers:
+            times = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                links = run_strack(files, num_workers=num_workers, loglevel=3)
+                times.append(time.perf_counter() - start)
+            t_workers = np.min(times)
+
+            # all numbers of workers need to give the same links
+            if reference is None:
+                t_serial = t_workers
+                reference = links
+            for frame_links, frame_reference in zip(links, reference):
+                assert np.array_equal(frame_links, frame_reference)
+
+            speedup = t_serial / t_workers
+            print(
+                f"{num_workers:>8} {t_workers:>9.3f} {speedup:>8.1f} {speedup / num_workers:>11.2f}"
+            )
+
+
+if __name__ == "__main__":
+    # arg parsing
+    parser = argparse.ArgumentParser(
+        description="Benchmark the parallel frame pairs of STrack."
+    )
+    parser.add_argument("--frames", type=int, default=32, help="The number of frames")
+    parser.add_argument(
+        "--cells", type=int, default=800, help="The number of cells per frame"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=[1, 2, 4, 8],
+        help="The numbers of worker processes to benchmark, the first is the reference",
+    )
+    parser.add_argument("--size", type=int, default=1024, help="The size of the frames")
+    parser.add_argument(
+        "--repeats", type=int, default=1, help="Number of repetitions per setting"
+    )
+    args = parser.parse_args()
+
+    # call the main
+    main(**vars(args))
@@ -0,0 +1,139 @@
+import argparse
+import os
+import time
+from typing import Tuple
+
+import numpy as np
+from skimage.measure import label
+
+# we only want the timings in the output
+os.environ.setdefault("__VERBOSE", "3")
+
+from benchmark_crops import FakeTracking, prepare_frame, vectorized_crops
+from midap.tracking.base_tracking import DeltaTypeTracking
+from midap.tracking.tracking_data import get_frame_label_dtype
+
+# Functions
+###########
+
+
+def fake_results(inputs: np.ndarray, rng: np.random.Generator):
+    """
+    Creates a fake network output that marks the seed and random pixels such that every cell overlaps with several
+    candidates and some candidates are claimed by more than one cell
+    :param inputs: The input crops of the network (BWHC)
+    :param rng: The random number generator
+    :return: The fake output (BWH1)
+    """
+
+    return (0.6 * inputs[..., 1:2] + 0.6 * rng.random(inputs[..., :1].shape)).astype(
+        np.float32
+    )
+
+
+def loop_transfer(
+    tracking: DeltaTypeTracking,
+    full_shape: Tuple[int, int, int],
+    inp: np.ndarray,
+    res: np.ndarray,
+    crop_boxes: np.ndarray,
+):
+    """
+    Transfers the results with a loop over all cells that labels every candidate crop, this is how the results were
+    transferred before they were vectorized
+    :param tracking: The tracking instance
+    :param full_shape: The full shape of the final image
+    :param inp: The input crops of the network (BWHC)
+    :param res: The output of the network
+    :param crop_boxes: The crop boxes for each input
+    :return: The reassembled results of the frame
+    """
+
+    target = np.zeros(full_shape, dtype=get_frame_label_dtype(len(inp)))
+    for cell_id, (i, r, c) in enumerate(zip(inp, res, crop_boxes)):
+        row_min, col_min, row_max, col_max = c
+        crop_target = target[row_min:row_max, col_min:col_max, :]
+
+        inp_label = label(i[..., 3], connectivity=tracking.connectivity)
+        bin_count = np.bincount(inp_label[r[:, :, 0] > 0.5])
+        label_max_overl = np.argsort(bin_count[1:], kind="stable")[-1:-3:-1] + 1
+
+        masks = []
+        for color, count in zip(label_max_overl, bin_count[label_max_overl]):
+            if count > 0 and np.sum(mask := inp_label == color) / count > 0.2:
+                if np.all(crop_target[mask, :] == 0):
+                    masks.append(mask)
+
+        for num, mask in enumerate(masks):
+            crop_target[..., num][mask] = cell_id + 1
+
+    return target
+
+
+def main(cells: Tuple[int], input_size=64, repeats=3, seed=42):
+    """
+    Benchmarks the vectorized transfer of the tracking results against a loop over all cells
+    :param cells: The numbers of cells per frame to benchmark
+    :param input_size: The size of the crops
+    :param repeats: The number of repetitions, the best time is reported
+    :param seed: The seed for the fake network output
+    """
+
+    tracking = FakeTracking(input_size=(input_size, input_size, 4))
+    rng = np.random.default_rng(seed)
+
+    print(f"{'cells':>8} {'loop [s]':>10} {'vectorized [s]':>15} {'speedup':>8}")
+    for n_cells in cells:
+        frame = prepare_frame(tracking=tracking, n_cells=n_cells)
+        inputs, crop_boxes = vectorized_crops(tracking=tracking, frame=frame)
+        results = fake_results(inputs, rng=rng)
+        full_shape = frame["label_cur"].shape + (2,)
+
+        t_loop, t_vec = [], []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            target_loop = loop_transfer(
+                tracking, full_shape, inputs, results, crop_boxes
+            )
+            t_loop.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            target_vec = tracking.transfer_results(
+                full_shape=full_shape,
+                inp=inputs,
+                res=results,
+                crop_boxes=crop_boxes,
+                label_frame=frame["label_cur"],
+            )
+            t_vec.append(time.perf_counter() - start)
+
+        # both versions need to assign the same cells
+        assert np.array_equal(target_loop, target_vec)
+        print(
+            f"{n_cells:>8} {np.min(t_loop):>10.3f} {np.min(t_vec):>15.3f} "
+            f"{np.min(t_loop) / np.min(t_vec):>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    # arg parsing
+    parser = argparse.ArgumentParser(
+        description="Benchmark the transfer of the results of the delta type tracking."
+    )
+    parser.add_argument(
+        "--cells",
+        type=int,
+        nargs="+",
+        default=[100, 500, 1600, 6400],
+        help="The numbers of cells per frame to benchmark",
+    )
+    parser.add_argument(
+        "--input_size", type=int, default=64, help="The size of the crops"
+    )
+    parser.add_argument(
+        "--repeats", type=int, default=3, help="Number of repetitions per setting"
+    )
+    args = parser.parse_args()
+
+    # call the main
+    main(**vars(args))
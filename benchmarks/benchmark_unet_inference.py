@@ -0,0 +1,138 @@
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# we only want the timings in the output
+os.environ.setdefault("__VERBOSE", "3")
+
+from midap.networks.unets import UNetv1
+from midap.segmentation.unet_segmentator import UNetSegmentation
+
+# Functions
+###########
+
+
+def loop_seg_method_unet(unet: UNetSegmentation, imgs_in: List[np.ndarray]):
+    """
+    Pads all images, concatenates them and predicts the whole stack, this is how the images were segmented before
+    the inference was streamed
+    :param unet: The segmentation with the selected model weights
+    :param imgs_in: List of input images
+    :return: List of segmentations
+    """
+
+    imgs_pad = []
+    for img in imgs_in:
+        img = unet.scale_pixel_vals(img)
+        img_pad = unet.pad_image(img)
+        imgs_pad.append(img_pad)
+    imgs_pad = np.concatenate(imgs_pad)
+
+    model_pred = unet.get_model(imgs_pad.shape[1:3] + (1,))
+    y_preds = model_pred.predict(imgs_pad, batch_size=1, verbose=0)
+
+    segs = []
+    for y in y_preds:
+        segs.append((unet.undo_padding(y[None, ...]) > 0.5).astype(int))
+
+    return segs
+
+
+def main(
+    frames: int,
+    size: int,
+    batch_sizes: Tuple[int],
+    tile_size: Optional[int] = None,
+    seed=42,
+):
+    """
+    Benchmarks the time and the peak memory of the streamed inference with different batch sizes against the
+    prediction of the concatenated stack, the UNet has random weights. The models are built and loaded before the
+    timing and the peak memory only contains the arrays allocated by numpy, not the memory of tensorflow.
+    :param frames: The number of frames
+    :param size: The size of the frames
+    :param batch_sizes: The batch sizes to benchmark
+    :param tile_size: If not None, the streamed inference is additionally benchmarked with tiles of this size
+    :param seed: The seed for the random number generator
+    """
+
+    print(f"CPUs available: {len(os.sched_getaffinity(0))}")
+    rng = np.random.default_rng(seed)
+    # the frames are not divisible by the divisor such that they are padded
+    imgs = [rng.random((size - 5, size - 3)) for _ in range(frames)]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        weights = str(Path(tmp_dir).joinpath("model_weights_random.h5"))
+        UNetv1(input_size=(size, size, 1), inference=True).save_weights(weights)
+
+        modes = [("stack", 1, None)]
+        modes += [("stream", batch_size, None) for batch_size in batch_sizes]
+        if tile_size is not None:
+            modes += [("tiled", batch_size, tile_size) for batch_size in batch_sizes]
+
+        print(
+            f"{'mode':>8} {'batch':>6} {'time [s]':>9} {'s/frame':>8} {'peak [MB]':>10}"
+        )
+        segs_stack = None
+        for mode, batch_size, tiles in modes:
+            unet = UNetSegmentation(
+                path_model_weights=tmp_dir,
+                postprocessing=False,
+                model_weights=weights,
+                batch_size=batch_size,
+                tile_size=tiles,
+            )
+            padded = int(np.ceil(size / unet.div) * unet.div)
+            unet.get_model((tiles or padded, tiles or padded, 1))
+
+            tracemalloc.start()
+            start = time.perf_counter()
+            if mode == "stack":
+                segs = loop_seg_method_unet(unet, imgs)
+            else:
+                segs = unet.seg_method_unet(img for img in imgs)
+            t_run = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            # the untiled versions need to give the same segmentations, the tiles only differ at their borders
+            if segs_stack is None:
+                segs_stack = segs
+            elif tiles is None:
+                assert all(np.array_equal(a, b) for a, b in zip(segs_stack, segs))
+
+            print(
+                f"{mode:>8} {batch_size:>6} {t_run:>9.3f} {t_run / frames:>8.3f} {peak / 1e6:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    # arg parsing
+    parser = argparse.ArgumentParser(
+        description="Benchmark the batched and tiled inference of the UNet segmentation."
+    )
+    parser.add_argument("--frames", type=int, default=8, help="The number of frames")
+    parser.add_argument("--size", type=int, default=256, help="The size of the frames")
+    parser.add_argument(
+        "--batch_sizes",
+        type=int,
+        nargs="+",
+        default=[1, 4],
+        help="The batch sizes to benchmark",
+    )
+    parser.add_argument(
+        "--tile_size",
+        type=int,
+        default=None,
+        help="If set, the tiled inference is benchmarked with tiles of this size",
+    )
+    args = parser.parse_args()
+
+    # call the main
+    main(**vars(args))
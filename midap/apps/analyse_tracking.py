@@ -6,20 +6,29 @@ from typing import Union, List
 from midap.tracking.tracking_analysis import FluoChangeAnalysis
 
 
-def main(path: Union[str, os.PathLike], channels: List[str], tracking_class: str):
+def main(
+    path: Union[str, os.PathLike],
+    channels: List[str],
+    tracking_class: str,
+    streaming=False,
+):
     """
     Loads tracking output and adds intensities per cell and channel to dataframe.
     :param path: Path to output folder.
     :param channels: List with channels.
     :param tracking_class: Name of used tracking class.
+    :param streaming: If True, the frames of all channels are read one at a time instead of loading all images.
     """
     fca = FluoChangeAnalysis(path, channels, tracking_class)
     fca.gen_pathnames()
-    fca.load_images()
+    if not streaming:
+        fca.load_images()
     fca.gen_column_names()
 
     df_fluo_change = fca.create_output_df(fca.path_ref_csv)
-    df_fluo_change = fca.add_fluo_intensity(df_fluo_change)
+    df_fluo_change = fca.add_fluo_intensity(
+        df_fluo_change, frames=fca.iter_frames() if streaming else None
+    )
 
     fca.save_fluo_change(df_fluo_change)
 
@@ -9,62 +9,52 @@ from skimage.measure import regionprops_table
 import pandas as pd
 from tqdm import tqdm
 
-
-def load_img_stack(path: Union[str, os.PathLike], files: List[Union[str, os.PathLike]]):
-    """
-    Loads all imgs from folder and combines them to stack.
-    :param path: Path to channel folder.
-    :param files: List with file names of images.
-    """
-    stack = []
-    for f in files:
-        stack.append(io.imread(path.joinpath(f)))
-    stack = np.array(stack)
-    return stack
+from midap.tracking.tracking_analysis import FluoChangeAnalysis
 
 
-def fluo_analysis_per_channel(
-    path: Union[str, os.PathLike], ref_channel: str, add_channel: str
+def fluo_analysis(
+    path: Union[str, os.PathLike], ref_channel: str, add_channels: List[str]
 ):
     """
-    Loads tracking output and adds intensities per cell and channel to dataframe.
+    Computes the morphology of all cells in the segmentations of the reference channel and the mean intensities of all
+    additional channels in a single pass over the frames.
     :param path: Path to output folder.
-    :param channels: List with channels.
-    :param tracking_class: Name of used tracking class.
+    :param ref_channel: The reference channel with the segmentations.
+    :param add_channels: The additional channels, the intensity properties of the morphology are computed from the raw
+                         counts of the first one.
+    :return: The dataframe of all cells with the labels as index.
     """
 
     # create path's
-    path_ref_channel = Path(path).joinpath(ref_channel)
-    path_add_channel = Path(path).joinpath(add_channel)
-
-    path_ref_ch_seg = path_ref_channel.joinpath("seg_im")
-    path_add_ch_img = path_add_channel.joinpath("cut_im")
-    path_add_ch_img_raw = path_add_channel.joinpath("cut_im_rawcounts")
+    path_ref_ch_seg = Path(path).joinpath(ref_channel, "seg_im")
+    paths_add_ch_img = [Path(path).joinpath(c, "cut_im") for c in add_channels]
+    paths_add_ch_img_raw = [
+        Path(path).joinpath(c, "cut_im_rawcounts") for c in add_channels
+    ]
 
     # get all file names from folder
     ref_ch_seg_all_files = np.sort(os.listdir(path_ref_ch_seg))
-    add_ch_img_all_files = np.sort(os.listdir(path_add_ch_img))
-    add_ch_img_raw_all_files = np.sort(os.listdir(path_add_ch_img_raw))
-
-    # load img stacks
-    segs_ref_ch = load_img_stack(path_ref_ch_seg, ref_ch_seg_all_files)
-    img_add_ch = load_img_stack(path_add_ch_img, add_ch_img_all_files)
-    img_add_ch_raw = load_img_stack(path_add_ch_img_raw, add_ch_img_raw_all_files)
+    add_ch_img_all_files = [np.sort(os.listdir(p)) for p in paths_add_ch_img]
+    add_ch_img_raw_all_files = [np.sort(os.listdir(p)) for p in paths_add_ch_img_raw]
 
     # Loop through all frames
-    df_all = pd.DataFrame()
-
-    for frame in tqdm(range(len(segs_ref_ch))):
-        ref_ch = segs_ref_ch[frame]
-        add_ch = img_add_ch[frame]
-        add_ch_raw = img_add_ch_raw[frame]
+    df_frames = []
+    for frame in tqdm(range(len(ref_ch_seg_all_files))):
+        ref_ch = io.imread(path_ref_ch_seg.joinpath(ref_ch_seg_all_files[frame]))
+        add_chs = [
+            io.imread(p.joinpath(files[frame]))
+            for p, files in zip(paths_add_ch_img, add_ch_img_all_files)
+        ]
+        add_chs_raw = [
+            io.imread(p.joinpath(files[frame]))
+            for p, files in zip(paths_add_ch_img_raw, add_ch_img_raw_all_files)
+        ]
 
         props = regionprops_table(
             ref_ch,
-            intensity_image=add_ch_raw,
+            intensity_image=add_chs_raw[0],
             properties=(
                 "label",
-                "coords",
                 "area",
                 "bbox",
                 "intensity_max",
@@ -80,18 +70,20 @@ def fluo_analysis_per_channel(
 
         df = df.set_index("label")
 
-        intensities_add_ch = []
-        intensities_raw_add_ch = []
-
-        # Loop through all cells of frame
-        for i in df.index:
-            row, col = df.loc[i].coords.T
-            intensities_add_ch.append(np.mean(add_ch[row, col]))
-            intensities_raw_add_ch.append(np.mean(add_ch_raw[row, col]))
-
-        df["intensity_" + add_channel] = intensities_add_ch
-        df["intensity_raw_" + add_channel] = intensities_raw_add_ch
-        df["frame_number"] = [frame] * len(df.index)
+        # the mean intensities of all cells per channel, the frame number follows the first channel
+        for num, (add_channel, add_ch, add_ch_raw) in enumerate(
+            zip(add_channels, add_chs, add_chs_raw)
+        ):
+            _, intensities_add_ch = FluoChangeAnalysis.get_mean_intensities(
+                ref_ch, add_ch[np.newaxis]
+            )
+            _, intensities_raw_add_ch = FluoChangeAnalysis.get_mean_intensities(
+                ref_ch, add_ch_raw[np.newaxis]
+            )
+            df["intensity_" + add_channel] = intensities_add_ch[:, 0]
+            df["intensity_raw_" + add_channel] = intensities_raw_add_ch[:, 0]
+            if num == 0:
+                df["frame_number"] = frame
 
         df = df.rename(
             columns={
@@ -104,11 +96,21 @@ def fluo_analysis_per_channel(
             }
         )
 
-        df.drop(["coords"], axis=1, inplace=True)
+        df_frames.append(df)
+
+    return pd.concat(df_frames)
 
-        df_all = pd.concat([df_all, df])
 
-    return df_all
+def fluo_analysis_per_channel(
+    path: Union[str, os.PathLike], ref_channel: str, add_channel: str
+):
+    """
+    Loads tracking output and adds intensities per cell and channel to dataframe.
+    :param path: Path to output folder.
+    :param ref_channel: The reference channel with the segmentations.
+    :param add_channel: The additional channel.
+    """
+    return fluo_analysis(path=path, ref_channel=ref_channel, add_channels=[add_channel])
 
 
 def main(path: Union[str, os.PathLike], channels: List[str]):
@@ -116,20 +118,16 @@ def main(path: Union[str, os.PathLike], channels: List[str]):
     Loads tracking output and adds intensities per cell and channel to dataframe.
     :param path: Path to output folder.
     :param channels: List with channels.
-    :param tracking_class: Name of used tracking class.
     """
     add_channels = channels[1:]
 
-    df_all_channels = pd.DataFrame()
-    for add_channel in add_channels:
-        df = fluo_analysis_per_channel(
-            path=path, ref_channel=channels[0], add_channel=add_channel
+    # all channels are analysed with a single pass over the segmentations
+    if len(add_channels) > 0:
+        df_all_channels = fluo_analysis(
+            path=path, ref_channel=channels[0], add_channels=add_channels
         )
-        df_all_channels = pd.concat([df_all_channels, df], axis=1)
-
-    df_all_channels = df_all_channels.loc[
-        :, ~df_all_channels.columns.duplicated()
-    ].copy()
+    else:
+        df_all_channels = pd.DataFrame()
 
     path_ref_channel = Path(path).joinpath(channels[0])
     df_all_channels.to_csv(path_ref_channel.joinpath("fluo_intensities.csv"))
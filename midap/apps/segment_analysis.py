@@ -1,13 +1,14 @@
 import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
 
 import numpy as np
 import pandas as pd
 import argparse
 
 from skimage import io
-from skimage.measure import regionprops
 from pathlib import Path
-from typing import Union
+from typing import Tuple, Union
 from tqdm import tqdm
 
 from midap.utils import get_logger
@@ -16,13 +17,61 @@ from midap.utils import get_logger
 ###########
 
 
+def get_axis_lengths(seg: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Calculate the minor and major axis lengths of all cells of a segmentation like regionprops, the lengths are
+    computed from the eigenvalues of the inertia tensors of the cells, which are labeled sums over all pixels
+    :param seg: The segmentation (labelled)
+    :returns: The minor and major axis lengths of all cells sorted by label
+    """
+    # the labels of the foreground pixels, large labels are made contiguous
+    rows, cols = np.nonzero(seg)
+    labels = seg[rows, cols]
+    if labels.max(initial=0) > seg.size:
+        _, labels = np.unique(labels, return_inverse=True)
+    counts = np.bincount(labels)
+    num_pixels = np.maximum(counts, 1)
+
+    # the central second moments with the deviations from the centroids
+    d_rows = rows - (np.bincount(labels, weights=rows) / num_pixels)[labels]
+    d_cols = cols - (np.bincount(labels, weights=cols) / num_pixels)[labels]
+    cells = counts > 0
+    mu_rr = np.bincount(labels, weights=d_rows * d_rows)[cells] / counts[cells]
+    mu_cc = np.bincount(labels, weights=d_cols * d_cols)[cells] / counts[cells]
+    mu_rc = np.bincount(labels, weights=d_rows * d_cols)[cells] / counts[cells]
+
+    # the eigenvalues of the inertia tensor [[mu_cc, -mu_rc], [-mu_rc, mu_rr]]
+    half_trace = (mu_rr + mu_cc) / 2
+    delta = np.sqrt(((mu_cc - mu_rr) / 2) ** 2 + mu_rc**2)
+    eigval_max = half_trace + delta
+    eigval_min = np.clip(half_trace - delta, 0, None)
+
+    return 4 * np.sqrt(eigval_min), 4 * np.sqrt(eigval_max)
+
+
+def get_frame_stats(seg: np.ndarray) -> Tuple[int, int]:
+    """
+    Calculate the cell count and the number of killed cells of a segmentation, cells with a ratio between minor and
+    major axis larger than 0.7 are counted as killed
+    :param seg: The segmentation (labelled)
+    :returns: The number of cells and the number of kills
+    """
+    minor, major = get_axis_lengths(seg)
+
+    # compute ratio between minor and major axis
+    # (only of major axis length is larger than 0)
+    minor_to_major = minor[major > 0] / major[major > 0]
+
+    return len(major), int(np.sum(minor_to_major > 0.7))
+
+
 def count_cells(seg: np.ndarray):
     """
     Calculate the cell count of a segmentation
     :param seg: The input segmentation
     :returns: The number of cells found in the segmentation
     """
-    return len(np.unique(seg)) - 1
+    return get_frame_stats(seg)[0]
 
 
 def count_killed(seg: np.ndarray):
@@ -31,64 +80,67 @@ def count_killed(seg: np.ndarray):
     :param seg: The segmentation
     :returns: The number of kills
     """
-    # compute regionprops
-    regions = regionprops(seg)
+    return get_frame_stats(seg)[1]
 
-    # compute ratio between minor and major axis
-    # (only of major axis length is larger than 0)
-    minor_to_major = np.array(
-        [
-            r.minor_axis_length / r.major_axis_length
-            for r in regions
-            if r.major_axis_length > 0
-        ]
-    )
-
-    # get number of cells with ratio > 0.5
-    num_killed = len(np.where(minor_to_major > 0.7)[0])
 
-    return num_killed
+def analyse_frame(file: Union[str, bytes, os.PathLike]) -> Tuple[int, int]:
+    """
+    Reads a segmentation and calculates its stats, defined on module level such that it can be used in a process pool
+    :param file: The file of the segmentation
+    :returns: The number of cells and the number of kills
+    """
+    return get_frame_stats(io.imread(file))
 
 
 def main(
     path_seg: Union[str, bytes, os.PathLike],
     path_result: Union[str, bytes, os.PathLike],
     loglevel=7,
+    num_workers=1,
+    parquet=False,
 ):
     """
     Analyses the segmentation images in a given folder
     :param path_seg: The directory containing the segmented images (labelled)
     :param path_result: The directory to save the results
     :param loglevel: The loglevel between 0 and 7 (defaults to 7)
+    :param num_workers: The number of processes that analyse the frames, the frames are analysed in the main process
+                        if this is 1
+    :param parquet: If True, the results are additionally saved as parquet file, this requires pyarrow or fastparquet
     """
 
     # logging
     logger = get_logger(__file__, loglevel)
     logger.info(f"Analysing segmentation of: {path_seg}")
 
-    # computer number of living and killed cells
-    num_cells = []
-    num_killed = []
-
     # transform to paths
     path_seg = Path(path_seg)
     path_result = Path(path_result)
 
-    # cycle through everything
-    for p in tqdm(sorted(path_seg.iterdir())):
-        img = io.imread(p)
-        num_cells.append(count_cells(img))
-        num_killed.append(count_killed(img))
+    # computer number of living and killed cells, every frame is independent
+    files = sorted(path_seg.iterdir())
+    with ExitStack() as stack:
+        if num_workers > 1 and len(files) > 1:
+            executor = stack.enter_context(ProcessPoolExecutor(max_workers=num_workers))
+            stats = executor.map(
+                analyse_frame,
+                files,
+                chunksize=max(1, len(files) // (4 * num_workers)),
+            )
+        else:
+            stats = map(analyse_frame, files)
+        stats = np.array(list(tqdm(stats, total=len(files))), dtype=int).reshape(-1, 2)
 
     # crete a dataframe
-    num_cells = np.array(num_cells)
-    num_killed = np.array(num_killed)
+    num_cells, num_killed = stats.T
     num_living = num_cells - num_killed
     d = {"all cells": num_cells, "living cells": num_living, "killed cells": num_killed}
     df_cells = pd.DataFrame(data=d)
 
     # save
     df_cells.to_csv(path_result.joinpath("cell_number.csv"))
+    if parquet:
+        df_cells.to_parquet(path_result.joinpath("cell_number.parquet"))
 
 
 # main
@@ -109,6 +161,17 @@ if __name__ == "__main__":
     parser.add_argument(
         "--loglevel", type=int, default=7, help="Loglevel of the script."
     )
+    parser.add_argument(
+        "--num_workers",
+        type=int,
+        default=1,
+        help="The number of processes that analyse the frames.",
+    )
+    parser.add_argument(
+        "--parquet",
+        action="store_true",
+        help="Additionally save the results as parquet file, requires pyarrow or fastparquet.",
+    )
     args = parser.parse_args()
 
     # call the main with unpacked args
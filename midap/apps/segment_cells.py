@@ -1,12 +1,12 @@
 import argparse
 import os
 
-from typing import Union
+from typing import Optional, Union
 from pathlib import Path
 
 # to get all subclasses
 from midap.segmentation import *
-from midap.segmentation import base_segmentator
+from midap.segmentation import base_segmentator, unet_segmentator
 from midap.utils import get_inheritors
 
 ### Functions
@@ -23,6 +23,9 @@ def main(
     network_name: Union[str, bytes, os.PathLike, None] = None,
     just_select=False,
     img_threshold=1.0,
+    batch_size=1,
+    tile_size: Optional[int] = None,
+    tile_overlap=32,
 ):
     """
     Performs cell segmentation on all images in a given directory
@@ -35,6 +38,11 @@ def main(
     :param network_name: Optional name of the network to skip interactive selection
     :param just_select: If True, just the network selection is performed
     :param img_threshold: The threshold for the image to cap large values of the pixels
+    :param batch_size: The number of images (or tiles) that are predicted at once, only used by the UNet and hybrid
+                       segmentations
+    :param tile_size: If not None, large images are predicted in overlapping square tiles of this size, only used by
+                      the UNet and hybrid segmentations
+    :param tile_overlap: The overlap of neighbouring tiles in pixels, only used by the UNet and hybrid segmentations
     :return: The name of the selected model weights, note that if just_select is True and the model weights are provided
              a check is performed if the model class actually exists and the model weights are returned if so
     """
@@ -49,12 +57,20 @@ def main(
     if class_instance is None:
         raise ValueError(f"Chosen class does not exist: {segmentation_class}")
 
+    # only the UNet type segmentations predict in batches and tiles
+    kwargs = {}
+    if issubclass(class_instance, unet_segmentator.UNetSegmentation):
+        kwargs = dict(
+            batch_size=batch_size, tile_size=tile_size, tile_overlap=tile_overlap
+        )
+
     # get the Predictor
     pred = class_instance(
         path_model_weights=path_model_weights,
         postprocessing=postprocessing,
         model_weights=network_name,
         img_threshold=img_threshold,
+        **kwargs,
     )
 
     # set the paths
@@ -114,6 +130,24 @@ if __name__ == "__main__":
     parser.add_argument(
         "--postprocessing", action="store_true", help="Flag for postprocessing."
     )
+    parser.add_argument(
+        "--batch_size",
+        type=int,
+        default=1,
+        help="The number of images (or tiles) that are predicted at once by the UNet type segmentations.",
+    )
+    parser.add_argument(
+        "--tile_size",
+        type=int,
+        default=None,
+        help="If set, the UNet type segmentations predict large images in overlapping tiles of this size.",
+    )
+    parser.add_argument(
+        "--tile_overlap",
+        type=int,
+        default=32,
+        help="The overlap of neighbouring tiles in pixels.",
+    )
     args = parser.parse_args()
 
     # run
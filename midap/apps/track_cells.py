@@ -1,7 +1,7 @@
 import os
 import argparse
 from pathlib import Path
-from typing import Union
+from typing import Optional, Union
 
 # to get all subclasses
 from midap.tracking import *
@@ -9,12 +9,22 @@ from midap.tracking import base_tracking, cell_props
 from midap.utils import get_logger, get_inheritors
 
 
-def main(path: Union[str, bytes, os.PathLike], tracking_class: str, loglevel=7):
+def main(
+    path: Union[str, bytes, os.PathLike],
+    tracking_class: str,
+    loglevel=7,
+    compression: Optional[str] = None,
+    streaming=False,
+):
     """
     The main function to run the tracking
     :param path: Path to the channel
     :param tracking_class: The name of the tracking class
     :param loglevel: The loglevel between 0 and 7, defaults to highest level
+    :param compression: The lossless filter of the output h5 files, either None (no compression), "gzip", "lzf" or
+                        "blosc", compressed datasets are chunked frame by frame
+    :param streaming: If True, the Delta type trackings write their inputs and results frame by frame to the disk
+                      instead of keeping all frames in memory, this is ignored by the other tracking classes
     """
 
     # logging
@@ -62,7 +72,13 @@ def main(path: Union[str, bytes, os.PathLike], tracking_class: str, loglevel=7):
         target_size=target_size,
         connectivity=connectivity,
     )
-    data_file, csv_file = tr.track_all_frames(output_folder)
+    # only the Delta type trackings can stream their intermediate results
+    kwargs = {}
+    if issubclass(class_instance, base_tracking.DeltaTypeTracking):
+        kwargs["streaming"] = streaming
+    data_file, csv_file = tr.track_all_frames(
+        output_folder, compression=compression, **kwargs
+    )
 
     # add the region props
     if data_file is not None and csv_file is not None:
@@ -89,6 +105,19 @@ if __name__ == "__main__":
     parser.add_argument(
         "--loglevel", type=int, default=7, help="Loglevel of the script."
     )
+    parser.add_argument(
+        "--compression",
+        type=str,
+        choices=["gzip", "lzf", "blosc"],
+        default=None,
+        help="Lossless filter of the output h5 files, the files are not compressed by default.",
+    )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Write the inputs and results of the Delta type trackings frame by frame to the disk instead of keeping "
+        "all frames in memory.",
+    )
     args = parser.parse_args()
 
     # call the main
@@ -255,6 +255,16 @@ def run_family_machine(config, checkpoint, main_args, logger, restart=False):
                         segmentation_class=segmentation_class,
                         just_select=True,
                         img_threshold=config.getfloat(identifier, "ImgThreshold"),
+                        batch_size=config.getint(
+                            identifier, "SegmentationBatchSize", fallback=1
+                        ),
+                        tile_size=config.getint(
+                            identifier, "SegmentationTileSize", fallback=0
+                        )
+                        or None,
+                        tile_overlap=config.getint(
+                            identifier, "SegmentationTileOverlap", fallback=32
+                        ),
                     )
 
                     # save to config
@@ -391,6 +401,16 @@ def run_family_machine(config, checkpoint, main_args, logger, restart=False):
                         network_name=model_weights,
                         segmentation_class=config.get(identifier, "SegmentationClass"),
                         img_threshold=config.getfloat(identifier, "ImgThreshold"),
+                        batch_size=config.getint(
+                            identifier, "SegmentationBatchSize", fallback=1
+                        ),
+                        tile_size=config.getint(
+                            identifier, "SegmentationTileSize", fallback=0
+                        )
+                        or None,
+                        tile_overlap=config.getint(
+                            identifier, "SegmentationTileOverlap", fallback=32
+                        ),
                     )
                     # analyse the images
                     segment_analysis.main(
@@ -431,6 +451,9 @@ def run_family_machine(config, checkpoint, main_args, logger, restart=False):
                         path=current_path.joinpath(channel),
                         tracking_class=config.get(identifier, "TrackingClass"),
                         loglevel=main_args.loglevel,
+                        streaming=config.getboolean(
+                            identifier, "TrackingStreaming", fallback=False
+                        ),
                     )
 
             # Tracking postprocessing
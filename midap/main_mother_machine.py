@@ -258,6 +258,16 @@ def run_mother_machine(config, checkpoint, main_args, logger, restart=False):
                         segmentation_class=segmentation_class,
                         just_select=True,
                         img_threshold=config.getfloat(identifier, "ImgThreshold"),
+                        batch_size=config.getint(
+                            identifier, "SegmentationBatchSize", fallback=1
+                        ),
+                        tile_size=config.getint(
+                            identifier, "SegmentationTileSize", fallback=0
+                        )
+                        or None,
+                        tile_overlap=config.getint(
+                            identifier, "SegmentationTileOverlap", fallback=32
+                        ),
                     )
 
                     # save to config
@@ -409,6 +419,16 @@ def run_mother_machine(config, checkpoint, main_args, logger, restart=False):
                                 identifier, "SegmentationClass"
                             ),
                             img_threshold=config.getfloat(identifier, "ImgThreshold"),
+                            batch_size=config.getint(
+                                identifier, "SegmentationBatchSize", fallback=1
+                            ),
+                            tile_size=config.getint(
+                                identifier, "SegmentationTileSize", fallback=0
+                            )
+                            or None,
+                            tile_overlap=config.getint(
+                                identifier, "SegmentationTileOverlap", fallback=32
+                            ),
                         )
                         # analyse the images
                         segment_analysis.main(
@@ -449,6 +469,9 @@ def run_mother_machine(config, checkpoint, main_args, logger, restart=False):
                             path=current_path.joinpath(channel, f"chamber_{chamber}"),
                             tracking_class=config.get(identifier, "TrackingClass"),
                             loglevel=main_args.loglevel,
+                            streaming=config.getboolean(
+                                identifier, "TrackingStreaming", fallback=False
+                            ),
                         )
 
                 with CheckpointManager(
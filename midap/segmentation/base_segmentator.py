@@ -27,6 +27,9 @@ class SegmentationPredictor(ABC):
     # this logger will be shared by all instances and subclasses
     logger = logger
 
+    # If True, the segmentation method gets a generator of the images instead of a list
+    stream_images = False
+
     def __init__(
         self,
         path_model_weights: Union[str, bytes, os.PathLike],
@@ -62,7 +65,6 @@ class SegmentationPredictor(ABC):
         self.model_weights = model_weights
         self.segmentation_method = None
 
-        
     def run_image_stack_jupyter(self, imgs, model_weights, clean_border: bool):
         """
         Performs image segmentation, postprocessing and storage for all images found in channel_path
@@ -72,8 +74,9 @@ class SegmentationPredictor(ABC):
         # segement all images
         self.segment_images_jupyter(imgs, model_weights)
 
-
-    def run_image_stack(self, channel_path: Union[str, bytes, os.PathLike], clean_border: bool):
+    def run_image_stack(
+        self, channel_path: Union[str, bytes, os.PathLike], clean_border: bool
+    ):
         """
         Performs image segmentation, postprocessing and storage for all images found in channel_path
         :param channel_path: Directory of the channel used for the analysis
@@ -91,9 +94,9 @@ class SegmentationPredictor(ABC):
 
         # We read in all the images
         self.logger.info("Reading in images...")
-        imgs = []
-        for p in tqdm(path_imgs):
-            imgs.append(io.imread(os.path.join(path_cut, p)))
+        imgs = (io.imread(os.path.join(path_cut, p)) for p in tqdm(path_imgs))
+        if not self.stream_images:
+            imgs = list(imgs)
 
         # segement all images
         self.logger.info("Segmenting images...")
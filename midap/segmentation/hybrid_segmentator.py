@@ -1,5 +1,5 @@
 import os
-from typing import Collection, List, Union
+from typing import Iterable, List, Union
 
 import numpy as np
 
@@ -59,36 +59,19 @@ class HybridSegmentation(UNetSegmentation):
 
         return segs
 
-    def seg_method_hybrid(self, imgs_in: Collection[np.ndarray]):
+    def seg_method_hybrid(self, imgs_in: Iterable[np.ndarray]):
         """
         Performs image segmentation with hybrid networkd and the selected model weights
-        :param imgs_in: List of input images
+        :param imgs_in: Iterable of input images, can be a generator
         :return: List of segmentations
         """
 
-        # pad the images
-        imgs_pad = []
-        for img in imgs_in:
-            img_pad = self.pad_image(img)
-            imgs_pad.append(img_pad)
-        self.logger.info("Preparing watershed...")
-        imgs_seg = self.seg_method_watershed(imgs_pad, min_val=0.15, max_val=0.17)
-        imgs_seg = np.concatenate(imgs_seg, axis=0)
+        def inputs():
+            for img in imgs_in:
+                # the watershed is performed on the padded image
+                img_pad = self.pad_image(img)
+                img_pad = self.scale_pixel_vals(img_pad)
+                img_seg = self.segment_region_based(img_pad, min_val=0.15, max_val=0.17)
+                yield np.concatenate([img_pad, img_seg], axis=-1)[0], img.shape
 
-        # scale padded imgs
-        imgs_pad = np.concatenate([self.scale_pixel_vals(img) for img in imgs_pad])
-
-        # segments
-        model_pred = UNetv1(input_size=imgs_pad.shape[1:3] + (2,), inference=True)
-        model_pred.load_weights(self.model_weights)
-        y_preds = model_pred.predict(
-            np.concatenate([imgs_pad, imgs_seg], axis=-1), batch_size=1, verbose=1
-        )
-
-        # remove tha padding and transform to segmentation
-        segs = []
-        for i, y in enumerate(y_preds):
-            seg = (self.undo_padding(y[None, ...]) > 0.5).astype(int)
-            segs.append(seg)
-
-        return segs
+        return self.segment_inputs(inputs())
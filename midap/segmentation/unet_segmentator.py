@@ -1,6 +1,6 @@
 import os
 from pathlib import Path
-from typing import Collection, Union, List
+from typing import Collection, Iterable, Iterator, List, Optional, Tuple, Union
 
 import matplotlib.pyplot as plt
 import numpy as np
@@ -21,16 +21,47 @@ class UNetSegmentation(SegmentationPredictor):
 
     supported_setups = ["Family_Machine", "Mother_Machine"]
 
-    def __init__(self, *args, **kwargs):
+    # the images are only read when they are segmented
+    stream_images = True
+
+    def __init__(
+        self,
+        *args,
+        batch_size=1,
+        tile_size: Optional[int] = None,
+        tile_overlap=32,
+        **kwargs,
+    ):
         """
         Initializes the UNetSegmentation using the base class init
         :*args: Arguments used for the base class init
+        :param batch_size: The number of images (or tiles) that are predicted at once
+        :param tile_size: If not None, the images are predicted in overlapping square tiles of this size which are
+                          blended together, this limits the memory of large images. Has to be divisible by div.
+        :param tile_overlap: The overlap of neighbouring tiles in pixels
         :**kwargs: Keyword arguments used for the basecalss init
         """
 
         # base class init
         super().__init__(*args, **kwargs)
 
+        if tile_size is not None:
+            if tile_size % self.div != 0:
+                raise ValueError(
+                    f"The tile size {tile_size} has to be divisible by {self.div}!"
+                )
+            if not 0 <= tile_overlap < tile_size:
+                raise ValueError(
+                    f"The tile overlap {tile_overlap} has to be in [0, {tile_size})!"
+                )
+
+        self.batch_size = batch_size
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+
+        # every model is only built and loaded once per input size and weights and reused afterwards
+        self.models = {}
+
     def set_segmentation_method(self, path_to_cutouts: Union[str, bytes, os.PathLike]):
         """
         Performs the weight selection for the segmentation network. A custom method should use this function to set
@@ -137,34 +168,157 @@ class UNetSegmentation(SegmentationPredictor):
         else:
             self.segmentation_method = self.seg_method_unet
 
-    def seg_method_unet(self, imgs_in: Collection[np.ndarray]):
+    def get_model(self, input_size: Tuple[int, int, int]):
         """
-        Performs image segmentation with unet and the selected model weights
-        :param imgs_in: List of input images
+        Returns the UNet for an input size with the selected model weights, every model is only built and loaded once
+        per input size and reused afterwards, e.g. for all tiles or images of the same size
+        :param input_size: The input size of the model (rows, columns, channels)
+        :return: The model
+        """
+
+        key = (tuple(input_size), str(self.model_weights))
+        if key not in self.models:
+            model = UNetv1(input_size=tuple(input_size), inference=True)
+            model.load_weights(self.model_weights)
+            self.models[key] = model
+
+        return self.models[key]
+
+    def predict_batches(self, inputs: Iterable[np.ndarray]) -> Iterator[np.ndarray]:
+        """
+        Predicts the inputs in batches of batch_size, consecutive inputs of the same shape are batched together and
+        only one batch is held in memory at a time
+        :param inputs: An iterable of model inputs (rows, columns, channels), can be a generator
+        :return: A generator of the predictions (rows, columns) in the order of the inputs
+        """
+
+        batch = []
+        for x in inputs:
+            if len(batch) == self.batch_size or (batch and x.shape != batch[0].shape):
+                yield from self._predict_batch(batch)
+                batch = []
+            batch.append(x)
+
+        if len(batch) > 0:
+            yield from self._predict_batch(batch)
+
+    def _predict_batch(self, batch: List[np.ndarray]):
+        """
+        Predicts a batch of inputs of the same shape
+        :param batch: A list of model inputs (rows, columns, channels)
+        :return: The predictions (batch, rows, columns)
+        """
+
+        model = self.get_model(batch[0].shape)
+        y_preds = model.predict_on_batch(np.array(batch, dtype=np.float32))
+
+        return y_preds[..., 0]
+
+    def get_tiles(self, shape: Tuple[int, ...]):
+        """
+        Splits an image into square tiles of size tile_size that overlap by at least tile_overlap, the last tile of a
+        row or column is aligned with the border of the image. Images smaller than the tiles are a single tile.
+        :param shape: The shape of the image, the first two dimensions are split
+        :return: A list of the tiles as slices (rows, columns) and the blending weights of the tiles
+        """
+
+        starts = []
+        sizes = []
+        for n in shape[:2]:
+            size = min(self.tile_size, n)
+            if n <= size:
+                axis_starts = [0]
+            else:
+                axis_starts = list(range(0, n - size, size - self.tile_overlap))
+                axis_starts.append(n - size)
+            starts.append(axis_starts)
+            sizes.append(size)
+
+        # the weights increase linearly over the overlap such that the tiles are blended smoothly
+        ramps = []
+        for size in sizes:
+            dist = np.minimum(np.arange(size), np.arange(size)[::-1]) + 1
+            ramps.append(np.minimum(dist, self.tile_overlap + 1).astype(np.float32))
+        weights = np.outer(*ramps)
+
+        tiles = [
+            (slice(r, r + sizes[0]), slice(c, c + sizes[1]))
+            for r in starts[0]
+            for c in starts[1]
+        ]
+
+        return tiles, weights
+
+    def predict_tiled(self, x: np.ndarray):
+        """
+        Predicts a model input in overlapping tiles, the tiles are predicted in batches with the same model and the
+        overlapping predictions are blended with linear weights
+        :param x: The model input (rows, columns, channels), the rows and columns have to be divisible by div
+        :return: The prediction (rows, columns)
+        """
+
+        tiles, weights = self.get_tiles(x.shape)
+
+        y_sum = np.zeros(x.shape[:2], dtype=np.float32)
+        w_sum = np.zeros(x.shape[:2], dtype=np.float32)
+        y_preds = self.predict_batches(x[tile] for tile in tiles)
+        for tile, y in zip(tiles, y_preds):
+            y_sum[tile] += weights * y
+            w_sum[tile] += weights
+
+        return y_sum / w_sum
+
+    def predict(self, inputs: Iterable[np.ndarray]) -> Iterator[np.ndarray]:
+        """
+        Predicts the model inputs in batches, in tiles if tile_size is set
+        :param inputs: An iterable of model inputs (rows, columns, channels), can be a generator
+        :return: A generator of the predictions (rows, columns) in the order of the inputs
+        """
+
+        if self.tile_size is None:
+            yield from self.predict_batches(inputs)
+        else:
+            for x in inputs:
+                yield self.predict_tiled(x)
+
+    def segment_inputs(self, inputs: Iterable[Tuple[np.ndarray, Tuple[int, ...]]]):
+        """
+        Segments padded model inputs, the inputs are consumed lazily such that only the current batch is in memory
+        :param inputs: An iterable of the padded model inputs (rows, columns, channels) and the shapes of the
+                       original images, can be a generator
         :return: List of segmentations
         """
 
-        # pad the images
-        imgs_pad = []
-        for img in imgs_in:
-            img = self.scale_pixel_vals(img)
-            img_pad = self.pad_image(img)
-            imgs_pad.append(img_pad)
-        imgs_pad = np.concatenate(imgs_pad)
+        # the shapes are recorded while the predictions consume the inputs
+        shapes = []
 
-        # segments
-        model_pred = UNetv1(input_size=imgs_pad.shape[1:3] + (1,), inference=True)
-        model_pred.load_weights(self.model_weights)
-        y_preds = model_pred.predict(imgs_pad, batch_size=1, verbose=1)
+        def padded_inputs():
+            for x, shape in inputs:
+                shapes.append(shape)
+                yield x
 
-        # remove tha padding and transform to segmentation
+        # remove tha padding and transform to segmentation, every prediction comes after its input was consumed
         segs = []
-        for i, y in enumerate(y_preds):
-            seg = (self.undo_padding(y[None, ...]) > 0.5).astype(int)
-            segs.append(seg)
+        for i, y in enumerate(self.predict(padded_inputs())):
+            segs.append((y[: shapes[i][0], : shapes[i][1]] > 0.5).astype(int))
 
         return segs
 
+    def seg_method_unet(self, imgs_in: Iterable[np.ndarray]):
+        """
+        Performs image segmentation with unet and the selected model weights
+        :param imgs_in: Iterable of input images, can be a generator
+        :return: List of segmentations
+        """
+
+        # scale and pad the images
+        inputs = (
+            (self.pad_image(self.scale_pixel_vals(img))[0], img.shape)
+            for img in imgs_in
+        )
+
+        return self.segment_inputs(inputs)
+
     def seg_method_watershed(
         self, imgs_in: Collection[np.ndarray], min_val=0.16, max_val=0.19
     ):
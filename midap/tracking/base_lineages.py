@@ -0,0 +1,262 @@
+import os
+from abc import ABC, abstractmethod
+from typing import List
+
+import numpy as np
+import pandas as pd
+from numba import njit, typed, types
+from tqdm import tqdm
+
+from ..utils import get_logger
+
+# get the logger we readout the variable or set it to max output
+if "__VERBOSE" in os.environ:
+    loglevel = int(os.environ["__VERBOSE"])
+else:
+    loglevel = 7
+logger = get_logger(__file__, loglevel)
+
+
+@njit(cache=True)
+def label_transform(labels: np.ndarray, transformations: np.ndarray):
+    """
+    Transforms the labels of a labelled image according to the transformations
+    :param labels: A 3D array TWH of type int32 containing the labels
+    :param transformations: A array of shape (N, 3) of type int32 containing the transformations to apply. The
+                            transformations are of the form (frame, old, new), if the same label of a frame is
+                            transformed multiple times, the last transformation is applied
+    """
+
+    # extract shapes
+    t, n, m = labels.shape
+
+    # sort the transformations by frame, the stable sort keeps the order within a frame
+    order = np.argsort(transformations[:, 0], kind="mergesort")
+    frames = transformations[order, 0]
+
+    for t_step in range(t):
+        # build the transformations dict
+        trans_dict = typed.Dict.empty(key_type=types.int32, value_type=types.int32)
+        start = np.searchsorted(frames, t_step, side="left")
+        stop = np.searchsorted(frames, t_step, side="right")
+        for i in order[start:stop]:
+            trans_dict[transformations[i, 1]] = transformations[i, 2]
+
+        # apply transformations
+        if len(trans_dict) == 0:
+            continue
+        for i in range(n):
+            for j in range(m):
+                if labels[t_step, i, j] in trans_dict:
+                    labels[t_step, i, j] = trans_dict[labels[t_step, i, j]]
+
+
+class Lineages(ABC):
+    """
+    A base class to generate lineages from the links of the cells between consecutive frames
+    """
+
+    # this logger will be shared by all instances and subclasses
+    logger = logger
+
+    # the columns of the tracking output
+    columns = [
+        "frame",
+        "labelID",
+        "trackID",
+        "lineageID",
+        "trackID_d1",
+        "trackID_d2",
+        "split",
+        "trackID_mother",
+        "first_frame",
+        "last_frame",
+    ]
+
+    def init_dataframe(self):
+        """
+        Initialize dataframe for tracking output.
+        :return: An empty dataframe with column labels
+        """
+
+        return pd.DataFrame(columns=self.columns)
+
+    @abstractmethod
+    def get_daughters(self, frame_index: int, cell_label: int):
+        """
+        Returns the labels of the cell in the next frame, this is an abstract method forcing subclasses to implement it
+        :param frame_index: The index of the frame where the cell is located
+        :param cell_label: The label of the cell in the frame given by frame_index
+        :return: A list of labels in the next frame, empty if the cell disappears and two labels if the cell splits
+        """
+        pass
+
+    def track_lineages(self, local_ids: List[np.ndarray], label_dtype=int):
+        """
+        Tracks all cells through all frames, cells that are not part of an existing lineage start a new lineage
+        :param local_ids: A list containing the labels of all cells for each frame
+        :param label_dtype: The dtype of the labelID column
+        :return: The tracking output as dataframe with the global ID as index
+        """
+
+        self.logger.info("Generate lineages...")
+
+        # the rows of the output are collected in preallocated columns
+        self._init_columns(
+            n_rows=sum([len(ids) for ids in local_ids]), label_dtype=label_dtype
+        )
+        # the (first, last) row of each track, all rows of a track are consecutive
+        self._track_rows = {}
+        # the local ids of each frame that are already part of a lineage
+        self._tracked = [set() for _ in range(len(local_ids))]
+
+        # init the track ID that track the cell through multiple cells
+        track_id = 1
+
+        # this goes through all labeled frames
+        for frame_num, current_local_ids in tqdm(
+            enumerate(local_ids), total=len(local_ids)
+        ):
+            # cycle through all local ids
+            for local_id in current_local_ids:
+                # track the cell if it's not already part of a lineage
+                if local_id not in self._tracked[frame_num]:
+                    track_id = self._track_cell(
+                        frame_index=frame_num,
+                        cell_label=local_id,
+                        track_id=track_id,
+                        n_frames=len(local_ids),
+                    )
+
+        return self._columns_to_dataframe()
+
+    def _init_columns(self, n_rows: int, label_dtype=int):
+        """
+        Initializes the columns that are filled while the lineages are generated, missing track IDs are marked with 0
+        :param n_rows: The number of rows to preallocate, the columns grow if more rows are added
+        :param label_dtype: The dtype of the labelID column
+        """
+
+        self._n_rows = 0
+        self._columns = {
+            col: np.zeros(n_rows, dtype=label_dtype if col == "labelID" else int)
+            for col in self.columns
+        }
+
+    def _add_row(self, **values):
+        """
+        Adds a row to the output columns, columns not given are set to 0
+        :param values: The values of the row as column -> value
+        :return: The index of the new row
+        """
+
+        # double the size of the columns if necessary
+        if self._n_rows == len(self._columns["frame"]):
+            for col, arr in self._columns.items():
+                self._columns[col] = np.concatenate(
+                    [arr, np.zeros(len(arr) + 1, dtype=arr.dtype)]
+                )
+
+        row = self._n_rows
+        for col, val in values.items():
+            self._columns[col][row] = val
+        self._n_rows += 1
+
+        return row
+
+    def _columns_to_dataframe(self):
+        """
+        Creates the output dataframe from the collected columns, the global ID is used as index
+        :return: The dataframe with the same columns as the one from init_dataframe
+        """
+
+        data = {}
+        for col, arr in self._columns.items():
+            arr = arr[: self._n_rows]
+            # these columns are not set for all cells
+            if col in ["trackID_d1", "trackID_d2", "trackID_mother"]:
+                arr = pd.arrays.IntegerArray(arr, mask=arr == 0)
+            data[col] = arr
+
+        return pd.DataFrame(data, index=np.arange(1, self._n_rows + 1))
+
+    def _track_cell(
+        self, frame_index: int, cell_label: int, track_id: int, n_frames: int
+    ):
+        """
+        Tracks a cell and all its offspring through the frames. The lineage tree is walked depth first with an
+        explicit stack, such that daughter 1 and all its offspring are tracked before daughter 2. The Python stack
+        depth is therefore independent of the length of the lineage.
+        :param frame_index: The index of the frame where the cell is located
+        :param cell_label: The label of the cell in the frame given by frame_index
+        :param track_id: The tracking ID for this cell, this is also the lineage ID
+        :param n_frames: The total number of frames
+        :return: The next unique tracking id
+        """
+
+        lineage_id = track_id
+
+        # the cells that still need to be tracked: frame index, label, mother ID and daughter number
+        stack = [(frame_index, cell_label, None, None)]
+        while len(stack) > 0:
+            frame_index, cell_label, mother_id, daughter_num = stack.pop()
+
+            # set the trackID of the daughter for all cells of the mother track
+            if mother_id is not None:
+                first, last = self._track_rows[mother_id]
+                self._columns[f"trackID_d{daughter_num}"][first : last + 1] = track_id
+
+            # follow the cell until it splits or disappears
+            first_frame = frame_index
+            first_row = None
+            while True:
+                # add cell to output
+                row = self._add_row(
+                    frame=frame_index,
+                    labelID=cell_label,
+                    trackID=track_id,
+                    lineageID=lineage_id,
+                    first_frame=first_frame,
+                )
+                self._tracked[frame_index].add(cell_label)
+
+                # the mother is only set for the first cell of the track
+                if first_row is None:
+                    first_row = row
+                    if mother_id is not None:
+                        self._columns["trackID_mother"][row] = mother_id
+
+                # last frame
+                if frame_index == n_frames - 1:
+                    daughters = []
+                    break
+
+                # no split occured and the cell is still present
+                daughters = self.get_daughters(
+                    frame_index=frame_index, cell_label=cell_label
+                )
+                if len(daughters) != 1:
+                    break
+                frame_index += 1
+                cell_label = daughters[0]
+
+            if len(daughters) > 2:
+                raise ValueError(
+                    f"Cell with label {cell_label} in frame {frame_index} splits into more than 2 cells!"
+                )
+
+            # split occured if both daughters are present
+            self._columns["split"][row] = int(len(daughters) == 2)
+            # update the last frame for all cells of the track
+            self._columns["last_frame"][first_row : row + 1] = frame_index
+            self._track_rows[track_id] = (first_row, row)
+
+            # daughter 1 is tracked first
+            if len(daughters) == 2:
+                stack.append((frame_index + 1, daughters[1], track_id, 2))
+                stack.append((frame_index + 1, daughters[0], track_id, 1))
+
+            # update track id
+            track_id += 1
+
+        return track_id
@@ -1,18 +1,32 @@
 import datetime
 import os
+import threading
 import time
 from abc import ABC, abstractmethod
-from typing import List, Union, Tuple, Optional
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Any, Callable, Hashable, List, Union, Tuple, Optional
 
+import h5py
 import numpy as np
 import psutil
 import skimage.io as io
-from scipy.spatial import distance_matrix
-from skimage.measure import label, regionprops
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.ndimage import find_objects
+from scipy.spatial import cKDTree
+from skimage.measure import label
 from skimage.transform import resize
 from tqdm import tqdm
 
 from .delta_lineage import DeltaTypeLineages
+from .tracking_data import (
+    IMAGE_DTYPE,
+    LABEL_DTYPE,
+    MASK_DTYPE,
+    get_frame_label_dtype,
+)
 from ..utils import get_logger
 
 process = psutil.Process(os.getpid())
@@ -25,6 +39,170 @@ else:
 logger = get_logger(__file__, loglevel)
 
 
+class FrameCache:
+    """
+    A thread-safe least recently used cache for loaded frames. Every frame is loaded only once, even if it is requested
+    by several threads at the same time, and frames can be loaded ahead of time in a background thread.
+    """
+
+    def __init__(self, max_size=8):
+        """
+        Initializes the cache
+        :param max_size: The maximum number of frames in the cache
+        """
+
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def get(self, key: Hashable, loader: Callable[[], Any]):
+        """
+        Returns a frame from the cache, the frame is loaded if it is not in the cache
+        :param key: The key of the frame
+        :param loader: A function without arguments that loads the frame
+        :return: The frame
+        """
+
+        with self._lock:
+            future = self._frames.get(key)
+            if future is None:
+                self.misses += 1
+                future = self._add(key)
+                load = True
+            else:
+                self.hits += 1
+                self._frames.move_to_end(key)
+                load = False
+
+        if load:
+            self._load(future, loader)
+        return future.result()
+
+    def read_ahead(self, key: Hashable, loader: Callable[[], Any]):
+        """
+        Loads a frame in a background thread if it is not in the cache
+        :param key: The key of the frame
+        :param loader: A function without arguments that loads the frame
+        """
+
+        with self._lock:
+            if key in self._frames:
+                return
+            self.misses += 1
+            future = self._add(key)
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=1)
+
+        self._pool.submit(self._load, future, loader)
+
+    def close(self, wait=True):
+        """
+        Shuts down the background thread, the cached frames are kept and a new thread is started by the next read ahead
+        :param wait: If True, waits until the frames that are loaded in the background are ready
+        """
+
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __del__(self):
+        # the cache can be collected by its own background thread, which can not wait for itself
+        self.close(wait=False)
+
+    def clear(self):
+        """
+        Removes all frames from the cache and resets the counters
+        """
+
+        with self._lock:
+            self._frames.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def _add(self, key: Hashable):
+        """
+        Adds a placeholder for a frame to the cache and removes the least recently used frames, needs the lock
+        :param key: The key of the frame
+        :return: The future of the frame
+        """
+
+        future = self._frames[key] = Future()
+        while len(self._frames) > self.max_size:
+            self._frames.popitem(last=False)
+        return future
+
+    @staticmethod
+    def _load(future: Future, loader: Callable[[], Any]):
+        """
+        Loads a frame into its placeholder
+        :param future: The placeholder of the frame
+        :param loader: A function without arguments that loads the frame
+        """
+
+        try:
+            future.set_result(loader())
+        except Exception as e:
+            future.set_exception(e)
+
+
+def read_image(
+    img_file: Union[str, bytes, os.PathLike],
+    target_size: Optional[Tuple[int, int]] = None,
+):
+    """
+    Reads and resizes the raw image of a single time frame from the disk without its segmentation. This is a module
+    level function such that it can be used in worker processes.
+    :param img_file: The file containing the raw image
+    :param target_size: The shape of the resized image, if None the image will not be resized
+    :return: The loaded and resized image of type IMAGE_DTYPE
+    """
+
+    img = io.imread(img_file)
+    if target_size is None:
+        target_size = img.shape
+    return resize(img, target_size, order=1).astype(IMAGE_DTYPE)
+
+
+def read_frame(
+    img_file: Union[str, bytes, os.PathLike],
+    seg_file: Union[str, bytes, os.PathLike],
+    target_size: Optional[Tuple[int, int]] = None,
+    label=False,
+):
+    """
+    Reads and resizes the raw image and the segmentation of a single time frame from the disk. This is a module level
+    function such that it can be used in worker processes.
+    :param img_file: The file containing the raw image
+    :param seg_file: The file containing the segmentation
+    :param target_size: The shape of the resized images, if None the images will not be resized
+    :param label: If True, the labelled image is returned, note the binary segmentation
+    :return: The loaded and resized image of type IMAGE_DTYPE and the segmentation as binary mask or labels of the
+             frame label dtype
+    """
+
+    img = read_image(img_file, target_size=target_size)
+    if target_size is None:
+        target_size = img.shape
+    if label:
+        seg = resize(io.imread(seg_file), target_size, order=0)
+        # the labels are only unique within the frame
+        seg = seg.astype(get_frame_label_dtype(seg.max()))
+    else:
+        seg = resize(io.imread(seg_file) > 0, target_size, order=0).astype(MASK_DTYPE)
+
+    return img, seg
+
+
 class Tracking(ABC):
     """
     A class for cell tracking using the U-Net
@@ -41,6 +219,8 @@ class Tracking(ABC):
         input_size: Optional[Tuple[int, int, int]] = None,
         target_size: Optional[Tuple[int, int]] = None,
         connectivity=1,
+        cache_size=8,
+        read_ahead=0,
     ):
         """
         Initializes the class instance
@@ -51,6 +231,9 @@ class Tracking(ABC):
                            this will be increased if necessary
         :param target_size: A tuple of ints indicating the shape of the target size of the input images, if None
                             the images will not be resized after reading
+        :param connectivity: The connectivity used to label the segmentations
+        :param cache_size: The number of loaded frames that are kept in the frame cache
+        :param read_ahead: The number of following frames that are loaded in the background when a frame is loaded
         """
 
         # set the variables
@@ -65,6 +248,69 @@ class Tracking(ABC):
         self.max_input_size = 256
         self.target_size = target_size
         self.connectivity = connectivity
+        self.frame_cache = FrameCache(max_size=cache_size)
+        self.read_ahead = read_ahead
+
+    def load_frame(self, frame: int, label=False):
+        """
+        Loads and resizes the raw image and the segmentation of a single time frame. The frames are cached, the
+        returned arrays are read-only and shared between all calls.
+        :param frame: Number of the frame.
+        :param label: If True, the labelled image is returned, note the binary segmentation
+        :return: The loaded and resized image of type IMAGE_DTYPE and the segmentation as binary mask or labels of the
+                 frame label dtype
+        """
+
+        # read the next frames in the background
+        for next_frame in range(
+            frame + 1, min(frame + 1 + self.read_ahead, self.num_time_steps)
+        ):
+            self.frame_cache.read_ahead(
+                key=self._frame_key(next_frame, label=label),
+                loader=lambda f=next_frame: self._read_frame(f, label=label),
+            )
+
+        return self.frame_cache.get(
+            key=self._frame_key(frame, label=label),
+            loader=lambda: self._read_frame(frame, label=label),
+        )
+
+    def _frame_key(self, frame: int, label: bool):
+        """
+        The key of a frame in the frame cache
+        :param frame: Number of the frame.
+        :param label: If the labelled image is loaded
+        :return: The key containing the paths and the target size
+        """
+
+        target_size = None if self.target_size is None else tuple(self.target_size)
+        return (
+            os.fspath(self.imgs[frame]),
+            os.fspath(self.segs[frame]),
+            target_size,
+            label,
+        )
+
+    def _read_frame(self, frame: int, label=False):
+        """
+        Reads and resizes the raw image and the segmentation of a single time frame from the disk.
+        :param frame: Number of the frame.
+        :param label: If True, the labelled image is returned, note the binary segmentation
+        :return: The loaded and resized image and segmentation as read-only arrays
+        """
+
+        img, seg = read_frame(
+            img_file=self.imgs[frame],
+            seg_file=self.segs[frame],
+            target_size=self.target_size,
+            label=label,
+        )
+
+        # the arrays are shared by all users of the cache
+        img.flags.writeable = False
+        seg.flags.writeable = False
+
+        return img, seg
 
     def load_data(self, cur_frame: int, label=False):
         """
@@ -72,32 +318,12 @@ class Tracking(ABC):
         :param cur_frame: Number of the current frame.
         :param label: If True, the labelled image is returned, note the binary segmentation
         :return: The loaded and resized images of the current frame, the previous frame, the current segmentation and
-                the previous segmentation
+                the previous segmentation. The images are of type IMAGE_DTYPE, the segmentations are binary masks or
+                labels of the frame label dtype.
         """
 
-        img = io.imread(self.imgs[cur_frame])
-        if self.target_size is None:
-            target_size = img.shape
-        else:
-            target_size = self.target_size
-        img_cur_frame = resize(img, target_size, order=1)
-        img_prev_frame = resize(
-            io.imread(self.imgs[cur_frame - 1]), target_size, order=1
-        )
-        if label:
-            seg_cur_frame = resize(
-                io.imread(self.segs[cur_frame]), target_size, order=0
-            )
-            seg_prev_frame = resize(
-                io.imread(self.segs[cur_frame - 1]), target_size, order=0
-            )
-        else:
-            seg_cur_frame = resize(
-                io.imread(self.segs[cur_frame]) > 0, target_size, order=0
-            )
-            seg_prev_frame = resize(
-                io.imread(self.segs[cur_frame - 1]) > 0, target_size, order=0
-            )
+        img_cur_frame, seg_cur_frame = self.load_frame(cur_frame, label=label)
+        img_prev_frame, seg_prev_frame = self.load_frame(cur_frame - 1, label=label)
 
         return img_cur_frame, img_prev_frame, seg_cur_frame, seg_prev_frame
 
@@ -124,34 +350,127 @@ class DeltaTypeTracking(Tracking):
         # base class init
         super().__init__(*args, **kwargs)
 
-    def track_all_frames(self, output_folder: Union[str, bytes, os.PathLike]):
+        # the models are built once per input size and the input size is chosen once before the tracking
+        self.models = {}
+        self.input_size_estimated = False
+        # the bit packed binary segmentations and the cell properties of all frames from the pre-pass
+        self.seg_masks = {}
+        self.label_tables = {}
+
+    def _read_frame(self, frame: int, label=False):
+        """
+        Reads and resizes the raw image and the segmentation of a single time frame from the disk. If the binary
+        segmentation of the frame was read by the pre-pass, only the raw image is read.
+        :param frame: Number of the frame.
+        :param label: If True, the labelled image is returned, note the binary segmentation
+        :return: The loaded and resized image and segmentation as read-only arrays
+        """
+
+        if label or frame not in self.seg_masks:
+            return super()._read_frame(frame, label=label)
+
+        img = read_image(self.imgs[frame], target_size=self.target_size)
+        packed, shape = self.seg_masks[frame]
+        seg = np.unpackbits(packed, count=np.prod(shape)).reshape(shape)
+        # the segmentation is resized to the image like in read_frame
+        if seg.shape != img.shape:
+            seg = resize(seg, img.shape, order=0)
+        seg = seg.astype(MASK_DTYPE)
+
+        # the arrays are shared by all users of the cache
+        img.flags.writeable = False
+        seg.flags.writeable = False
+
+        return img, seg
+
+    def get_frame_label_table(self, frame: int, frame_shape: Tuple[int, int]):
+        """
+        Returns the cell properties of a frame that were computed by the pre-pass
+        :param frame: Number of the frame.
+        :param frame_shape: The shape of the loaded segmentation of the frame
+        :return: The properties, see get_label_table, None if they are not available for this shape
+        """
+
+        if frame not in self.label_tables:
+            return None
+        if self.seg_masks[frame][1] != tuple(frame_shape):
+            return None
+        return self.label_tables[frame]
+
+    def track_all_frames(
+        self,
+        output_folder: Union[str, bytes, os.PathLike],
+        streaming=False,
+        compression: Optional[str] = None,
+    ):
         """
         Tracks all frames and saves the results to the given output folder
         :param output_folder: The folder to save the results
+        :param streaming: If True, the inputs and results of the tracking are written frame by frame to
+                          inputs_results_all_red.h5 in the output folder instead of being kept in memory
+        :param compression: The lossless filter of the output h5 files, either None (no compression), "gzip",
+                            "lzf" or "blosc"
         """
         # Display estimated runtime
         self.print_process_time()
 
-        # Run tracking
-        inputs, results = self.run_model_crop()
-        self.store_data(output_folder, inputs, results)
+        # Run tracking, the read ahead of the frame cache is shut down afterwards
+        with self.frame_cache:
+            if streaming:
+                tracking_file = Path(output_folder).joinpath(
+                    "inputs_results_all_red.h5"
+                )
+                self.run_model_crop(output_file=tracking_file)
+                with h5py.File(tracking_file, "r") as f:
+                    data_file, csv_file = self.generate_lineages(
+                        output_folder=output_folder,
+                        inputs=f["inputs_all_red"],
+                        results=f["results_all_red"],
+                        compression=compression,
+                    )
+            else:
+                inputs, results = self.run_model_crop()
+                self.store_data(output_folder, inputs, results)
+                data_file, csv_file = self.generate_lineages(
+                    output_folder=output_folder,
+                    inputs=inputs,
+                    results=results,
+                    compression=compression,
+                )
 
-        if results is not None:
-            lin = DeltaTypeLineages(
-                inputs=np.array(inputs), results=results, connectivity=self.connectivity
-            )
-            data_file, csv_file = lin.store_lineages(output_folder=output_folder)
-        else:
+        return data_file, csv_file
+
+    def generate_lineages(
+        self,
+        output_folder: Union[str, bytes, os.PathLike],
+        inputs: Union[np.ndarray, h5py.Dataset],
+        results: Union[np.ndarray, h5py.Dataset],
+        compression: Optional[str] = None,
+    ):
+        """
+        Generates the lineages from the tracking output and saves them to the given output folder
+        :param output_folder: The folder to save the results
+        :param inputs: The inputs used for the tracking
+        :param results: The results
+        :param compression: The lossless filter of the output h5 files, see DeltaTypeLineages.store_lineages
+        :return: The data file and csv file of the lineages, None if there was no output
+        """
+
+        if len(results) == 0:
             logger.warning("Tracking did not generate any output!")
-            data_file, csv_file = None, None
+            return None, None
 
-        return data_file, csv_file
+        lin = DeltaTypeLineages(
+            inputs=inputs, results=results, connectivity=self.connectivity
+        )
+        return lin.store_lineages(output_folder=output_folder, compression=compression)
 
     def gen_input_crop(self, cur_frame: int):
         """
         Generates the input for the tracking network using cropped images.
         :param cur_frame: Number of the current frame.
-        :return: Cropped input for the tracking network
+        :return: Cropped input for the tracking network, the stacked input of the whole frame, the crop boxes and the
+                 labeled segmentation of the current frame
         """
 
         # Load data
@@ -159,117 +478,322 @@ class DeltaTypeTracking(Tracking):
             cur_frame, label=False
         )
 
+        frame_data = self.crop_frame_pair(
+            img_cur_frame=img_cur_frame,
+            img_prev_frame=img_prev_frame,
+            seg_cur_frame=seg_cur_frame,
+            seg_prev_frame=seg_prev_frame,
+            props_curr=self.get_frame_label_table(cur_frame, seg_cur_frame.shape),
+            props_prev=self.get_frame_label_table(cur_frame - 1, seg_prev_frame.shape),
+        )
+
+        # the model for the input size of the crops
+        self.get_model()
+
+        return frame_data
+
+    def crop_frame_pair(
+        self,
+        img_cur_frame: np.ndarray,
+        img_prev_frame: np.ndarray,
+        seg_cur_frame: np.ndarray,
+        seg_prev_frame: np.ndarray,
+        props_curr: Optional[dict] = None,
+        props_prev: Optional[dict] = None,
+    ):
+        """
+        Generates the input for the tracking network from the loaded images of a frame pair.
+        :param img_cur_frame: The image of the current frame
+        :param img_prev_frame: The image of the previous frame
+        :param seg_cur_frame: The binary segmentation of the current frame
+        :param seg_prev_frame: The binary segmentation of the previous frame
+        :param props_curr: The cell properties of the current frame, see get_label_table, computed if None
+        :param props_prev: The cell properties of the previous frame, see get_label_table, computed if None
+        :return: Cropped input for the tracking network, the stacked input of the whole frame, the crop boxes and the
+                 labeled segmentation of the current frame
+        """
+
         # Label of the segmentation of the previous frame
         label_prev_frame, num_cells = label(
             seg_prev_frame, return_num=True, connectivity=self.connectivity
         )
         label_cur_frame = label(seg_cur_frame, connectivity=self.connectivity)
 
-        # get the props and create an area dict for the current frame
-        props_prev = regionprops(label_prev_frame)
-        props_curr = regionprops(label_cur_frame)
-        areas = {r.label: r.area for r in props_curr}
+        # get the props of all cells of both frames if they are not known from the pre-pass
+        if props_prev is None:
+            props_prev = self.get_label_table(label_prev_frame, num_labels=num_cells)
+        if props_curr is None:
+            props_curr = self.get_label_table(label_cur_frame)
+
+        # the input size should have been chosen by the pre-pass, if not we increase it here, the model is not built
+        # here because this can run in a worker thread, frames without cells do not need crops
+        if len(props_prev["area"]) > 0 and len(props_curr["area"]) > 0:
+            min_dist = self.get_min_crop_size(
+                props_prev=props_prev,
+                props_curr=props_curr,
+                frame_shape=label_cur_frame.shape,
+            )
+            self.increase_input_size(min_dist)
+
+        # create the input, the labels are exactly representable as long as there are less than 2**24 cells
+        input_whole_frame = np.empty(label_cur_frame.shape + (4,), dtype=IMAGE_DTYPE)
+        for channel, img in enumerate(
+            [img_prev_frame, label_prev_frame, img_cur_frame, seg_cur_frame]
+        ):
+            input_whole_frame[..., channel] = img
+
+        # Crop images/segmentations per cell and combine all images/segmentations for input
+        crop_box = self.get_crop_boxes(
+            centroids=props_prev["centroid"], frame_shape=label_cur_frame.shape
+        )
+        input_cur_frame = np.ascontiguousarray(
+            self.extract_crops(input_whole_frame, crop_boxes=crop_box)
+        )
+        # the seeds are the images with just the current label
+        input_cur_frame[..., 1] = input_cur_frame[..., 1] == np.arange(
+            1, num_cells + 1
+        ).reshape(-1, 1, 1)
+        # remove cells that were split during the crop
+        input_cur_frame[..., 3] = self.clean_crop(
+            bboxes=props_curr["bbox"],
+            seg_crops=self.extract_crops(label_cur_frame, crop_boxes=crop_box),
+            crop_boxes=crop_box,
+        )
+
+        return input_cur_frame, input_whole_frame, crop_box, label_cur_frame
+
+    def get_min_crop_size(
+        self, props_prev: dict, props_curr: dict, frame_shape: Tuple[int, int]
+    ):
+        """
+        Calculates the minimal size of the crops that is needed to track the cells of a frame pair
+        :param props_prev: The cell properties of the previous frame, see get_label_table
+        :param props_curr: The cell properties of the current frame, see get_label_table
+        :param frame_shape: The shape of the frames
+        :return: The minimal size of the crops
+        """
 
-        # get the distance matrix of the centroids
-        centers_prev = np.array([p.centroid for p in props_prev])
-        centers_curr = np.array([p.centroid for p in props_curr])
-        dist_mat = distance_matrix(centers_prev, centers_curr)
+        # the distance of each cell to the closest cell in the current frame, the tree avoids the full distance matrix
+        closest_dist, _ = cKDTree(props_curr["centroid"]).query(props_prev["centroid"])
 
         # if min distance between to cells in the frames is smaller than our input, we adjust to the next higher
-        min_dist = int(np.max(np.min(dist_mat, axis=1)))
+        min_dist = int(np.max(closest_dist))
         # the square crop region should be large enough to fit the biggest cell
         min_dist = np.maximum(
-            min_dist, np.max([r.axis_major_length for r in props_curr]).astype(int)
+            min_dist, np.max(props_curr["axis_major_length"]).astype(int)
         )
         # it should not be bigger than the frame itself or max input shape
         min_dist = np.minimum(
-            np.minimum(self.max_input_size, np.min(label_cur_frame.shape)), min_dist
+            np.minimum(self.max_input_size, np.min(frame_shape)), min_dist
         )
-        if min_dist >= self.input_size[0]:
-            self.logger.info(
-                f"Current max dist between cells: {min_dist}, increasing input size of model..."
+
+        return min_dist
+
+    def increase_input_size(self, min_dist: int):
+        """
+        Increases the input size of the model to the next multiple of 32 if the crops are too small
+        :param min_dist: The minimal size of the crops, see get_min_crop_size
+        :return: True if the input size was increased, False otherwise
+        """
+
+        if min_dist < self.input_size[0]:
+            return False
+
+        self.logger.info(
+            f"Current max dist between cells: {min_dist}, increasing input size of model..."
+        )
+        self.input_size = (min_dist // 32 + 1) * 32, (min_dist // 32 + 1) * 32, 4
+        return True
+
+    def estimate_input_size(self):
+        """
+        Scans the segmentations of all frames once to choose the input size of the model before the tracking, such
+        that the model does not need to be rebuilt in the middle of the tracking. Only the segmentations are read and
+        the scan is only done once per instance. The binary segmentations are kept bit packed together with the cell
+        properties of the frames, such that the tracking does not read or measure the segmentations again.
+        :return: The input size of the model
+        """
+
+        if self.input_size_estimated:
+            return self.input_size
+
+        self.logger.info("Choosing the input size of the model...")
+        props_prev = None
+        for frame in tqdm(range(self.num_time_steps)):
+            seg = io.imread(self.segs[frame]) > 0
+            if self.target_size is not None:
+                seg = resize(seg, self.target_size, order=0)
+            label_frame, num_cells = label(
+                seg, return_num=True, connectivity=self.connectivity
             )
-            self.input_size = (min_dist // 32 + 1) * 32, (min_dist // 32 + 1) * 32, 4
+            props = self.get_label_table(label_frame, num_labels=num_cells)
+            self.seg_masks[frame] = (np.packbits(seg, axis=None), seg.shape)
+            self.label_tables[frame] = props
+
+            # frames without cells do not need crops
+            if props_prev is not None and num_cells > 0 and len(props_prev["area"]) > 0:
+                min_dist = self.get_min_crop_size(
+                    props_prev=props_prev, props_curr=props, frame_shape=seg.shape
+                )
+                self.increase_input_size(min_dist)
+            props_prev = props
+
+        self.input_size_estimated = True
+        return self.input_size
+
+    def get_model(self):
+        """
+        Sets the model for the current input size, every model is only built and loaded once per input size and
+        reused afterwards
+        :return: The model
+        """
+
+        input_size = tuple(self.input_size)
+        if input_size not in self.models:
             self.load_model()
+            self.models[input_size] = self.model
+        self.model = self.models[input_size]
+
+        return self.model
+
+    def get_label_table(self, label_img: np.ndarray, num_labels: Optional[int] = None):
+        """
+        Computes the properties of all cells of a labeled frame at once, the properties are the same as the ones of
+        skimage.measure.regionprops
+        :param label_img: The labeled frame, the labels have to be consecutive starting from 1
+        :param num_labels: The number of labels, defaults to the maximum label
+        :return: A dict with the arrays "area" (N), "centroid" (N, 2), "bbox" (N, 4) and "axis_major_length" (N) where
+                 row i contains the properties of the cell with label i + 1
+        """
 
-        # create the input
-        input_whole_frame = np.stack(
-            [img_prev_frame, label_prev_frame, img_cur_frame, seg_cur_frame], axis=-1
+        if num_labels is None:
+            num_labels = label_img.max()
+
+        # the bounding boxes (min_row, min_col, max_row, max_col) of all labels
+        bbox = np.array(
+            [
+                (s_row.start, s_col.start, s_row.stop, s_col.stop)
+                for s_row, s_col in find_objects(label_img, max_label=num_labels)
+            ],
+            dtype=int,
+        ).reshape(-1, 4)
+
+        # the centroids from the exact sums of the coordinates, like the mean of regionprops
+        rows, cols = np.nonzero(label_img)
+        labels = label_img[rows, cols]
+        area = np.bincount(labels, minlength=num_labels + 1)[1:]
+        centroid = np.stack(
+            [
+                np.bincount(labels, weights=rows, minlength=num_labels + 1)[1:] / area,
+                np.bincount(labels, weights=cols, minlength=num_labels + 1)[1:] / area,
+            ],
+            axis=1,
         )
 
-        # Crop images/segmentations per cell and combine all images/segmentations for input
-        input_cur_frame = np.zeros(
-            (num_cells, self.input_size[0], self.input_size[1], 4)
+        # the moments of the coordinates relative to the bounding boxes, all sums are exact integers
+        rows = rows - bbox[labels - 1, 0]
+        cols = cols - bbox[labels - 1, 1]
+        m_r, m_c, m_rr, m_cc, m_rc = [
+            np.bincount(labels, weights=w, minlength=num_labels + 1)[1:]
+            for w in [rows, cols, rows**2, cols**2, rows * cols]
+        ]
+
+        # the normalized central moments
+        mu_rr = (m_rr - m_r**2 / area) / area
+        mu_cc = (m_cc - m_c**2 / area) / area
+        mu_rc = (m_rc - m_r * m_c / area) / area
+
+        # the major axis from the largest eigenvalue of the inertia tensor
+        inertia_tensor = np.stack([mu_cc, -mu_rc, -mu_rc, mu_rr], axis=1).reshape(
+            -1, 2, 2
         )
-        crop_box = np.zeros((num_cells, 4), dtype=int)
-        for cell_ix, p in enumerate(props_prev):
-            # get the center
-            row, col = p.centroid
-
-            # create the cropbox
-            radius_row = self.input_size[0] / 2
-            radius_col = self.input_size[1] / 2
-
-            # take care of going out of the image
-            min_row = np.maximum(0, int(row - radius_row))
-            min_col = np.maximum(0, int(col - radius_col))
-            max_row = min_row + self.input_size[0]
-            max_col = min_col + self.input_size[1]
-
-            # take care of overshooting
-            if max_row > img_cur_frame.shape[0]:
-                max_row = img_cur_frame.shape[0]
-                min_row = max_row - self.input_size[0]
-            if max_col > img_cur_frame.shape[1]:
-                max_col = img_cur_frame.shape[1]
-                min_col = max_col - self.input_size[1]
-
-            # get the image with just the current label
-            seed = (
-                label_prev_frame[min_row:max_row, min_col:max_col] == p.label
-            ).astype(int)
-            label_cur_frame_crop = label_cur_frame[min_row:max_row, min_col:max_col]
-            # remove cells that were split during the crop
-            seg_clean = self.clean_crop(areas, label_cur_frame_crop)
-
-            cell_ix = p.label - 1
-            input_cur_frame[cell_ix, :, :, 0] = img_prev_frame[
-                min_row:max_row, min_col:max_col
-            ]
-            input_cur_frame[cell_ix, :, :, 1] = seed
-            input_cur_frame[cell_ix, :, :, 2] = img_cur_frame[
-                min_row:max_row, min_col:max_col
-            ]
-            input_cur_frame[cell_ix, :, :, 3] = seg_clean
+        eigvals = np.clip(np.linalg.eigvalsh(inertia_tensor), 0, None)
+        axis_major_length = 4 * np.sqrt(eigvals[:, -1])
 
-            crop_box[cell_ix] = min_row, min_col, max_row, max_col
+        return {
+            "area": area.astype(int),
+            "centroid": centroid,
+            "bbox": bbox,
+            "axis_major_length": axis_major_length,
+        }
+
+    def get_crop_boxes(self, centroids: np.ndarray, frame_shape: Tuple[int, int]):
+        """
+        Computes the crop boxes of the input size around the centroids of all cells, the crop boxes are shifted such
+        that they do not go out of the frame
+        :param centroids: The centroids (row, col) of all cells as array of shape (N, 2)
+        :param frame_shape: The shape of the frame
+        :return: The crop boxes (min_row, min_col, max_row, max_col) as array of shape (N, 4)
+        """
 
-        return input_cur_frame, input_whole_frame, crop_box
+        # take care of going out of the image
+        radius = np.array(self.input_size[:2]) / 2
+        min_corner = np.maximum(0, (centroids - radius).astype(int))
 
-    def clean_crop(self, areas: dict, seg_crop: np.ndarray):
+        # take care of overshooting
+        min_corner = np.minimum(min_corner, np.array(frame_shape) - self.input_size[:2])
+
+        return np.concatenate([min_corner, min_corner + self.input_size[:2]], axis=1)
+
+    def extract_crops(self, image: np.ndarray, crop_boxes: np.ndarray):
         """
-        Cleans the cropped segmentation by removing all cells which have been cut during the cropping.
-        :param areas: A dict of label -> area of the full segmentation frame
-        :param seg_crop: Segmentation of cropped image.
-        :return: The cleaned up segmentation
+        Extracts the crops of the input size from an image with a single gather from the view of all windows
+        :param image: The image to crop (WH) or (WHC)
+        :param crop_boxes: The crop boxes (min_row, min_col, max_row, max_col) as array of shape (N, 4), all crop
+                           boxes need to have the input size
+        :return: The crops as array of shape (N, input_size[0], input_size[1]) or (N, input_size[0], input_size[1], C)
         """
 
-        # FIXME: This function is still fairly inefficient, the best way would be to check the intersection of the
-        # FIXME: bounding boxes with the crop, but since this is still much faster than the network pass I am
-        # FIXME: currently too lazy to implement it
+        windows = sliding_window_view(image, self.input_size[:2], axis=(0, 1))
+        crops = windows[crop_boxes[:, 0], crop_boxes[:, 1]]
+
+        # the window dimensions are the last ones
+        if image.ndim == 3:
+            crops = np.moveaxis(crops, 1, -1)
+
+        return crops
 
-        # Generate dictionary with cell indices as keys and area as values for the full and cropped segmentation.
-        regs_crop = regionprops(seg_crop)
+    def clean_crop(
+        self,
+        bboxes: np.ndarray,
+        seg_crops: np.ndarray,
+        crop_boxes: np.ndarray,
+        max_pixels=2**22,
+    ):
+        """
+        Cleans the cropped segmentations by removing all cells which have been cut during the cropping. A cell is cut
+        if its bounding box is not fully contained in the crop.
+        :param bboxes: The bounding boxes (min_row, min_col, max_row, max_col) of all cells of the full segmentation,
+                       row i contains the bounding box of the cell with label i + 1
+        :param seg_crops: The cropped labeled segmentations as array of shape (N, W, H)
+        :param crop_boxes: The crops (min_row, min_col, max_row, max_col) in the full segmentation of shape (N, 4)
+        :param max_pixels: The maximum number of pixels that are processed at once to limit the memory
+        :return: The cleaned up segmentations as binary masks
+        """
 
-        areas_crop = {r.label: r.area for r in regs_crop}
+        seg_clean_bin = np.zeros(seg_crops.shape, dtype=MASK_DTYPE)
 
-        # Compare area of cell in full and cropped segmentation and remove cells which are smaller than original cell.
-        seg_clean = seg_crop.copy()
-        for k in areas_crop:
-            if areas_crop[k] != areas[k]:
-                seg_clean[seg_crop == k] = 0
+        # the background is never inside
+        bboxes = np.concatenate([np.full((1, 4), -1), bboxes])
+        chunk_size = max(
+            1, max_pixels // max(len(bboxes), np.prod(seg_crops.shape[1:]))
+        )
+        for start in range(0, len(seg_crops), chunk_size):
+            crop_box = crop_boxes[start : start + chunk_size, None, :]
+
+            # lookup table crop, label -> cell is completely inside the crop
+            inside = (
+                (bboxes[None, :, 0] >= crop_box[..., 0])
+                & (bboxes[None, :, 1] >= crop_box[..., 1])
+                & (bboxes[None, :, 2] <= crop_box[..., 2])
+                & (bboxes[None, :, 3] <= crop_box[..., 3])
+            )
+            inside[:, 0] = False
 
-        seg_clean_bin = (seg_clean > 0).astype(int)
+            crop_index = np.arange(len(inside))[:, None, None]
+            seg_clean_bin[start : start + chunk_size] = inside[
+                crop_index, seg_crops[start : start + chunk_size]
+            ]
 
         return seg_clean_bin
 
@@ -278,11 +802,16 @@ class DeltaTypeTracking(Tracking):
         Estimates time needed for tracking based on tracking for one frame.
         :return: time in milliseconds
         """
+        # there is nothing to track without a frame pair
+        if self.num_time_steps < 2:
+            return 0
+
         self.logger.info("Estimate needed time for tracking. This may take a while...")
 
         start = time.time()
-        self.load_model()
-        inputs_cur_frame, input_whole_frame, crop_box = self.gen_input_crop(1)
+        self.estimate_input_size()
+        self.get_model()
+        inputs_cur_frame, *_ = self.gen_input_crop(1)
         _ = self.model.predict(inputs_cur_frame, verbose=0)
         end = time.time()
 
@@ -308,60 +837,223 @@ class DeltaTypeTracking(Tracking):
         )
         print("─" * 30 + "\n")
 
-    def run_model_crop(self):
+    def predict_frames(self, batch_size=128, num_workers=4, prefetch=8):
+        """
+        Generates the inputs of all frame pairs and predicts them with the model. The frames are loaded and cropped
+        ahead of time by a thread pool while the model is predicting, every frame is loaded exactly once. The crops of
+        consecutive frames are packed into full batches, only the last batch of the run can be smaller.
+        :param batch_size: The batch size of the model
+        :param num_workers: The number of threads that load and crop the frames
+        :param prefetch: The maximum number of frame pairs that are cropped ahead of the model
+        :return: A generator that yields for every frame pair in order the current frame, the output of
+                 crop_frame_pair and the output of the model for the crops
+        """
+
+        # the model is built in this thread before the workers start
+        self.estimate_input_size()
+        self.get_model()
+
+        with ThreadPoolExecutor(max_workers=num_workers) as pool:
+            # every frame is loaded once and used for both of its frame pairs
+            loaded = {}
+            crops = deque()
+
+            def load(frame: int):
+                if frame not in loaded:
+                    loaded[frame] = pool.submit(self.load_frame, frame)
+                return loaded[frame]
+
+            def crop(cur_frame: int, cur: Future, prev: Future):
+                img_cur_frame, seg_cur_frame = cur.result()
+                img_prev_frame, seg_prev_frame = prev.result()
+                return self.crop_frame_pair(
+                    img_cur_frame=img_cur_frame,
+                    img_prev_frame=img_prev_frame,
+                    seg_cur_frame=seg_cur_frame,
+                    seg_prev_frame=seg_prev_frame,
+                    props_curr=self.get_frame_label_table(
+                        cur_frame, seg_cur_frame.shape
+                    ),
+                    props_prev=self.get_frame_label_table(
+                        cur_frame - 1, seg_prev_frame.shape
+                    ),
+                )
+
+            def submit(cur_frame: int):
+                # the loads are submitted before the crop, so the crop never waits for a load that was not started
+                cur, prev = load(cur_frame), load(cur_frame - 1)
+                crops.append(pool.submit(crop, cur_frame, cur, prev))
+                loaded.pop(cur_frame - 1)
+
+            next_frame = 1
+            while next_frame < min(1 + prefetch, self.num_time_steps):
+                submit(next_frame)
+                next_frame += 1
+
+            # the frames whose crops are not predicted yet, the crops that did not fill a batch and the predictions
+            # that were not yet scattered back to their frames
+            waiting = deque()
+            inputs = []
+            predicted = None
+            for cur_frame in range(1, self.num_time_steps):
+                frame_data = crops.popleft().result()
+                if next_frame < self.num_time_steps:
+                    submit(next_frame)
+                    next_frame += 1
+                waiting.append((cur_frame, frame_data))
+                inputs.append(frame_data[0])
+
+                # predict all full batches, at the end also the remaining crops
+                inputs = np.concatenate(inputs) if len(inputs) > 1 else inputs[0]
+                if cur_frame < self.num_time_steps - 1:
+                    num_predict = len(inputs) // batch_size * batch_size
+                else:
+                    num_predict = len(inputs)
+                if num_predict > 0:
+                    output = self.get_model().predict(
+                        inputs[:num_predict], verbose=0, batch_size=batch_size
+                    )
+                    if predicted is None:
+                        predicted = output
+                    else:
+                        predicted = np.concatenate([predicted, output])
+                inputs = [inputs[num_predict:]]
+
+                # scatter the predictions back to the frames in order
+                num_predicted = 0 if predicted is None else len(predicted)
+                while waiting and len(waiting[0][1][0]) <= num_predicted:
+                    frame, frame_data = waiting.popleft()
+                    num_crops = len(frame_data[0])
+                    if num_crops == 0:
+                        yield frame, frame_data, np.empty_like(frame_data[0])
+                        continue
+                    yield frame, frame_data, predicted[:num_crops]
+                    predicted = predicted[num_crops:]
+                    num_predicted -= num_crops
+
+    def run_model_crop(
+        self,
+        output_file: Optional[Union[str, bytes, os.PathLike]] = None,
+        batch_size=128,
+        num_workers=4,
+    ):
         """
         Runs the tracking model
-        :return: Arrays containing input and reduced output of Delta model
+        :param output_file: If provided, the input and reduced output of each frame are written to the datasets
+                            "inputs_all_red" and "results_all_red" of this h5 file as soon as they are produced
+        :param batch_size: The batch size of the model, the crops of consecutive frames are packed into full batches
+        :param num_workers: The number of threads that load and crop the frames ahead of the model
+        :return: Arrays containing input and reduced output of Delta model, None if an output file is provided
         """
 
-        # Load model
-        self.load_model()
+        # Load model, the input size is chosen before such that the model is only built once
+        self.estimate_input_size()
+        self.get_model()
 
         # Loop over all time frames
         inputs_all = []
         results_all = []
 
-        ram_usg = process.memory_info().rss * 1e-9
-        for cur_frame in (
-            pbar := tqdm(
-                range(1, self.num_time_steps), postfix={"RAM": f"{ram_usg:.1f} GB"}
-            )
-        ):
-            inputs_cur_frame, input_whole_frame, crop_box = self.gen_input_crop(
-                cur_frame
-            )
+        with ExitStack() as stack:
+            if output_file is not None:
+                hf = stack.enter_context(h5py.File(output_file, "w"))
+                # the datasets are created before the loop, such that they exist even without frame pairs
+                frame_shape = self.get_frame_shape()
+                self.create_frame_datasets(
+                    hf=hf,
+                    input_shape=frame_shape + (4,),
+                    result_shape=frame_shape + (2,),
+                )
 
-            # check if there is a segmentation
-            if inputs_cur_frame.size > 0:
-                results_cur_frame_crop = self.model.predict(
-                    inputs_cur_frame.astype(np.float32), verbose=0, batch_size=128
+            ram_usg = process.memory_info().rss * 1e-9
+            for cur_frame, frame_data, results_cur_frame_crop in (
+                pbar := tqdm(
+                    self.predict_frames(batch_size=batch_size, num_workers=num_workers),
+                    total=self.num_time_steps - 1,
+                    postfix={"RAM": f"{ram_usg:.1f} GB"},
+                )
+            ):
+                inputs_cur_frame, input_whole_frame, crop_box, label_cur_frame = (
+                    frame_data
                 )
-            else:
-                results_cur_frame_crop = np.empty_like(inputs_cur_frame)
-
-            # Combine cropped results in one image
-            results_cur_frame = self.transfer_results(
-                full_shape=input_whole_frame.shape[:2] + (2,),
-                inp=inputs_cur_frame,
-                res=results_cur_frame_crop,
-                crop_boxes=crop_box,
-            )
 
-            # add to results
-            results_all.append(results_cur_frame)
-            inputs_all.append(input_whole_frame)
+                # Combine cropped results in one image
+                results_cur_frame = self.transfer_results(
+                    full_shape=input_whole_frame.shape[:2] + (2,),
+                    inp=inputs_cur_frame,
+                    res=results_cur_frame_crop,
+                    crop_boxes=crop_box,
+                    label_frame=label_cur_frame,
+                )
 
-            ram_usg = process.memory_info().rss * 1e-9
-            pbar.set_postfix({"RAM": f"{ram_usg:.1f} GB"})
+                # write the frame or add to results
+                if output_file is not None:
+                    hf["inputs_all_red"][cur_frame - 1] = input_whole_frame
+                    hf["results_all_red"][cur_frame - 1] = results_cur_frame
+                else:
+                    results_all.append(results_cur_frame)
+                    inputs_all.append(input_whole_frame)
+
+                ram_usg = process.memory_info().rss * 1e-9
+                pbar.set_postfix({"RAM": f"{ram_usg:.1f} GB"})
+
+        self.logger.info(
+            f"Frame cache: {self.frame_cache.hits} hits, {self.frame_cache.misses} misses"
+        )
+        if output_file is not None:
+            return None, None
 
         return np.array(inputs_all), np.array(results_all)
 
+    def get_frame_shape(self):
+        """
+        Returns the shape of the loaded frames, the first frame is loaded through the frame cache if there is no
+        target size
+        :return: The shape of the frames, (0, 0) if there are no frames
+        """
+
+        if self.target_size is not None:
+            return tuple(self.target_size)
+        if self.num_time_steps == 0:
+            return 0, 0
+        return self.load_frame(0)[0].shape
+
+    def create_frame_datasets(
+        self,
+        hf: h5py.File,
+        input_shape: Tuple[int, int, int],
+        result_shape: Tuple[int, int, int],
+    ):
+        """
+        Creates the datasets for the inputs and results of all frames, each chunk contains a single frame. The
+        number of cells of the following frames is not known, such that the results are stored with the label dtype.
+        :param hf: The h5 file to create the datasets in
+        :param input_shape: The shape of the input of a single frame
+        :param result_shape: The shape of the result of a single frame
+        """
+
+        # empty datasets can not be chunked
+        n_frames = max(0, self.num_time_steps - 1)
+        hf.create_dataset(
+            "inputs_all_red",
+            shape=(n_frames,) + input_shape,
+            chunks=(1,) + input_shape if n_frames > 0 else None,
+            dtype=IMAGE_DTYPE,
+        )
+        hf.create_dataset(
+            "results_all_red",
+            shape=(n_frames,) + result_shape,
+            chunks=(1,) + result_shape if n_frames > 0 else None,
+            dtype=LABEL_DTYPE,
+        )
+
     def transfer_results(
         self,
         full_shape: Tuple[int, int, int],
         inp: np.ndarray,
         res: np.ndarray,
         crop_boxes: np.ndarray,
+        label_frame: np.ndarray,
     ):
         """
         Transfers the results to a single frame
@@ -369,41 +1061,68 @@ class DeltaTypeTracking(Tracking):
         :param inp: A stack of cropped images (BWHC) that contain the input of the network
         :param res: The output of the network
         :param crop_boxes: The crop boxes for each input
+        :param label_frame: The labeled segmentation of the full current frame, the candidates of the inputs are the
+                            cells of this segmentation that are completely inside the crop
         :return: An array that is delta v1 like, i.e. WH2 where the first channels dim and second channel dim contain
                  the daughter cells
         """
-        target = np.zeros(full_shape)
-
-        for cell_id, (i, r, c) in enumerate(zip(inp, res, crop_boxes)):
-            # extract the crop boxes
-            row_min, col_min, row_max, col_max = c
 
-            # we get the view of the target that is relevant
-            crop_target = target[row_min:row_max, col_min:col_max, :]
-
-            # the relevant images
-            i_candidates = i[..., 3]
-
-            # label the candiates
-            inp_label = label(i_candidates, connectivity=self.connectivity)
-            # get the count of the max overlay
-            bin_count = np.bincount(inp_label[r[:, :, 0] > 0.5])
-            # this gets the indexes of the two largest count (not including the 0 bin) the largest count is first
-            label_max_overl = np.argsort(bin_count[1:])[-1:-3:-1] + 1
+        target_dtype = get_frame_label_dtype(len(inp))
+        target = np.zeros(full_shape, dtype=target_dtype)
+        if len(inp) == 0:
+            return target
+
+        # the candidates of each crop with their global labels
+        n_labels = int(label_frame.max()) + 1
+        areas = np.bincount(label_frame.ravel(), minlength=n_labels)
+
+        # the overlap counts of all (cell, candidate) pairs of the frame, only pairs that overlap are counted
+        overlapping = np.flatnonzero(res[..., 0] > 0.5)
+        overlapping = overlapping[inp.reshape(-1, inp.shape[-1])[overlapping, 3] > 0]
+        cell_index, pixel = np.divmod(overlapping, inp[0, ..., 0].size)
+        row, col = np.divmod(pixel, inp.shape[2])
+        overlap_labels = label_frame[
+            crop_boxes[cell_index, 0] + row, crop_boxes[cell_index, 1] + col
+        ]
+        pairs, pair_counts = np.unique(
+            cell_index * n_labels + overlap_labels, return_counts=True
+        )
+        pair_cells, pair_labels = np.divmod(pairs, n_labels)
+
+        # the two candidates with the largest overlap for each cell, the largest is first and ties are resolved in
+        # favour of the larger label like with a stable sort, 0 means that there is no candidate
+        order = np.lexsort((-pair_labels, -pair_counts, pair_cells))
+        pair_cells, pair_labels = pair_cells[order], pair_labels[order]
+        pair_counts = pair_counts[order]
+        rank = np.arange(len(order)) - np.searchsorted(pair_cells, pair_cells)
+        top = rank < 2
+        candidates = np.zeros((len(inp), 2), dtype=int)
+        overlaps = np.zeros((len(inp), 2), dtype=int)
+        candidates[pair_cells[top], rank[top]] = pair_labels[top]
+        overlaps[pair_cells[top], rank[top]] = pair_counts[top]
+
+        # we want to have at least 20% overlay to accept the candidate
+        accepted = candidates > 0
+        accepted[accepted] = areas[candidates[accepted]] / overlaps[accepted] > 0.2
+
+        # the cells are assigned in order, a candidate that has already been marked by a previous cell is skipped
+        owners = np.zeros((n_labels, 2), dtype=target_dtype)
+        marked = np.zeros(n_labels, dtype=bool)
+        for cell_id, (cell_candidates, cell_accepted) in enumerate(
+            zip(candidates.tolist(), accepted.tolist())
+        ):
+            masks = [
+                color
+                for color, ok in zip(cell_candidates, cell_accepted)
+                if ok and not marked[color]
+            ]
+            # the first successful candidate always goes into the first channel
+            for num, color in enumerate(masks):
+                owners[color, num] = cell_id + 1
+                marked[color] = True
 
-            # we need to check if any of the candidates has already been marked
-            masks = []
-            for num, (color, count) in enumerate(
-                zip(label_max_overl, bin_count[label_max_overl])
-            ):
-                # we want to have at least 20% overlay to accept the candidate
-                if count > 0 and np.sum(mask := inp_label == color) / count > 0.2:
-                    if np.all(crop_target[mask, :] == 0):
-                        masks.append(mask)
-
-            # assign the succesfull masks, we make a second loop to make sure that one cell is always in the first frame
-            for num, mask in enumerate(masks):
-                crop_target[..., num][mask] = cell_id + 1
+        # every assigned candidate is completely inside its crop, so we can paint the whole cell
+        target[...] = owners[label_frame]
 
         return target
 
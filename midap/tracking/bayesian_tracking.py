@@ -1,43 +1,93 @@
 import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from itertools import repeat
 from pathlib import Path
-from typing import Union
+from typing import Optional, Tuple, Union
 
 import btrack
 import h5py
 import numpy as np
 import pandas as pd
 from btrack.constants import BayesianUpdates
-from numba import njit, typed, types
-from tqdm import tqdm
+from btrack.dataio import localizations_to_objects
+from skimage.measure import label, regionprops_table
 
-from .base_tracking import Tracking
+from .base_lineages import label_transform
+from .base_tracking import Tracking, read_frame
+from .tracking_data import IMAGE_DTYPE, LABEL_DTYPE, create_frame_dataset
 
+# the properties of the cells that are added as metadata to the btrack objects
+FRAME_PROPERTIES = ("area", "intensity_mean", "intensity_max")
 
-@njit(cache=True)
-def label_transform(labels: np.ndarray, transformations: np.ndarray):
+
+def get_frame_localizations(
+    segmentation: np.ndarray,
+    intensity_image: np.ndarray,
+    frame: int,
+    properties: Tuple[str, ...] = FRAME_PROPERTIES,
+):
     """
-    Transforms the labels of a labelled image according to the transformations
-    :param labels: A 3D array TWH of type int32 containing the labels
-    :param transformations: A array of shape (N, 3) of type int32 containing the transformations to apply. The
-                            transformations are of the form (frame, old, new)
+    Extracts the btrack localizations of a single frame, this is the same as btrack.utils.segmentation_to_objects with
+    an intensity image and assign_class_ID=True for a single frame
+    :param segmentation: The labeled segmentation of the frame
+    :param intensity_image: The raw image of the frame
+    :param frame: The number of the frame
+    :param properties: Additional properties of skimage.measure.regionprops that are calculated with the intensity
+                       image, they are added as metadata to the btrack objects
+    :return: A dict with the columns class_id (the original label), t, y and x (the weighted centroid) and the
+             properties, empty if there are no cells
     """
 
-    # extract shapes
-    t, n, m = labels.shape
-    n_transforms = len(transformations)
+    if np.sum(segmentation) == 0:
+        return {}
+
+    # btrack labels the segmentation again and uses the original label as class ID
+    labeled = label(segmentation)
+    localizations = regionprops_table(
+        labeled,
+        intensity_image=intensity_image,
+        properties=("weighted_centroid",) + tuple(properties),
+    )
+    localizations["class_id"] = regionprops_table(
+        labeled, intensity_image=segmentation, properties=("max_intensity",)
+    )["max_intensity"]
+    localizations["t"] = np.full(len(localizations["class_id"]), frame)
+    localizations["y"] = localizations.pop("weighted_centroid-0")
+    localizations["x"] = localizations.pop("weighted_centroid-1")
+
+    return localizations
+
+
+def extract_frame(
+    img_file: Union[str, bytes, os.PathLike],
+    seg_file: Union[str, bytes, os.PathLike],
+    target_size: Optional[Tuple[int, int]],
+    frame: int,
+):
+    """
+    Reads a single frame and extracts its btrack localizations, this is the work of a single frame that can be done
+    in a worker process
+    :param img_file: The file containing the raw image
+    :param seg_file: The file containing the segmentation
+    :param target_size: The shape of the resized images, if None the images will not be resized
+    :param frame: The number of the frame
+    :return: The raw image of type IMAGE_DTYPE, the labeled segmentation of type LABEL_DTYPE, the number of cells
+             and the localizations of the frame
+    """
 
-    for t_step in range(t):
-        # build the transformations dict
-        trans_dict = typed.Dict.empty(key_type=types.int32, value_type=types.int32)
-        for i in range(n_transforms):
-            if transformations[i, 0] == t_step:
-                trans_dict[transformations[i, 1]] = transformations[i, 2]
+    raw, seg = read_frame(
+        img_file=img_file, seg_file=seg_file, target_size=target_size, label=True
+    )
+    num_cells = len(np.unique(seg)) - 1
 
-        # apply transformations
-        for i in range(n):
-            for j in range(m):
-                if labels[t_step, i, j] in trans_dict:
-                    labels[t_step, i, j] = trans_dict[labels[t_step, i, j]]
+    return (
+        raw,
+        seg.astype(LABEL_DTYPE),
+        num_cells,
+        get_frame_localizations(seg, raw, frame=frame),
+    )
 
 
 class BayesianCellTracking(Tracking):
@@ -45,36 +95,89 @@ class BayesianCellTracking(Tracking):
     A class for cell tracking using Bayesian tracking
     """
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, num_workers=1, **kwargs):
         """
         Initializes the DeltaV2Tracking using the base class init
         :*args: Arguments used for the base class init
+        :param num_workers: The number of processes that read the frames and extract the objects, the frames are
+                            processed in the main process if this is 1
         :**kwargs: Keyword arguments used for the baseclass init
         """
 
         # base class init
         super().__init__(*args, **kwargs)
 
-        # read the files
-        raws = []
-        segs = []
-        for i in range(self.num_time_steps):
-            r, _, s, _ = self.load_data(i, label=True)
-            raws.append(r)
-            segs.append(s)
-        self.seg_imgs = np.array(segs)
-        self.raw_imgs = np.array(raws)
-
-    def track_all_frames(self, output_folder: Union[str, bytes, os.PathLike]):
+        # read the files frame by frame, only the label stack is kept in memory, the raw images are staged in a
+        # temporary h5 file for the output such that every file is only read once
+        self.logger.info("Extracting the objects...")
+        self._raw_dir = tempfile.TemporaryDirectory()
+        self.raw_file = Path(self._raw_dir.name).joinpath("raw_images.h5")
+        frame_args = (
+            self.imgs,
+            self.segs,
+            repeat(self.target_size),
+            range(self.num_time_steps),
+        )
+        self.seg_imgs = np.empty((0, 0, 0), dtype=LABEL_DTYPE)
+        self.num_cells = 0
+        localizations = []
+        with ExitStack() as stack:
+            raw_hf = stack.enter_context(h5py.File(self.raw_file, "w"))
+            if num_workers > 1:
+                # process the frames in chunks to reduce the overhead of the communication
+                executor = stack.enter_context(
+                    ProcessPoolExecutor(max_workers=num_workers)
+                )
+                chunksize = max(1, self.num_time_steps // (4 * num_workers))
+                frames = executor.map(extract_frame, *frame_args, chunksize=chunksize)
+            else:
+                frames = map(extract_frame, *frame_args)
+
+            # the results are returned in order as soon as they are ready
+            for i, (r, s, num_cells, frame_localizations) in enumerate(frames):
+                if i == 0:
+                    self.seg_imgs = np.empty(
+                        (self.num_time_steps,) + s.shape, LABEL_DTYPE
+                    )
+                    raw_imgs = raw_hf.create_dataset(
+                        "images",
+                        shape=self.seg_imgs.shape,
+                        chunks=(1,) + s.shape,
+                        dtype=IMAGE_DTYPE,
+                    )
+                raw_imgs[i] = r
+                self.seg_imgs[i] = s
+                self.num_cells += num_cells
+                localizations.append(frame_localizations)
+
+        # the localizations of all frames for btrack
+        self.localizations = {}
+        for frame_localizations in localizations:
+            for key, values in frame_localizations.items():
+                self.localizations.setdefault(key, []).append(values)
+        self.localizations = {
+            key: np.concatenate(values) for key, values in self.localizations.items()
+        }
+
+    def track_all_frames(
+        self,
+        output_folder: Union[str, bytes, os.PathLike],
+        compression: Optional[str] = None,
+    ):
         """
         Tracks all frames and converts output to standard format.
         :param output_folder: Folder for the output
+        :param compression: The lossless filter of the output h5 files, either None (no compression), "gzip",
+                            "lzf" or "blosc"
         """
 
         tracks = self.run_model()
         df, label_stack = self.generate_midap_output(tracks=tracks)
         data_file, csv_file = self.store_lineages(
-            output_folder=output_folder, df=df, label_stack=label_stack
+            output_folder=output_folder,
+            df=df,
+            label_stack=label_stack,
+            compression=compression,
         )
 
         return data_file, csv_file
@@ -85,15 +188,14 @@ class BayesianCellTracking(Tracking):
         """
 
         # gen the inputs
-        objects = btrack.utils.segmentation_to_objects(
-            segmentation=(self.seg_imgs).astype(int),
-            intensity_image=self.raw_imgs,
-            assign_class_ID=True,
-        )
+        if len(self.localizations) > 0:
+            objects = localizations_to_objects(self.localizations)
+        else:
+            objects = []
         config_file = Path(__file__).parent.joinpath("btrack_conf.json")
 
         # choose update method depending on number of cells
-        cum_sum_cells = np.sum([len(np.unique(s)) - 1 for s in self.seg_imgs])
+        cum_sum_cells = self.num_cells
         num_frames = len(self.seg_imgs)
         max_cells_frame = 1_000
         max_cells_total = num_frames * max_cells_frame
@@ -134,7 +236,6 @@ class BayesianCellTracking(Tracking):
         """
 
         self.logger.info("Creating data frame...")
-        # init the dataframe
         columns = [
             "frame",
             "labelID",
@@ -147,88 +248,117 @@ class BayesianCellTracking(Tracking):
             "first_frame",
             "last_frame",
         ]
-        df = pd.DataFrame(columns=columns)
 
-        # list to transform the labels later
-        label_transforms = []
-        global_id = 1
-        lineage_id = 1
-        for track in tqdm(tracks):
-            # set the parent id
-            parent_id = None
-
-            # go through steps
-            steps = track["t"]
-            for i, t in enumerate(steps):
-                # skip dummies
-                if track["dummy"][i]:
-                    continue
-
-                df.loc[global_id, "frame"] = t
-                df.loc[global_id, "labelID"] = int(track["class_id"][i])
-                df.loc[global_id, "trackID"] = track["ID"]
-                df.loc[global_id, "first_frame"] = min(steps)
-                df.loc[global_id, "last_frame"] = max(steps)
-                df.loc[global_id, "split"] = 0
-
-                # check if there is a parent
-                if track["parent"] != track["ID"]:
-                    parent_id = track["parent"]
-                    df.loc[global_id, "lineageID"] = df.loc[
-                        df["trackID"] == parent_id, "lineageID"
-                    ].max()
-                    df.loc[global_id, "trackID_mother"] = df.loc[
-                        df["trackID"] == parent_id, "trackID"
-                    ].max()
-                else:
-                    df.loc[global_id, "lineageID"] = lineage_id
-
-                # add the transformation
-                label_transforms.append([t, int(track["class_id"][i]), track["ID"]])
-
-                # increment global ID
-                global_id += 1
-
-            # update the parent
-            if parent_id is not None:
-                # set the split event
-                last_frame = df.loc[df["trackID"] == parent_id, "last_frame"].max()
-                df.loc[
-                    (df["trackID"] == parent_id) & (df["frame"] == last_frame), "split"
-                ] = 1
-                # assign kids
-                if df.loc[(df["trackID"] == parent_id), "trackID_d1"].isna().all():
-                    df.loc[(df["trackID"] == parent_id), "trackID_d1"] = track["ID"]
-                elif df.loc[(df["trackID"] == parent_id), "trackID_d2"].isna().all():
-                    df.loc[(df["trackID"] == parent_id), "trackID_d2"] = track["ID"]
-                else:
-                    raise ValueError(
-                        f"Cell with trackID {parent_id} splits into more than 2 cells!"
-                    )
+        # flat arrays of all tracks and of all detections that are not dummies
+        track_ids = np.array([track["ID"] for track in tracks], dtype=int)
+        parent_ids = np.array([track["parent"] for track in tracks], dtype=int)
+        first_frames = np.zeros(len(tracks), dtype=int)
+        last_frames = np.zeros(len(tracks), dtype=int)
+        frames, label_ids, num_detections = [], [], []
+        for num, track in enumerate(tracks):
+            steps = np.asarray(track["t"], dtype=int)
+            first_frames[num], last_frames[num] = steps.min(), steps.max()
+            detections = ~np.asarray(track["dummy"], dtype=bool)
+            frames.append(steps[detections])
+            label_ids.append(np.asarray(track["class_id"])[detections].astype(int))
+            num_detections.append(detections.sum())
+        frames = np.concatenate(frames) if len(tracks) > 0 else np.zeros(0, dtype=int)
+        label_ids = (
+            np.concatenate(label_ids) if len(tracks) > 0 else np.zeros(0, dtype=int)
+        )
+        num_detections = np.array(num_detections, dtype=int)
+        track_index = np.repeat(np.arange(len(tracks)), num_detections)
+
+        # the tracks are processed in order, a daughter is only linked to its parent if the parent came before it
+        has_detections = num_detections > 0
+        is_daughter = (parent_ids != track_ids) & has_detections
+        track_pos = pd.Series(np.arange(len(tracks)), index=track_ids)
+        parent_pos = (
+            track_pos.reindex(parent_ids).fillna(-1).to_numpy(dtype=int)
+            if len(tracks) > 0
+            else np.zeros(0, dtype=int)
+        )
+        linked = (
+            is_daughter
+            & (parent_pos >= 0)
+            & (parent_pos < np.arange(len(tracks)))
+            & has_detections[np.maximum(parent_pos, 0)]
+        )
 
-            # increment lineage
-            else:
-                lineage_id += 1
+        # every track that is not a daughter starts a new lineage, the daughters inherit the lineage of the root
+        lineage_ids = np.cumsum(~is_daughter).astype(float)
+        lineage_ids[is_daughter & ~linked] = np.nan
+        root_pos = np.where(linked, parent_pos, np.arange(len(tracks)))
+        while np.any(root_pos != root_pos[root_pos]):
+            root_pos = root_pos[root_pos]
+        lineage_ids = lineage_ids[root_pos]
+        mother_ids = np.where(linked, parent_ids, np.nan)
+
+        # the first daughter of a parent is d1 and the second d2
+        daughters = pd.DataFrame(
+            {"parent": parent_pos[linked], "trackID": track_ids[linked]}
+        )
+        daughters["rank"] = daughters.groupby("parent").cumcount()
+        if np.any(too_many := daughters["rank"] > 1):
+            parent_id = track_ids[daughters.loc[too_many, "parent"].iloc[0]]
+            raise ValueError(
+                f"Cell with trackID {parent_id} splits into more than 2 cells!"
+            )
+        daughter_ids = np.full((len(tracks), 2), np.nan)
+        daughter_ids[daughters["parent"], daughters["rank"]] = daughters["trackID"]
+
+        # the parents split in their last frame
+        splits = np.isfinite(daughter_ids[track_index, 0]) & (
+            frames == last_frames[track_index]
+        )
+
+        df = pd.DataFrame(
+            {
+                "frame": frames,
+                "labelID": label_ids,
+                "trackID": track_ids[track_index],
+                "lineageID": pd.array(lineage_ids[track_index], dtype="Int64"),
+                "trackID_d1": pd.array(daughter_ids[track_index, 0], dtype="Int64"),
+                "trackID_d2": pd.array(daughter_ids[track_index, 1], dtype="Int64"),
+                "split": splits.astype(int),
+                "trackID_mother": pd.array(mother_ids[track_index], dtype="Int64"),
+                "first_frame": first_frames[track_index],
+                "last_frame": last_frames[track_index],
+            },
+            columns=columns,
+            index=pd.RangeIndex(1, len(frames) + 1),
+        )
+
+        # list to transform the labels later
+        label_transforms = np.stack(
+            [frames, label_ids, track_ids[track_index]], axis=1
+        ).astype(np.int32)
 
         self.logger.info("Creating label stack...")
         # Note: There is the function btrack.utils.update_segmentation that deos this as well, however, this function
         # removes all segmentations whose centroid is not inside the cell, so we use the class_id work around
-        label_stack = self.seg_imgs.copy().astype(np.int32)
+        label_stack = self.seg_imgs.copy()
         label_transform(
             labels=label_stack,
-            transformations=np.array(label_transforms, dtype=np.int32),
+            transformations=label_transforms,
         )
 
         return df, label_stack
 
     def store_lineages(
-        self, output_folder: str, df: pd.DataFrame, label_stack: np.ndarray
+        self,
+        output_folder: str,
+        df: pd.DataFrame,
+        label_stack: np.ndarray,
+        compression: Optional[str] = None,
     ):
         """
         Store tracking output files: labeled stack, tracking output, input files.
         :param output_folder: Folder where to store the data
         :param df: The pandas data frame to store as csv
         :param label_stack: The labelstack array to store
+        :param compression: The lossless filter of the h5 files, either None (no compression), "gzip", "lzf" or
+                            "blosc", compressed datasets are chunked frame by frame
         :return: The data file name and csv file name
         """
 
@@ -240,11 +370,34 @@ class BayesianCellTracking(Tracking):
         df.to_csv(csv_file, index=True, index_label="globalID")
 
         data_file = output_folder.joinpath("tracking_bayesian.h5")
-        with h5py.File(data_file, "w") as hf:
-            hf.create_dataset("images", data=self.raw_imgs.astype(float), dtype=float)
-            hf.create_dataset("labels", data=label_stack.astype(int), dtype=int)
+        with h5py.File(data_file, "w") as hf, h5py.File(self.raw_file, "r") as raw_hf:
+            # the staged raw images are copied frame by frame, no file is read again
+            images = create_frame_dataset(
+                hf,
+                "images",
+                shape=self.seg_imgs.shape,
+                dtype=IMAGE_DTYPE,
+                compression=compression,
+            )
+            for frame in range(self.num_time_steps):
+                images[frame] = raw_hf["images"][frame]
+            create_frame_dataset(
+                hf,
+                "labels",
+                shape=label_stack.shape,
+                dtype=LABEL_DTYPE,
+                data=label_stack,
+                compression=compression,
+            )
 
         with h5py.File(output_folder.joinpath("segmentations_bayesian.h5"), "w") as hf:
-            hf.create_dataset("segmentations", data=self.seg_imgs)
+            create_frame_dataset(
+                hf,
+                "segmentations",
+                shape=self.seg_imgs.shape,
+                dtype=self.seg_imgs.dtype,
+                data=self.seg_imgs,
+                compression=compression,
+            )
 
         return data_file, csv_file
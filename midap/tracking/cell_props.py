@@ -1,11 +1,14 @@
 import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from itertools import repeat
 from pathlib import Path
-from typing import Union
+from typing import Any, Callable, Dict, Optional, Tuple, Union
 
 import h5py
 import numpy as np
 import pandas as pd
-from skimage.measure import regionprops
+from skimage.measure import regionprops_table
 from tqdm import tqdm
 
 from ..utils import get_logger
@@ -17,6 +20,142 @@ else:
     loglevel = 7
 logger = get_logger(__file__, loglevel)
 
+# the registry of the cell properties that are added to the table, it maps the name of a property of
+# skimage.measure.regionprops_table to the columns of its values, the columns are added in this order
+CELL_PROPERTIES = {
+    "area": ("area",),
+    "bbox": ("edges_min_row", "edges_min_col", "edges_max_row", "edges_max_col"),
+    "intensity_max": ("intensity_max",),
+    "intensity_mean": ("intensity_mean",),
+    "intensity_min": ("intensity_min",),
+    "minor_axis_length": ("minor_axis_length",),
+    "major_axis_length": ("major_axis_length",),
+    "centroid": ("x", "y"),
+}
+
+# the registered properties that are not part of skimage.measure.regionprops, maps the name to the function
+EXTRA_PROPERTIES = {}
+
+
+def register_cell_property(
+    name: str,
+    columns: Optional[Tuple[str, ...]] = None,
+    func: Optional[Callable[..., Any]] = None,
+):
+    """
+    Registers a cell property that is added to the table by CellProps.add_cell_probs
+    :param name: The name of the property, a property of skimage.measure.regionprops or the name of func
+    :param columns: The columns of the values of the property, defaults to the name for properties with a single value
+    :param func: A function (regionmask, intensity_image) -> value for properties that are not part of regionprops, it
+                 needs to be defined on module level to be used in a process pool
+    """
+
+    if func is not None and func.__name__ != name:
+        raise ValueError(
+            f"The name of the property must be the name of the function: {func.__name__}"
+        )
+    if columns is None:
+        columns = (name,)
+
+    CELL_PROPERTIES[name] = tuple(columns)
+    if func is not None:
+        EXTRA_PROPERTIES[name] = func
+
+
+def get_frame_props(
+    labels: np.ndarray,
+    image: np.ndarray,
+    frame_num: int,
+    properties: Dict[str, Tuple[str, ...]],
+    extra_properties: Dict[str, Callable[..., Any]],
+):
+    """
+    Calculates the properties of all cells of a frame with a single regionprops_table call
+    :param labels: The label image of the frame, the labels are the track IDs
+    :param image: The intensity image of the frame
+    :param frame_num: The number of the frame
+    :param properties: The properties and their columns, see CELL_PROPERTIES
+    :param extra_properties: The functions of the properties that are not part of regionprops, see EXTRA_PROPERTIES
+    :return: A data frame with the columns frame, trackID and the columns of the properties
+    """
+
+    table = regionprops_table(
+        labels,
+        intensity_image=image,
+        properties=["label"] + [p for p in properties if p not in extra_properties],
+        extra_properties=list(extra_properties.values()),
+    )
+
+    # properties with several values are split into the columns name-0, name-1, ...
+    props = {
+        "frame": np.full(len(table["label"]), frame_num),
+        "trackID": table["label"],
+    }
+    for name, columns in properties.items():
+        keys = [k for k in table if k == name or k.startswith(f"{name}-")]
+        if len(keys) != len(columns):
+            raise ValueError(
+                f"The property {name} has {len(keys)} values but {len(columns)} columns!"
+            )
+        for key, column in zip(keys, columns):
+            props[column] = table[key]
+
+    return pd.DataFrame(props)
+
+
+def get_empty_props(properties: Dict[str, Tuple[str, ...]]):
+    """
+    Creates the properties of a range without cells
+    :param properties: The properties and their columns, see CELL_PROPERTIES
+    :return: An empty data frame with the columns frame, trackID and the columns of the properties
+    """
+
+    props = {"frame": np.empty(0, dtype=int), "trackID": np.empty(0, dtype=int)}
+    for columns in properties.values():
+        for column in columns:
+            props[column] = np.empty(0, dtype=float)
+
+    return pd.DataFrame(props)
+
+
+def get_chunk_props(
+    data_file: Union[str, bytes, os.PathLike],
+    start: int,
+    stop: int,
+    properties: Dict[str, Tuple[str, ...]],
+    extra_properties: Dict[str, Callable[..., Any]],
+):
+    """
+    Calculates the properties of all cells of a contiguous range of frames, the file is opened read-only such that the
+    chunks can be processed in parallel
+    :param data_file: The path to the h5 data file
+    :param start: The first frame of the range
+    :param stop: The end of the range (exclusive)
+    :param properties: The properties and their columns, see CELL_PROPERTIES
+    :param extra_properties: The functions of the properties that are not part of regionprops, see EXTRA_PROPERTIES
+    :return: A data frame with the columns frame, trackID and the columns of the properties
+    """
+
+    with h5py.File(data_file, "r") as f:
+        labels = f["labels"]
+        images = f["images"]
+        frame_props = [
+            get_frame_props(
+                labels[frame_num],
+                images[frame_num],
+                frame_num,
+                properties=properties,
+                extra_properties=extra_properties,
+            )
+            for frame_num in range(start, stop)
+        ]
+
+    # a range without frames has no cells
+    if len(frame_props) == 0:
+        return get_empty_props(properties)
+
+    return pd.concat(frame_props, ignore_index=True)
+
 
 class CellProps:
     """
@@ -45,61 +184,66 @@ class CellProps:
         if not self.csv_file.is_file():
             raise FileNotFoundError(f"CSV file does not exist: {self.csv_file}")
 
-    def add_cell_probs(self, out_file: Union[str, bytes, os.PathLike, None] = None):
+    def add_cell_probs(
+        self, out_file: Union[str, bytes, os.PathLike, None] = None, num_workers=1
+    ):
         """
-        Adds the cellprobs to the table
+        Adds the cellprobs to the table, the properties and their columns are taken from the registry CELL_PROPERTIES
         :param out_file: The CSV output file, if None, the original CSV file is overwritten
+        :param num_workers: The number of processes that calculate the properties of contiguous frame ranges, the frames
+                            are processed in the main process if this is 1
         """
 
         # read the data
         df = pd.read_csv(self.csv_file)
 
         # init the new columns
-        new_cols = [
-            "area",
-            "edges_min_row",
-            "edges_min_col",
-            "edges_max_row",
-            "edges_max_col",
-            "intensity_max",
-            "intensity_mean",
-            "intensity_min",
-            "minor_axis_length",
-            "major_axis_length",
-        ]
+        new_cols = [col for columns in CELL_PROPERTIES.values() for col in columns]
         for new_col in new_cols:
             df[new_col] = np.nan
 
-        # go through cells
+        # the chunks of contiguous frames
         with h5py.File(self.data_file, "r") as f:
-            labels = f["labels"]
-            images = f["images"]
-
-            self.logger.info("Calculating cell properties...")
-            for frame_num, (l, i) in tqdm(
-                enumerate(zip(labels, images)), total=len(labels)
-            ):
-                cell_props = regionprops(l, intensity_image=i)
-                for prop in cell_props:
-                    # select current cell and check
-                    row_selector = (df["frame"] == frame_num) & (
-                        df["trackID"] == prop.label
-                    )
-                    assert np.sum(row_selector) == 1
-
-                    # set all attributes
-                    df.loc[row_selector, "x"] = prop.centroid[0]
-                    df.loc[row_selector, "y"] = prop.centroid[1]
-                    df.loc[row_selector, "edges_min_row"] = prop.bbox[0]
-                    df.loc[row_selector, "area"] = prop.area
-                    df.loc[row_selector, "edges_min_col"] = prop.bbox[1]
-                    df.loc[row_selector, "edges_max_row"] = prop.bbox[2]
-                    df.loc[row_selector, "edges_max_col"] = prop.bbox[3]
-                    df.loc[row_selector, "intensity_max"] = prop.intensity_max
-                    df.loc[row_selector, "intensity_mean"] = prop.intensity_mean
-                    df.loc[row_selector, "intensity_min"] = prop.intensity_min
-                    df.loc[row_selector, "minor_axis_length"] = prop.minor_axis_length
-                    df.loc[row_selector, "major_axis_length"] = prop.major_axis_length
+            num_frames = len(f["labels"])
+        num_chunks = max(1, min(num_frames, 4 * num_workers))
+        bounds = np.linspace(0, num_frames, num_chunks + 1).astype(int)
+        chunk_args = (
+            repeat(self.data_file),
+            bounds[:-1],
+            bounds[1:],
+            repeat(dict(CELL_PROPERTIES)),
+            repeat(dict(EXTRA_PROPERTIES)),
+        )
+
+        # the properties of all frames
+        self.logger.info("Calculating cell properties...")
+        with ExitStack() as stack:
+            if num_workers > 1 and num_chunks > 1:
+                executor = stack.enter_context(
+                    ProcessPoolExecutor(max_workers=num_workers)
+                )
+                chunks = executor.map(get_chunk_props, *chunk_args)
+            else:
+                chunks = map(get_chunk_props, *chunk_args)
+            chunks = list(tqdm(chunks, total=num_chunks))
+        if len(chunks) == 0:
+            props = get_empty_props(CELL_PROPERTIES)
+        else:
+            props = pd.concat(chunks, ignore_index=True)
+
+        # every cell needs exactly one row in the table
+        rows = props[["frame", "trackID"]].merge(
+            df[["frame", "trackID"]].reset_index(),
+            on=["frame", "trackID"],
+            how="left",
+        )["index"]
+        assert len(rows) == len(props) and not rows.isna().any()
+
+        # set all attributes
+        if len(props) > 0:
+            rows = df.index[rows.to_numpy(dtype=int)]
+            for col in new_cols:
+                df.loc[rows, col] = props[col].to_numpy()
 
         # check if all properties are set
         for col in new_cols:
@@ -4,10 +4,10 @@ from typing import Optional, Union
 
 import h5py
 import numpy as np
-import pandas as pd
 from skimage.measure import label
-from tqdm import tqdm
 
+from .base_lineages import Lineages, label_transform
+from .tracking_data import IMAGE_DTYPE, LABEL_DTYPE, create_frame_dataset
 from ..utils import get_logger
 
 # get the logger we readout the variable or set it to max output
@@ -18,7 +18,7 @@ else:
 logger = get_logger(__file__, loglevel)
 
 
-class DeltaTypeLineages:
+class DeltaTypeLineages(Lineages):
     """
     A class to generate lineages based on trackinng outputs.
     """
@@ -28,262 +28,167 @@ class DeltaTypeLineages:
 
     def __init__(
         self,
-        inputs: np.ndarray,
-        results: np.ndarray,
+        inputs: Union[np.ndarray, h5py.Dataset],
+        results: Union[np.ndarray, h5py.Dataset],
         connectivity: int,
         generate_lineage=True,
     ):
         """
-        Initializes the class
+        Initializes the class, the inputs and results are only read frame by frame such that h5py datasets can be
+        used without loading them into memory
         :param inputs: input array for tracking network
         :param results: output array of tracking network
         :param connectivity: The connectivity that should be used to label
         :param generate_lineage: Generate the lineages immediately, defaults to True
         """
 
+        self.inputs = inputs
         self.results = results
+        self.n_frames = len(self.inputs) + 1
 
-        # we append a input for the last frame
-        last_frame = np.zeros_like(inputs[:1])
-        last_frame[0, ..., 0] = inputs[-1, ..., 2]
-        last_frame[0, ..., 1] = label(inputs[-1, ..., 3], connectivity=connectivity)
-
-        self.inputs = np.concatenate([inputs, last_frame], axis=0)
-        self.n_frames = len(self.inputs)
-
-        # in this label stack all cells with the same ID are the same cell
-        self.label_stack = np.zeros(self.inputs.shape[:-1])
+        # we create an input for the last frame
+        last_input = self.inputs[-1]
+        self.last_frame = np.zeros_like(last_input)
+        self.last_frame[..., 0] = last_input[..., 2]
+        self.last_frame[..., 1] = label(last_input[..., 3], connectivity=connectivity)
 
         # get the dataframe
         self.track_output = self.init_dataframe()
+        self.label_transformations = np.zeros((0, 3), dtype=np.int32)
 
         # generate the lineages
         if generate_lineage:
             self.generate_lineages()
 
-    def init_dataframe(self):
+    def get_input_frame(self, frame_index: int):
         """
-        Initialize dataframe for tracking output.
-        :return: An empty dataframe with column labels
+        Returns the input of a frame including the input created for the last frame
+        :param frame_index: The index of the frame
+        :return: The input of the frame (WH4)
         """
 
-        columns = [
-            "frame",
-            "labelID",
-            "trackID",
-            "lineageID",
-            "trackID_d1",
-            "trackID_d2",
-            "split",
-            "trackID_mother",
-            "first_frame",
-            "last_frame",
-        ]
-        return pd.DataFrame(columns=columns)
+        if frame_index == self.n_frames - 1:
+            return self.last_frame
+        return self.inputs[frame_index]
 
     def generate_lineages(self):
         """
         Generates lineages based on output of tracking (U-Net) network.
         """
-        self.logger.info("Generate lineages...")
-        # init the global unique ID and the track ID that track the cell through multiple cells
-        global_id = 1
-        track_id = 1
-
-        # this goes through all labeled input the last
-        for frame_num, label_inp in tqdm(
-            enumerate(self.inputs[..., 1]), total=self.n_frames
-        ):
-            # we get all cells in the frame, first element is background
-            current_local_ids = np.unique(label_inp)[1:]
-
-            # cycle through all local ids
-            for local_id in current_local_ids:
-                # track the cell if it's not already part of a lineage
-                if (
-                    local_id
-                    not in self.track_output.loc[
-                        self.track_output["frame"] == frame_num, "labelID"
-                    ].values
-                ):
-                    global_id, track_id = self._track_cell(
-                        frame_index=frame_num,
-                        cell_label=local_id,
-                        global_id=global_id,
-                        track_id=track_id,
+
+        # we get all cells and the daughters of all cells of all frames, every frame is read once
+        local_ids = []
+        self.daughters = []
+        for frame_index in range(self.n_frames):
+            label_img = self.get_input_frame(frame_index)[..., 1]
+            # first element is background, integer IDs are faster to look up than float IDs
+            local_ids.append(np.unique(label_img)[1:].astype(int))
+            if frame_index > 0:
+                self.daughters.append(
+                    self.get_daughter_table(
+                        results=self.results[frame_index - 1], label_img=label_img
                     )
+                )
+
+        self.track_output = self.track_lineages(
+            local_ids=local_ids, label_dtype=self.inputs.dtype
+        )
+
+        # transformations for the label stack sorted by frame, the stable sort keeps the order within a frame
+        transformations = np.stack(
+            [
+                self.track_output["frame"].values,
+                self.track_output["labelID"].values,
+                self.track_output["trackID"].values,
+            ],
+            axis=1,
+        ).astype(np.int32)
+        self.label_transformations = transformations[
+            np.argsort(transformations[:, 0], kind="stable")
+        ]
 
-    def _track_cell(
-        self,
-        frame_index: int,
-        cell_label: int,
-        global_id: int,
-        track_id: int,
-        first_frame: Optional[int] = None,
-        lineage_id: Optional[int] = None,
-        mother_id: Optional[int] = None,
-    ):
+    def get_label_frame(self, frame_index: int, label_img: Optional[np.ndarray] = None):
         """
-        Tracks a cell through the results recursively
-        :param frame_index: The index of the frame where the cell is located
-        :param cell_label: The label of the cell in the frame given by frame_index
-        :param global_id: The global ID for this cell
-        :param track_id: The tracking ID for this cell
-        :param first_frame: The frame index of the first frame the cell appeared, defaults to frame_index
-        :param lineage_id: The lineage ID of the current lineage
-        :param mother_id: The optional tracking ID of the mother cell if the cell resulted from a split
-        :return: The next unique global and tracking id
+        Returns a frame of the label stack, all cells with the same ID are the same cell
+        :param frame_index: The index of the frame
+        :param label_img: The labeled input image of the frame, read from the inputs if not provided
+        :return: The frame of the label stack
         """
 
-        # set the lineage ID if necessary
-        if lineage_id is None:
-            lineage_id = track_id
-        # get the frist frame if necessary
-        if first_frame is None:
-            first_frame = frame_index
-
-        # we get the cell properties
-        cell = self.inputs[frame_index, ..., 1] == cell_label
-
-        # update label stack
-        self.label_stack[frame_index, cell] = track_id
-
-        # add cell to output
-        self.track_output.loc[global_id, "frame"] = frame_index
-        self.track_output.loc[global_id, "labelID"] = cell_label
-        self.track_output.loc[global_id, "trackID"] = track_id
-        self.track_output.loc[global_id, "lineageID"] = lineage_id
-        self.track_output.loc[global_id, "first_frame"] = first_frame
-        if mother_id is not None:
-            self.track_output.loc[global_id, "trackID_mother"] = mother_id
-
-        # last frame
-        if frame_index == self.n_frames - 1:
-            # no split
-            self.track_output.loc[global_id, "split"] = 0
-            # update the last frame for all previous cells
-            self.track_output.loc[
-                self.track_output["trackID"] == track_id, "last_frame"
-            ] = frame_index
-
-            # return new global id and track id
-            return global_id + 1, track_id + 1
-
-        # Generate binary masks for mother and daughter cells
-        daughter_1 = self.results[frame_index, :, :, 0] == cell_label
-        daughter_2 = self.results[frame_index, :, :, 1] == cell_label
-
-        # Case 1: only daughter 1 is present
-        if daughter_1.sum() > 0 and daughter_2.sum() == 0:
-            # no split occured
-            self.track_output.loc[global_id, "split"] = 0
-            # get the local ID in the next frame
-            new_local_id = self.get_id_from_mask(
-                label_img=self.inputs[frame_index + 1, ..., 1], mask=daughter_1
-            )
-            global_id, track_id = self._track_cell(
-                frame_index=frame_index + 1,
-                cell_label=new_local_id,
-                global_id=global_id + 1,
-                first_frame=first_frame,
-                track_id=track_id,
-                lineage_id=lineage_id,
-            )
+        if label_img is None:
+            label_img = self.get_input_frame(frame_index)[..., 1]
 
-        # Case 2: only daughter 2 is present
-        elif daughter_1.sum() == 0 and daughter_2.sum() > 0:
-            # no split occured
-            self.track_output.loc[global_id, "split"] = 0
-            # get the local ID in the next frame
-            new_local_id = self.get_id_from_mask(
-                label_img=self.inputs[frame_index + 1, ..., 1], mask=daughter_2
-            )
-            global_id, track_id = self._track_cell(
-                frame_index=frame_index + 1,
-                cell_label=new_local_id,
-                global_id=global_id + 1,
-                first_frame=first_frame,
-                track_id=track_id,
-                lineage_id=lineage_id,
-            )
+        # relabel the frame in a single pass, the transformations are sorted by frame
+        start, stop = np.searchsorted(
+            self.label_transformations[:, 0], [frame_index, frame_index + 1]
+        )
+        transformations = self.label_transformations[start:stop].copy()
+        transformations[:, 0] = 0
+        labels = label_img.astype(LABEL_DTYPE)[None]
+        label_transform(labels=labels, transformations=transformations)
 
-        # Case 3: cell split: both daughters are present
-        elif daughter_1.sum() > 0 and daughter_2.sum() > 0:
-            # split occured
-            self.track_output.loc[global_id, "split"] = 1
-            # update the last frame for all previous cells
-            self.track_output.loc[
-                self.track_output["trackID"] == track_id, "last_frame"
-            ] = frame_index
-
-            # mother id for both cells
-            mother_id = track_id
-
-            # deal with daughter 1, get new local ID, set trackID of daughter for previous cells, tracl
-            new_local_id = self.get_id_from_mask(
-                label_img=self.inputs[frame_index + 1, ..., 1], mask=daughter_1
-            )
-            self.track_output.loc[
-                self.track_output["trackID"] == mother_id, "trackID_d1"
-            ] = (track_id + 1)
-            global_id, track_id = self._track_cell(
-                frame_index=frame_index + 1,
-                cell_label=new_local_id,
-                global_id=global_id + 1,
-                track_id=track_id + 1,
-                lineage_id=lineage_id,
-                mother_id=mother_id,
-            )
+        return labels[0]
 
-            # deal with daughter 2, get new local ID, set trackID of daughter for previous cells, track
-            new_local_id = self.get_id_from_mask(
-                label_img=self.inputs[frame_index + 1, ..., 1], mask=daughter_2
-            )
-            # we do not need to increment track and global id here, since the previous call did that
-            self.track_output.loc[
-                self.track_output["trackID"] == mother_id, "trackID_d2"
-            ] = track_id
-            global_id, track_id = self._track_cell(
-                frame_index=frame_index + 1,
-                cell_label=new_local_id,
-                global_id=global_id,
-                track_id=track_id,
-                lineage_id=lineage_id,
-                mother_id=mother_id,
-            )
+    @property
+    def label_stack(self):
+        """
+        The full label stack, note that this loads all frames into memory
+        :return: The label stack as array of shape TWH
+        """
+
+        return np.stack([self.get_label_frame(i) for i in range(self.n_frames)])
 
-        # case 4: cell disappears
-        elif daughter_1.sum() == 0 and daughter_2.sum() == 0:
-            # no split occured
-            self.track_output.loc[global_id, "split"] = 0
-            # update the last frame for all previous cells
-            self.track_output.loc[
-                self.track_output["trackID"] == track_id, "last_frame"
-            ] = frame_index
-            # update global and track id
-            global_id += 1
-            track_id += 1
-
-        return global_id, track_id
-
-    def get_id_from_mask(self, label_img, mask):
+    def get_daughter_table(self, results: np.ndarray, label_img: np.ndarray):
         """
-        Given an labeled image and a mask, return the label of occuring in the mask,
-        :param label_img: The labeled image
-        :param mask: The mask to apply
-        :return: The unique label of the mask, raises an error if multiple labels are within the mask
+        Creates a lookup table for the daughters of all cells of a frame from the contingency table of the labels of
+        the tracking results and the labels of the next frame.
+        :param results: The results of the tracking network of the frame (WH2)
+        :param label_img: The labeled image of the next frame
+        :return: A dict label -> list of local IDs of the daughters in the next frame
         """
 
-        masked_id = np.unique(label_img[mask])
+        daughters = {}
+        label_img = label_img.ravel()
+        n_labels = int(label_img.max()) + 1
+        for channel in range(2):
+            res = results[..., channel].ravel()
+            # only the cells are converted, the images are mostly background
+            mask = res > 0
+            cells = res[mask].astype(int)
 
-        assert len(masked_id) == 1
+            # the non-zero entries of the contingency table, sorted by cell label
+            pairs = np.unique(cells * n_labels + label_img[mask].astype(int))
+            cell_labels, daughter_ids = np.divmod(pairs, n_labels)
 
-        return masked_id[0]
+            # each daughter has to be a unique cell in the next frame
+            assert len(np.unique(cell_labels)) == len(cell_labels)
 
-    def store_lineages(self, output_folder: Union[str, bytes, os.PathLike]):
+            for cell_label, daughter_id in zip(cell_labels, daughter_ids):
+                daughters.setdefault(cell_label, []).append(daughter_id)
+
+        return daughters
+
+    def get_daughters(self, frame_index: int, cell_label: int):
+        """
+        Returns the labels of the cell in the next frame given by the output of the tracking network
+        :param frame_index: The index of the frame where the cell is located
+        :param cell_label: The label of the cell in the frame given by frame_index
+        :return: A list of labels in the next frame, empty if the cell disappears and two labels if the cell splits
+        """
+
+        return self.daughters[frame_index].get(cell_label, [])
+
+    def store_lineages(
+        self,
+        output_folder: Union[str, bytes, os.PathLike],
+        compression: Optional[str] = None,
+    ):
         """
         Store tracking output files: labeled stack, tracking output, input files.
         :output_folder: Folder where to store the data
+        :param compression: The lossless filter of the h5 files, either None (no compression), "gzip", "lzf" or
+                            "blosc", compressed datasets are chunked frame by frame
+        :return: The data file name and csv file name
         """
 
         # transform to path
@@ -293,11 +198,22 @@ class DeltaTypeLineages:
         csv_file = output_folder.joinpath("track_output_delta.csv")
         self.track_output.to_csv(csv_file, index=True, index_label="globalID")
 
-        raw_inputs = self.inputs[:, :, :, 0]
+        # we write the data frame by frame
         data_file = output_folder.joinpath("tracking_delta.h5")
+        shape = (self.n_frames,) + self.last_frame.shape[:2]
         with h5py.File(data_file, "w") as hf:
-            hf.create_dataset("images", data=raw_inputs.astype(float), dtype=float)
-            hf.create_dataset("labels", data=self.label_stack.astype(int), dtype=int)
+            images = create_frame_dataset(
+                hf, "images", shape=shape, dtype=IMAGE_DTYPE, compression=compression
+            )
+            labels = create_frame_dataset(
+                hf, "labels", shape=shape, dtype=LABEL_DTYPE, compression=compression
+            )
+            for frame_index in range(self.n_frames):
+                inp = self.get_input_frame(frame_index)
+                images[frame_index] = inp[..., 0]
+                labels[frame_index] = self.get_label_frame(
+                    frame_index=frame_index, label_img=inp[..., 1]
+                )
 
         segs = self.inputs[0, :, :, 3]
         with h5py.File(output_folder.joinpath("segmentations_delta.h5"), "w") as hf:
@@ -1,14 +1,16 @@
 import math  # to compute cosinus of angles
 import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
-from typing import Union, List
+from typing import List, Optional, Union
 
-import cv2
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 
 # scipy package to compute distance between matrices of cell centroid coordinates
+from scipy.ndimage import find_objects
 from scipy.spatial.distance import cdist
 from skimage import io
 
@@ -17,508 +19,413 @@ from skimage.measure import regionprops
 
 from midap.utils import get_logger
 
-
 # This file is taken from the following repository:
 # https://github.com/Helena-todd/STrack/blob/master/Docker_structure/strack_script_v4.py
+# The centroids and the matching percentages are computed for all cells at once instead of mask by mask with
+# full-frame copies and the orientations only for the mothers that can divide, the links are the same as in the
+# original script.
+
+# the columns of the tracking tables
+TABLE_COLUMNS = [
+    "Timepoint",
+    "Mask_nb",
+    "Centroid_x",
+    "Centroid_y",
+    "Mother_mask",
+    "Pctg_matching",
+    "Centroid_x_mother",
+    "Centroid_y_mother",
+    "Distance_to_mother",
+]
+
+
+def get_cell_properties(img: np.ndarray):
+    """
+    Computes the properties of all cells of a labeled image. The cells are numbered by their position in the sorted
+    unique values of the image starting with 1, the first unique value is the background.
+    :param img: The labeled image
+    :return: The position of every pixel in the unique values (0 for the background), the integer centroids (x, y)
+             as array with shape (n_cells, 2) and the areas of the cells
+    """
 
+    if (
+        img.dtype.kind in "iu"
+        and img.size > 0
+        and 0 <= img.min() <= img.max() <= img.size
+    ):
+        # the labels are at most the number of pixels, a lookup table is faster than sorting all pixels
+        counts = np.bincount(img.ravel())
+        unique = np.flatnonzero(counts)
+        lookup = np.zeros(len(counts), dtype=np.intp)
+        lookup[unique] = np.arange(len(unique))
+        inverse = lookup[img]
+        counts = counts[unique]
+    else:
+        _, inverse, counts = np.unique(img, return_inverse=True, return_counts=True)
+        inverse = inverse.reshape(img.shape)
+
+    # the sums of the coordinates are exact, the truncated centroids are the same as int(M["m10"] / M["m00"]) of
+    # cv2.moments for every mask
+    labels = inverse.ravel()
+    pixels = np.flatnonzero(labels)
+    rows, cols = np.divmod(pixels, img.shape[1])
+    sum_x = np.bincount(labels[pixels], weights=cols, minlength=len(counts))
+    sum_y = np.bincount(labels[pixels], weights=rows, minlength=len(counts))
+    centroids = np.stack([sum_x / counts, sum_y / counts], axis=1)[1:].astype(int)
+
+    return inverse, centroids, counts[1:]
+
+
+def get_orientation(mask: np.ndarray):
+    """
+    Computes the orientation of the main axis of a cell, i.e. the angle between the x-axis and the main axis ranging
+    from -90 to 90 degrees counter-clockwise
+    :param mask: The binary mask of the cell, e.g. cropped to its bounding box
+    :return: The orientation in degrees
+    """
 
-def run_strack(
-    files_list: List[Union[str, bytes, os.PathLike]],
-    output_dir: Union[str, bytes, os.PathLike],
+    return np.degrees(regionprops(mask.astype(np.uint8))[0].orientation)
+
+
+def get_matching_percentages(
+    inverse0: np.ndarray,
+    inverse1: np.ndarray,
+    areas1: np.ndarray,
+    dist_mat: np.ndarray,
+    max_dist: float,
+):
+    """
+    Computes the percentage of the pixels of the cells in the current frame that overlap with the cells of the
+    previous frame from the contingency matrix of the two frames
+    :param inverse0: The cell numbers of all pixels of the previous frame (0 for the background)
+    :param inverse1: The cell numbers of all pixels of the current frame (0 for the background)
+    :param areas1: The areas of the cells of the current frame
+    :param dist_mat: The distances between the centroids of the cells of the previous (rows) and current frame
+    :param max_dist: The percentages of cells further apart than this are set to 0
+    :return: The cell pairs (row and column of the distance matrix) with nonzero percentages and their percentages
+    """
+
+    # count the overlapping pixels of all cell pairs
+    n_cells1 = dist_mat.shape[1]
+    overlap = (inverse0 > 0) & (inverse1 > 0)
+    pairs, overlaps = np.unique(
+        (inverse0[overlap].astype(np.int64) - 1) * n_cells1 + inverse1[overlap] - 1,
+        return_counts=True,
+    )
+    rows, cols = np.divmod(pairs, n_cells1)
+
+    # only the cells that are close enough are matched
+    close = dist_mat[rows, cols] <= int(max_dist)
+    rows, cols, overlaps = rows[close], cols[close], overlaps[close]
+
+    return rows, cols, overlaps / areas1[cols] * 100
+
+
+def get_division_angle(
+    orientation_mother: float, centroid1: np.ndarray, centroid2: np.ndarray
+):
+    """
+    Computes the difference between the orientation of the mother cell and the orientation of the division into two
+    daughter cells
+    :param orientation_mother: The orientation of the main axis of the mother cell in degrees
+    :param centroid1: The centroid (x, y) of the first daughter cell
+    :param centroid2: The centroid (x, y) of the second daughter cell
+    :return: The difference of the angles in degrees
+    """
+
+    # Angle between cell1 and cell2
+    dx = float(centroid2[0] - centroid1[0])
+    dy = float(centroid2[1] - centroid1[1])
+    orientation_daughters = math.degrees(math.atan2(dy, dx))
+
+    # Re-scale daughters orientation so that it matches the scale of the mother orientation,
+    # which allows to make the angles comparable
+    if (orientation_daughters >= -180) and (orientation_daughters <= -90):
+        orientation_daughters = -orientation_daughters - 90
+    elif (orientation_daughters >= 0) and (orientation_daughters <= 90):
+        orientation_daughters = 90 - orientation_daughters
+    elif (orientation_daughters > -90) and (orientation_daughters < 0):
+        orientation_daughters = -90 - orientation_daughters
+    elif (orientation_daughters > 90) and (orientation_daughters <= 180):
+        orientation_daughters = -orientation_daughters + 90
+
+    # Compute difference between 2 angles:
+    # If they have the same sign, simply substact them
+    if np.sign(orientation_mother) == np.sign(orientation_daughters):
+        return abs(orientation_mother - orientation_daughters)
+    # If they have opposite signs, sum up their absolute values
+    else:
+        return abs(orientation_mother) + abs(orientation_daughters)
+
+
+def get_frame_links(
+    img0: np.ndarray,
+    img1: np.ndarray,
+    tp: int,
+    max_dist: float,
+    max_angle: float,
+):
+    """
+    Computes the mother-daughter links between two frames according to highest pixel matching or distance matching
+    :param img0: The labeled image of the previous frame
+    :param img1: The labeled image of the current frame
+    :param tp: The timepoint of the current frame
+    :param max_dist: The maximum distance between two cells to be considered as the same cell
+    :param max_angle: The maximum angle between two cells to be considered as the same cell
+    :return: The tracking table of the current frame as array with the columns TABLE_COLUMNS, the mask numbers are
+             the positions of the cells in the sorted labels of the current frame
+    """
+
+    # the cell properties of both frames and the distances between all centroids
+    inverse0, centroids0, _ = get_cell_properties(img0)
+    inverse1, centroids1, areas1 = get_cell_properties(img1)
+    dist_mat = cdist(centroids0, centroids1)
+    n_cells0, n_cells1 = dist_mat.shape
+
+    # the rows of the table, the linked daughters of all mothers and the cells that are still in the table
+    rows = []
+    daughters = {}
+    free_mothers = np.ones(n_cells0, dtype=bool)
+    free_daughters = np.ones(n_cells1, dtype=bool)
+    orientations0 = {}
+    boxes0 = find_objects(inverse0)
+
+    def add_row(mother: int, daughter: int, pctg: float, distance: float):
+        """
+        Adds a row to the table and removes the daughter cell from the table, a new track is created if the mother
+        is -1
+        """
+
+        mother_centroid = centroids0[mother] if mother >= 0 else centroids1[daughter]
+        rows.append(
+            (tp, daughter + 1, *centroids1[daughter], mother + 1, pctg)
+            + (*mother_centroid, distance)
+        )
+        free_daughters[daughter] = False
+        if mother >= 0:
+            daughters.setdefault(mother, []).append(daughter)
+
+    def angle_ok(mother: int, daughter: int):
+        """
+        Checks if the angle between mother cell orientation and division into 2 daughters is small enough
+        """
+
+        # the orientation is only needed for the mothers of two daughters
+        if mother not in orientations0:
+            orientations0[mother] = get_orientation(
+                inverse0[boxes0[mother]] == mother + 1
+            )
+        angle = get_division_angle(
+            orientations0[mother],
+            centroids1[daughters[mother][0]],
+            centroids1[daughter],
+        )
+        return angle < int(max_angle)
+
+    # while there are still overlapping cells, link the best match, ties are resolved in the order of the cells
+    mothers, cells, pctgs = get_matching_percentages(
+        inverse0, inverse1, areas1, dist_mat=dist_mat, max_dist=max_dist
+    )
+    order = np.lexsort((cells, mothers, -pctgs))
+    for mother, daughter, pctg in zip(mothers[order], cells[order], pctgs[order]):
+        if not (free_mothers[mother] and free_daughters[daughter]):
+            continue
+
+        # If the mother cell does not have daughters yet create link, a second daughter removes the mother
+        if mother not in daughters:
+            add_row(mother, daughter, pctg, dist_mat[mother, daughter])
+        elif angle_ok(mother, daughter):
+            add_row(mother, daughter, pctg, dist_mat[mother, daughter])
+            free_mothers[mother] = False
+
+    # if there are no more overlapping cells, look at distances
+    mothers = np.flatnonzero(free_mothers)
+    cells = np.flatnonzero(free_daughters)
+    dist_tmp = dist_mat[np.ix_(mothers, cells)]
+    while dist_tmp.size != 0:
+        # find best match: the minimum distance in the remaining dist matrix
+        row, col = np.unravel_index(np.argmin(dist_tmp), dist_tmp.shape)
+        mother, daughter, distance = mothers[row], cells[col], dist_tmp[row, col]
+
+        # if distance between mother and daughter cell is too large, create a new track
+        if distance >= int(max_dist):
+            add_row(-1, daughter, 0.0, distance)
+        elif mother not in daughters:
+            add_row(mother, daughter, 0.0, distance)
+        elif angle_ok(mother, daughter):
+            add_row(mother, daughter, 0.0, distance)
+            dist_tmp = np.delete(dist_tmp, row, 0)
+            mothers = np.delete(mothers, row)
+        else:
+            # set distance to an extremely high value so it never gets picked again
+            dist_tmp[row, col] = 1000
+            continue
+
+        # remove daughter cell from the dist matrix
+        dist_tmp = np.delete(dist_tmp, col, 1)
+        cells = np.delete(cells, col)
+
+    return np.array(rows, dtype=float).reshape(-1, len(TABLE_COLUMNS))
+
+
+def get_tracking_table(table: np.ndarray):
+    """
+    Converts the tracking table of a frame into the data frame of the original STrack output
+    :param table: The tracking table as array with the columns TABLE_COLUMNS
+    :return: The data frame indexed by the mask numbers
+    """
+
+    if len(table) == 0:
+        return pd.DataFrame(columns=TABLE_COLUMNS)
+    return pd.DataFrame(
+        table, index=pd.Index(table[:, 1].astype(int)), columns=TABLE_COLUMNS
+    )
+
+
+def plot_links(img: np.ndarray, table: np.ndarray, file_name: Union[str, os.PathLike]):
+    """
+    Plots the links of the tracking table on top of the labeled image
+    :param img: The labeled image of the current frame
+    :param table: The tracking table of the current frame as array with the columns TABLE_COLUMNS
+    :param file_name: The file name of the figure
+    """
+
+    x = [TABLE_COLUMNS.index("Centroid_x_mother"), TABLE_COLUMNS.index("Centroid_x")]
+    y = [TABLE_COLUMNS.index("Centroid_y_mother"), TABLE_COLUMNS.index("Centroid_y")]
+
+    plt.figure(figsize=(10, 10))
+    ax = plt.gca()
+    ax.imshow(img)
+    if len(table) > 0:
+        plt.plot(table[:, x].T, table[:, y].T, "r-", lw=2)
+    plt.savefig(file_name)
+    plt.close()
+
+
+def link_frame_pair(
+    img0: np.ndarray,
+    img1: np.ndarray,
+    tp: int,
     max_dist: float,
     max_angle: float,
+    output_dir: Optional[Path] = None,
+    save_tables=False,
+    save_figures=False,
+):
+    """
+    Computes the links between two frames and saves the tracking table and figure if requested
+    :param img0: The labeled image of the previous frame
+    :param img1: The labeled image of the current frame
+    :param tp: The timepoint of the current frame
+    :param max_dist: The maximum distance between two cells to be considered as the same cell
+    :param max_angle: The maximum angle between two cells to be considered as the same cell
+    :param output_dir: The output directory of the tables and figures
+    :param save_tables: If True, the tracking table is saved as tracking_table_time{tp}.csv
+    :param save_figures: If True, the links are plotted into tracking_figure_time{tp}.png
+    :return: The links as int array with the columns Mask_nb and Mother_mask
+    """
+
+    # Identify mother-daughter links according to highest pixel matching or distance matching
+    table = get_frame_links(img0, img1, tp=tp, max_dist=max_dist, max_angle=max_angle)
+
+    # Export tracking info and matching cells info for the current timepoint
+    if save_tables:
+        get_tracking_table(table).to_csv(
+            output_dir.joinpath(f"tracking_table_time{tp}.csv")
+        )
+
+    # Export corresponding image with tracking info plotted on top
+    if save_figures:
+        plot_links(img1, table, output_dir.joinpath(f"tracking_figure_time{tp}.png"))
+
+    columns = [TABLE_COLUMNS.index("Mask_nb"), TABLE_COLUMNS.index("Mother_mask")]
+    return table[:, columns].astype(int)
+
+
+def link_file_pair(
+    file0: Union[str, bytes, os.PathLike],
+    file1: Union[str, bytes, os.PathLike],
+    tp: int,
+    kwargs: dict,
+):
+    """
+    Reads two frames and computes their links, this is the work of a single frame pair that can be done in a worker
+    process
+    :param file0: The file of the previous frame
+    :param file1: The file of the current frame
+    :param tp: The timepoint of the current frame
+    :param kwargs: The keyword arguments of link_frame_pair
+    :return: The links as int array with the columns Mask_nb and Mother_mask
+    """
+
+    return link_frame_pair(io.imread(file0), io.imread(file1), tp=tp, **kwargs)
+
+
+def run_strack(
+    files_list: List[Union[str, bytes, os.PathLike]],
+    output_dir: Optional[Union[str, bytes, os.PathLike]] = None,
+    max_dist=50.0,
+    max_angle=30.0,
     loglevel=7,
+    save_tables=False,
+    save_figures=False,
+    num_workers=1,
 ):
     """
     Run the STrack algorithm
     :param files_list: List of files to process, sorted and tif format
-    :param output_dir: The output directory
+    :param output_dir: The output directory, only needed if the tables or figures are saved
     :param max_dist: The maximum distance between two cells to be considered as the same cell
     :param max_angle: The maximum angle between two cells to be considered as the same cell
     :param loglevel: The loglevel between 0 and 7, defaults to highest level
+    :param save_tables: If True, the tracking table of every frame is saved as tracking_table_time{tp}.csv
+    :param save_figures: If True, the links of every frame are plotted into tracking_figure_time{tp}.png
+    :param num_workers: The number of processes that compute the links of the frame pairs, the frames are processed
+                        in the main process if this is 1
+    :return: A list with the links of every frame except the first as int arrays with the columns Mask_nb and
+             Mother_mask, new tracks have the mother 0
     """
 
     # get the logger
     logger = get_logger(__file__, loglevel)
 
     # prep output dir
-    output_dir = Path(output_dir)
+    if save_tables or save_figures:
+        if output_dir is None:
+            raise ValueError(
+                "An output directory is needed to save the tables or figures!"
+            )
+        output_dir = Path(output_dir)
+    kwargs = dict(
+        max_dist=max_dist,
+        max_angle=max_angle,
+        output_dir=output_dir,
+        save_tables=save_tables,
+        save_figures=save_figures,
+    )
+
+    # every frame pair is independent, the workers read both frames of their pairs
+    num_pairs = len(files_list) - 1
+    if num_workers > 1 and num_pairs > 1:
+        logger.info(f"Processing {num_pairs} frame pairs...")
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            return list(
+                executor.map(
+                    link_file_pair,
+                    files_list[:-1],
+                    files_list[1:],
+                    range(1, len(files_list)),
+                    repeat(kwargs),
+                    chunksize=max(1, num_pairs // (4 * num_workers)),
+                )
+            )
 
+    links = []
+    img1 = io.imread(files_list[0]) if len(files_list) > 1 else None
     for tp in range(1, len(files_list)):
-        # Import image corresponding to timepoint tp and tp-1
+        # Import image corresponding to timepoint tp, the image of tp-1 is reused
         logger.info(f"Processing file {files_list[tp]}")
-        img1 = io.imread(files_list[tp])
-        img0 = io.imread(files_list[tp - 1])
-
-        # See how many cells were identified in the images (ranged in the "unique" vectors)
-        unique1, counts1 = np.unique(img1, return_counts=True)
-        # In registered images, it can happen that one cell gets skipped in the unique1 array, which leads to number of cells in unique1 and counts1 NOT MATCHING the unique1 indices. I thus create a unique11 array with continuous cell indices, to be used to track daughters that are still unmatched.
-        unique11 = np.array(range(0, len(unique1)))
-        unique0, counts0 = np.unique(img0, return_counts=True)
-        unique01 = np.array(range(0, len(unique0)))
-
-        ############################################################
-        # compute the mask centroids of all cells in img0 and img1 #
-        ############################################################
-        my_array0 = np.empty((0, 2), int)
-        for mask_tmp in unique0[1:]:
-            # Keep only current mask, replace all other values by 0
-            img_tmp = np.where(img0 != mask_tmp, 0, img0)
-
-            # compute cell centroid
-            M = cv2.moments(img_tmp)
-            cx = int(M["m10"] / M["m00"])
-            cy = int(M["m01"] / M["m00"])
-            my_array0 = np.append(my_array0, [[cx, cy]], axis=0)
-
-        my_array1 = np.empty((0, 2), int)
-        for mask_tmp in unique1[
-            1:
-        ]:  # [:1] because I'm not interested in pixels with a value of 0: the background
-            # Keep only current mask, replace all other values by 0
-            img_tmp = np.where(img1 != mask_tmp, 0, img1)
-
-            # compute cell centroid
-            M = cv2.moments(img_tmp)
-            cx = int(M["m10"] / M["m00"])
-            cy = int(M["m01"] / M["m00"])
-            my_array1 = np.append(my_array1, [[cx, cy]], axis=0)
-
-        ########################################################################################
-        # Compute distances between 2 matrices (in a similar way to R's pdist::pdist function) #
-        ########################################################################################
-        dist_mat = cdist(my_array0, my_array1)
-
-        #################################################################################
-        # Compute percentage of matching pixels between masks in img0 and masks in img1 #
-        #################################################################################
-        # Create empty array, has as many columns as number of cells in img1
-        matching_pctgs = np.empty((0, len(unique1) - 1), int)
-
-        # Loop over masks in img0
-        for idx0 in unique01[: len(unique01) - 1]:
-            # Keep only current mask, replace all other values by 0
-            img_tmp0 = np.where(img0 != unique0[1:][idx0], 0, img0)
-
-            # Loop over masks in img1 that are close enough to the current cell in img0
-            distances_to_mother = dist_mat[idx0, :]
-            line_tmp = np.zeros(
-                len(distances_to_mother)
-            )  # create an empty array that will store final percentages
-            indices1 = np.where(distances_to_mother <= int(max_dist))
-
-            for idx1 in indices1[0]:
-                # Keep only current mask, replace all other values by 0
-                img_tmp1 = np.where(img1 != unique1[1:][idx1], 0, img1)
-
-                # flatten both images, replace all non 0 values by 1
-                img_flattened0 = img_tmp0.flatten()
-                img_flattened0[img_flattened0 != 0] = 1
-                img_flattened1 = img_tmp1.flatten()
-                img_flattened1[img_flattened1 != 0] = 1
-                # change integers to floats
-                img_flattened0 = img_flattened0.astype("float")
-                img_flattened1 = img_flattened1.astype("float")
-                # replace 0 in previous frame by NaN so that they don't correpond to 0 in current frame
-                img_flattened0[img_flattened0 == 0] = "nan"
-                # compute difference between mask in current frame and mask in previous frame
-                img_differences = img_flattened0 == img_flattened1
-                # compute percentage of pixels in current masks that match with mask in previous frame
-                pctg_matching = (
-                    (len(img_differences[img_differences == True]))
-                    / (len(img_flattened1[img_flattened1 != 0]))
-                    * 100
-                )
-                # add current pctg matching value to the line for current mask in img0 and in img1
-                line_tmp[idx1] = pctg_matching
-
-            # Fill in complete line of matching pctgs for current mask in img0
-            matching_pctgs = np.append(matching_pctgs, [line_tmp], axis=0)
-
-        ##############################################################
-        # Compute orientation of the main axis of cell masks in img0 #
-        ##############################################################
-        # Create an empty array to store cell orientations
-        orientations = np.array([])
-
-        # Loop over masks in img0
-        for idx0 in unique0[1:]:
-            # Keep only current mask, replace all other values by 0
-            img_tmp0 = np.where(img0 != idx0, 0, img0)
-            # Replace all values different from 0 by 1
-            img_tmp0[img_tmp0 != 0] = 1
-            # Compute regions
-            regions = regionprops(img_tmp0)
-            # The 'Orientation' property of REGIONPROPS returns the angle (in degrees)
-            # between the x-axis and the major axis of the cell.
-            # ranging from `-pi/2` to `pi/2` counter-clockwise
-
-            # Fill in orientations vector
-            orientations = np.append(
-                orientations, math.degrees(regions[0].orientation)
-            )  # math.degrees allows to change radiants into degrees
-
-        ###########################################################################################
-        # Identify mother-daughter links according to highest pixel matching or distance matching #
-        ###########################################################################################
-
-        # Create empty result table
-        complete_table = pd.DataFrame(
-            columns=[
-                "Timepoint",
-                "Mask_nb",
-                "Centroid_x",
-                "Centroid_y",
-                "Mother_mask",
-                "Pctg_matching",
-                "Centroid_x_mother",
-                "Centroid_y_mother",
-                "Distance_to_mother",
-            ]
-        )
+        img0, img1 = img1, io.imread(files_list[tp])
+        links.append(link_frame_pair(img0, img1, tp=tp, **kwargs))
 
-        # create vectors with cell indices to keep track of who's still in the tables as rows and columns are being removed
-        daughters_still_in_table = unique11[1:]
-        mothers_still_in_table = unique01[1:]
-
-        # while there are still cells in the matching_pctgs array, search for mother-daughter links
-        while matching_pctgs.size != 0:
-            # print("daughters still in tables: ", daughters_still_in_table)
-            # print("mothers still in tables: ", mothers_still_in_table)
-            # if there are still overlapping cells in tp-1 and current tp
-            if np.amax(matching_pctgs) != 0:
-                # find best match: the maximum overlap in the pctgs array
-                tmp_match = np.where(matching_pctgs == np.amax(matching_pctgs))
-                # print("tmp match [0][0] is ", tmp_match[0][0], " and tmp match [1][0] is ", tmp_match[1][0])
-                # print(" pctg matching is ", np.amax(matching_pctgs))
-
-                mother_tmp = mothers_still_in_table[tmp_match[0][0]]
-                # print("mother tmp is ", mother_tmp)
-                daughter_tmp = daughters_still_in_table[tmp_match[1][0]]
-                # print("daughter tmp is ", daughter_tmp)
-                # If the mother cell does not have daughters yet
-                if mother_tmp not in complete_table["Mother_mask"].values:
-                    # create link
-                    complete_table.loc[daughter_tmp] = [
-                        tp,  # timepoint
-                        daughter_tmp,  # mask number
-                        my_array1[daughter_tmp - 1][0],  # = cx
-                        my_array1[daughter_tmp - 1][1],  # = cy
-                        mother_tmp,  # mother mask
-                        np.amax(matching_pctgs),  # pctg matching
-                        my_array0[mother_tmp - 1][0],  # cx mother
-                        my_array0[mother_tmp - 1][1],  # cy mother
-                        dist_mat[tmp_match[0][0], tmp_match[1][0]],
-                    ]  # distance btw mother and daughter cell
-                    # remove daughter cell from matching_pctgs and dist_mat tables
-                    matching_pctgs = np.delete(matching_pctgs, tmp_match[1][0], 1)
-                    dist_mat = np.delete(dist_mat, tmp_match[1][0], 1)
-                    # also remove daughter cell from daughters_still_in_table array
-                    daughters_still_in_table = np.delete(
-                        daughters_still_in_table, tmp_match[1][0]
-                    )
-
-                # else, if the mother cell already has one daughter cell
-                elif (
-                    np.count_nonzero(complete_table["Mother_mask"].values == mother_tmp)
-                    == 1
-                ):
-                    # recover info on the cell that has already been asigned to the same mother
-                    other_daughter_line = complete_table.loc[
-                        complete_table["Mother_mask"] == mother_tmp
-                    ]
-                    # compute angle between current cell's centroid and its hypothetic sister's centroid
-                    cell1_centroid = (
-                        other_daughter_line["Centroid_x"],
-                        other_daughter_line["Centroid_y"],
-                    )
-                    cell2_centroid = (
-                        my_array1[daughter_tmp - 1][0],
-                        my_array1[daughter_tmp - 1][1],
-                    )
-                    # Difference in x coordinates
-                    dx = cell2_centroid[0] - cell1_centroid[0]
-                    # print(" cell1 centroids are ", cell1_centroid)
-                    # print(" cell2 centroids are ", cell2_centroid)
-                    # Difference in y coordinates
-                    dy = cell2_centroid[1] - cell1_centroid[1]
-                    # Angle between cell1 and cell2 in radians
-                    theta = math.atan2(dy, dx)
-                    orientation_daughters = math.degrees(theta)
-                    # print("Orientation of division is ", orientation_daughters, " and its sign is ", np.sign(orientation_daughters + 90))
-
-                    # Re-scale daughters orientation so that it matches the scale of the mother orientation,
-                    # which allows to make the angles comparable
-                    if (orientation_daughters >= -180) and (
-                        orientation_daughters <= -90
-                    ):
-                        orientation_daughters = -orientation_daughters - 90
-                    elif (orientation_daughters >= 0) and (orientation_daughters <= 90):
-                        orientation_daughters = 90 - orientation_daughters
-                    elif (orientation_daughters > -90) and (orientation_daughters < 0):
-                        orientation_daughters = -90 - orientation_daughters
-                    elif (orientation_daughters > 90) and (
-                        orientation_daughters <= 180
-                    ):
-                        orientation_daughters = -orientation_daughters + 90
-
-                    orientation_mother = orientations[mother_tmp - 1]
-                    # print("Orientation of mother is ", orientation_mother, " and its sign is ", np.sign(orientation_mother))
-                    # print("Orientation of division AFTER RE-SCALING is ", orientation_daughters, " and its sign is ", np.sign(orientation_daughters))
-
-                    # Compute difference between 2 angles:
-                    # If they have the same sign, simply substact them
-                    if np.sign(orientation_mother) == np.sign(orientation_daughters):
-                        diff_btw_angles = abs(
-                            orientation_mother - (orientation_daughters)
-                        )
-                    # If they have opposite signs, sum up their absolute values
-                    else:
-                        diff_btw_angles = abs(orientation_mother) + abs(
-                            (orientation_daughters)
-                        )
-
-                    # If angle between mother cell orientation and division into 2 daughters is small enough, add daughter cell link
-                    # print("difference between angles is ", diff_btw_angles)
-                    if diff_btw_angles < int(max_angle):
-                        # print("Angle is small enough, daughter cell will be added")
-                        complete_table.loc[daughter_tmp] = [
-                            tp,  # timepoint
-                            daughter_tmp,  # mask number
-                            my_array1[daughter_tmp - 1][0],  # = cx
-                            my_array1[daughter_tmp - 1][1],  # = cy
-                            mother_tmp,  # mother mask
-                            np.amax(matching_pctgs),  # pctg matching
-                            my_array0[mother_tmp - 1][0],  # cx mother
-                            my_array0[mother_tmp - 1][1],  # cy mother
-                            dist_mat[tmp_match[0][0], tmp_match[1][0]],
-                        ]  # distance btw mother and daughter cell
-                        # remove daughter cell from matching_pctgs and dist_mat tables
-                        matching_pctgs = np.delete(matching_pctgs, tmp_match[1][0], 1)
-                        dist_mat = np.delete(dist_mat, tmp_match[1][0], 1)
-                        # also remove daughter cell from daughters_still_in_table array
-                        daughters_still_in_table = np.delete(
-                            daughters_still_in_table, tmp_match[1][0]
-                        )
-                        # remove mother cell from matching_pctgs and dist_mat tables
-                        matching_pctgs = np.delete(matching_pctgs, tmp_match[0][0], 0)
-                        dist_mat = np.delete(dist_mat, tmp_match[0][0], 0)
-                        # also remove mother cell from mothers_still_in_table array
-                        mothers_still_in_table = np.delete(
-                            mothers_still_in_table, tmp_match[0][0]
-                        )
-                    else:
-                        # if angle between mother cell and its 2 possible daughter cells is too large,
-                        # remove the tmp_match from the dist_mat and pctgs_matching tables because
-                        # this mother-daughter link cannot exist
-                        # print("Angle is too large, removing this mother-daughter combination from the tables")
-                        # print(" matching_pctgs is ", matching_pctgs)
-                        # print("tmp mother is ", tmp_match[0][0], " and tmp daughter is ", tmp_match[1][0])
-                        matching_pctgs[tmp_match[0][0], tmp_match[1][0]] = 0
-
-                # else, if the mother cell already has more than one daughter cell (should never happen)
-                else:
-                    logger.info(
-                        "Rows haven't been deleted properly and one mother cell has been assigned more than 2 daughter cells"
-                    )
-            # else if there are no more overlapping cells, look at distances
-            else:
-                # if all matching_pctgs == 0
-                # print("No more overlapping cells, look at distances to match remaining cells, or assign new tracks to them")
-                # find best match: the minimum distance in the dist matrix
-                tmp_match = np.where(dist_mat == np.amin(dist_mat))
-                # print("tmp match [0][0] is ", tmp_match[0][0], " and tmp match [1][0] is ", tmp_match[1][0])
-                # print(" dist_mat is ", np.amin(dist_mat))
-
-                mother_tmp = mothers_still_in_table[tmp_match[0][0]]
-                # print("mother tmp is ", mother_tmp)
-                daughter_tmp = daughters_still_in_table[tmp_match[1][0]]
-                # print("daughter tmp is ", daughter_tmp)
-
-                # If the distance between mother and daughter is small enough
-                if dist_mat[tmp_match[0][0], tmp_match[1][0]] < int(max_dist):
-                    # If the mother cell does not have daughters yet
-                    if mother_tmp not in complete_table["Mother_mask"].values:
-                        # create link
-                        complete_table.loc[daughter_tmp] = [
-                            tp,  # timepoint
-                            daughter_tmp,  # mask number
-                            my_array1[daughter_tmp - 1][0],  # = cx
-                            my_array1[daughter_tmp - 1][1],  # = cy
-                            mother_tmp,  # mother mask
-                            0,  # pctg matching
-                            my_array0[mother_tmp - 1][0],  # cx mother
-                            my_array0[mother_tmp - 1][1],  # cy mother
-                            dist_mat[tmp_match[0][0], tmp_match[1][0]],
-                        ]  # distance btw mother and daughter cell
-                        # remove daughter cell from matching_pctgs and dist_mat tables
-                        matching_pctgs = np.delete(matching_pctgs, tmp_match[1][0], 1)
-                        dist_mat = np.delete(dist_mat, tmp_match[1][0], 1)
-                        # also remove daughter cell from daughters_still_in_table array
-                        daughters_still_in_table = np.delete(
-                            daughters_still_in_table, tmp_match[1][0]
-                        )
-
-                    # else, if the mother cell already has one daughter cell
-                    elif (
-                        np.count_nonzero(
-                            complete_table["Mother_mask"].values == mother_tmp
-                        )
-                        == 1
-                    ):
-                        # recover info on the cell that has already been asigned to the same mother
-                        other_daughter_line = complete_table.loc[
-                            complete_table["Mother_mask"] == mother_tmp
-                        ]
-                        # compute angle between current cell's centroid and its hypothetic sister's centroid
-                        cell1_centroid = (
-                            other_daughter_line["Centroid_x"],
-                            other_daughter_line["Centroid_y"],
-                        )
-                        cell2_centroid = (
-                            my_array1[daughter_tmp - 1][0],
-                            my_array1[daughter_tmp - 1][1],
-                        )
-                        # Difference in x coordinates
-                        dx = cell2_centroid[0] - cell1_centroid[0]
-                        # print(" cell1 centroids are ", cell1_centroid)
-                        # print(" cell2 centroids are ", cell2_centroid)
-                        # Difference in y coordinates
-                        dy = cell2_centroid[1] - cell1_centroid[1]
-                        # Angle between cell1 and cell2 in radians
-                        theta = math.atan2(dy, dx)
-                        orientation_daughters = math.degrees(theta)
-                        orientation_mother = orientations[mother_tmp - 1]
-                        # print("Orientation of mother is ", orientation_mother, " and its sign is ", np.sign(orientation_mother))
-                        # print("Orientation of division is ", orientation_daughters, " and its sign is ", np.sign(orientation_daughters))
-
-                        # Re-scale daughters orientation so that it matches the scale of the mother orientation,
-                        # which allows to make the angles comparable
-                        if (orientation_daughters >= -180) and (
-                            orientation_daughters <= -90
-                        ):
-                            orientation_daughters = -orientation_daughters - 90
-                        elif (orientation_daughters >= 0) and (
-                            orientation_daughters <= 90
-                        ):
-                            orientation_daughters = 90 - orientation_daughters
-                        elif (orientation_daughters > -90) and (
-                            orientation_daughters < 0
-                        ):
-                            orientation_daughters = -90 - orientation_daughters
-                        elif (orientation_daughters > 90) and (
-                            orientation_daughters <= 180
-                        ):
-                            orientation_daughters = -orientation_daughters + 90
-
-                        # print("Orientation of division AFTER RESCALING is ", orientation_daughters, " and its sign is ", np.sign(orientation_daughters))
-
-                        # Compute difference between 2 angles:
-                        # If they have the same sign, simply substact them
-                        if np.sign(orientation_mother) == np.sign(
-                            orientation_daughters
-                        ):
-                            diff_btw_angles = abs(
-                                orientation_mother - (orientation_daughters)
-                            )
-                        # If they have opposite signs, sum up their absolute values
-                        else:
-                            diff_btw_angles = abs(orientation_mother) + abs(
-                                (orientation_daughters)
-                            )
-
-                        # If angle between mother cell orientation and division into 2 daughters is small enough, add daughter cell link
-                        # print("difference between angles is ", diff_btw_angles)
-                        if diff_btw_angles < int(max_angle):
-                            # print("Angle is small enough, daughter cell will be added")
-                            complete_table.loc[daughter_tmp] = [
-                                tp,  # timepoint
-                                daughter_tmp,  # mask number
-                                my_array1[daughter_tmp - 1][0],  # = cx
-                                my_array1[daughter_tmp - 1][1],  # = cy
-                                mother_tmp,  # mother mask
-                                np.amax(matching_pctgs),  # pctg matching = 0
-                                my_array0[mother_tmp - 1][0],  # cx mother
-                                my_array0[mother_tmp - 1][1],  # cy mother
-                                dist_mat[tmp_match[0][0], tmp_match[1][0]],
-                            ]  # distance btw mother and daughter cell
-                            # remove daughter cell from matching_pctgs and dist_mat tables
-                            matching_pctgs = np.delete(
-                                matching_pctgs, tmp_match[1][0], 1
-                            )
-                            dist_mat = np.delete(dist_mat, tmp_match[1][0], 1)
-                            # also remove daughter cell from daughters_still_in_table array
-                            daughters_still_in_table = np.delete(
-                                daughters_still_in_table, tmp_match[1][0]
-                            )
-                            # remove mother cell from matching_pctgs and dist_mat tables
-                            matching_pctgs = np.delete(
-                                matching_pctgs, tmp_match[0][0], 0
-                            )
-                            dist_mat = np.delete(dist_mat, tmp_match[0][0], 0)
-                            # also remove mother cell from mothers_still_in_table array
-                            mothers_still_in_table = np.delete(
-                                mothers_still_in_table, tmp_match[0][0]
-                            )
-                        else:
-                            # if angle between mother cell and its 2 possible daughter cells is too large,
-                            # remove the tmp_match from the dist_mat and pctgs_matching tables because
-                            # this mother-daughter link cannot exist
-                            # print("Angle is too large, removing this mother-daughter combination from the tables")
-                            # print(" matching_pctgs is ", matching_pctgs)
-                            # print("tmp mother is ", tmp_match[0][0], " and tmp daughter is ", tmp_match[1][0])
-                            dist_mat[
-                                tmp_match[0][0], tmp_match[1][0]
-                            ] = 1000  # set distance to an extremely high value so it never gets picked again
-
-                # if distance between mother and daughter cell is too large, create a new track
-                else:
-                    complete_table.loc[daughter_tmp] = [
-                        tp,  # timepoint
-                        daughter_tmp,  # mask number
-                        my_array1[daughter_tmp - 1][0],  # = cx
-                        my_array1[daughter_tmp - 1][1],  # = cy
-                        0,  # mother mask
-                        np.amax(matching_pctgs),  # pctg matching = 0
-                        my_array1[daughter_tmp - 1][0],  # cx mother = cx
-                        my_array1[daughter_tmp - 1][1],  # cy mother = cy
-                        dist_mat[tmp_match[0][0], tmp_match[1][0]],
-                    ]  # distance btw mother and daughter cell
-                    # remove daughter cell from matching_pctgs and dist_mat tables
-                    matching_pctgs = np.delete(matching_pctgs, tmp_match[1][0], 1)
-                    dist_mat = np.delete(dist_mat, tmp_match[1][0], 1)
-                    # also remove daughter cell from daughters_still_in_table array
-                    daughters_still_in_table = np.delete(
-                        daughters_still_in_table, tmp_match[1][0]
-                    )
-
-        ##########################################################################
-        # Export tracking info and matching cells info for the current timepoint #
-        ##########################################################################
-        complete_table.to_csv(output_dir.joinpath(f"tracking_table_time{tp}.csv"))
-
-        ################################################################
-        # Export corresponding image with tracking info plotted on top #
-        ################################################################
-        plt.figure(figsize=(10, 10))
-        ax = plt.gca()
-        im = ax.imshow(img1)
-        nb_cells = complete_table.shape[0]
-        if nb_cells != 1:
-            complete_table.index = list(range(1, nb_cells + 1))
-        for row_idx in range(1, nb_cells + 1):
-            # draw vertical line from (70,100) to (70, 250)
-            plt.plot(
-                [
-                    complete_table.loc[row_idx]["Centroid_x_mother"],
-                    complete_table.loc[row_idx]["Centroid_x"],
-                ],
-                [
-                    complete_table.loc[row_idx]["Centroid_y_mother"],
-                    complete_table.loc[row_idx]["Centroid_y"],
-                ],
-                "r-",
-                lw=2,
-            )
-        # plt.show()
-        plt.savefig(output_dir.joinpath(f"tracking_figure_time{tp}.png"))
+    return links
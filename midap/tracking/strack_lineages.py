@@ -2,15 +2,15 @@ import os
 from collections import defaultdict
 from pathlib import Path
 from shutil import rmtree
-from typing import Optional, Union
+from typing import List, Optional, Union
 
 import h5py
 import numpy as np
 import pandas as pd
-import tqdm
 from skimage import io
 
-from .bayesian_tracking import label_transform
+from .base_lineages import Lineages, label_transform
+from .tracking_data import IMAGE_DTYPE, LABEL_DTYPE, create_frame_dataset
 from ..utils import get_logger
 
 # get the logger we readout the variable or set it to max output
@@ -21,7 +21,7 @@ else:
 logger = get_logger(__file__, loglevel)
 
 
-class STrackLineage(object):
+class STrackLineage(Lineages):
     """
     This class transforms the strack output into the midap lineage format
     """
@@ -34,6 +34,7 @@ class STrackLineage(object):
         base_dir: Union[str, bytes, os.PathLike],
         imgs: np.ndarray,
         segs: np.ndarray,
+        links: Optional[List[np.ndarray]] = None,
         remove_strack_output=True,
     ):
         """
@@ -41,6 +42,8 @@ class STrackLineage(object):
         :param base_dir: Path to the base directory of the channel
         :param imgs: Array of the original images, sorted
         :param segs: Array of the segmentations, sorted
+        :param links: The links of every frame except the first returned by run_strack, if None the links are read
+                      from the tracking tables in the STrack directory of the base directory
         :param remove_strack_output: If True, the strack output will be removed
         """
 
@@ -49,26 +52,19 @@ class STrackLineage(object):
         self.remove_strack_output = remove_strack_output
         self.original_images = imgs
         self.segmented_images = segs
+        self.links = links
 
         # get some basic info
-        self.n_frames = (
-            len(list(self.base_dir.joinpath("STrack").glob("tracking_table_*.csv"))) + 1
-        )
+        if self.links is None:
+            self.n_frames = (
+                len(list(self.base_dir.joinpath("STrack").glob("tracking_table_*.csv")))
+                + 1
+            )
+        else:
+            self.n_frames = len(self.links) + 1
 
         # init the dataframe
-        columns = [
-            "frame",
-            "labelID",
-            "trackID",
-            "lineageID",
-            "trackID_d1",
-            "trackID_d2",
-            "split",
-            "trackID_mother",
-            "first_frame",
-            "last_frame",
-        ]
-        self.track_df = pd.DataFrame(columns=columns)
+        self.track_df = self.init_dataframe()
 
     def get_df_at_frame(self, frame: int):
         """
@@ -96,14 +92,16 @@ class STrackLineage(object):
 
         # loop over all frames
         for frame in range(1, self.n_frames):
-            # get the dataframe
-            df = self.get_df_at_frame(frame)
+            # get the links
+            if self.links is None:
+                df = self.get_df_at_frame(frame)
+                links = df[["Mask_nb", "Mother_mask"]].to_numpy()
+            else:
+                links = self.links[frame - 1]
             lineage_dict = defaultdict(list)
 
             # loop over all cells
-            for _, row in df.iterrows():
-                mother_id = row["Mother_mask"]
-                cell_id = row["Mask_nb"]
+            for cell_id, mother_id in links.tolist():
                 lineage_dict[mother_id].append(cell_id)
 
             # add the dict to the list
@@ -111,48 +109,31 @@ class STrackLineage(object):
 
         return lineage_dicts
 
-    def generate_midap_output(self):
+    def generate_midap_output(self, compression: Optional[str] = None):
         """
         Generate label stack based on tracking output.
+        :param compression: The lossless filter of the output h5 files, either None (no compression), "gzip",
+                            "lzf" or "blosc"
         :return: The path to the generated csv and h5 file
         """
 
-        self.logger.info("Generate lineages...")
-
         # create the lineage dicts
-        lineage_dicts = self.create_lineage_dicts()
-
-        # init all the ids
-        global_id = 1
-        track_id = 1
-
-        # loop over all segmented images
-        for frame_num, seg_im in tqdm.tqdm(enumerate(self.segmented_images)):
-            current_local_ids = np.unique(seg_im)[1:]
-
-            # track all cells
-            for local_id in current_local_ids:
-                # track the cell if it's not already part of a lineage
-                if (
-                    local_id
-                    not in self.track_df.loc[
-                        self.track_df["frame"] == frame_num, "labelID"
-                    ].values
-                ):
-                    global_id, track_id = self._track_cell(
-                        frame_index=frame_num,
-                        cell_label=local_id,
-                        global_id=global_id,
-                        track_id=track_id,
-                        lineage_dicts=lineage_dicts,
-                    )
+        self.lineage_dicts = self.create_lineage_dicts()
+
+        # track all cells of all segmented images
+        local_ids = [np.unique(seg_im)[1:] for seg_im in self.segmented_images]
+        self.track_df = self.track_lineages(local_ids=local_ids)
 
         # create the label stack
-        label_stack = np.stack(self.segmented_images).astype(np.int32)
-        label_transformations = []
-        for _, row in self.track_df.iterrows():
-            label_transformations.append((row["frame"], row["labelID"], row["trackID"]))
-        label_transformations = np.array(label_transformations).astype(np.int32)
+        label_stack = np.stack(self.segmented_images).astype(LABEL_DTYPE)
+        label_transformations = np.stack(
+            [
+                self.track_df["frame"].values,
+                self.track_df["labelID"].values,
+                self.track_df["trackID"].values,
+            ],
+            axis=1,
+        ).astype(np.int32)
         if label_transformations.size > 0:
             label_transform(label_stack, label_transformations)
 
@@ -163,6 +144,7 @@ class STrackLineage(object):
             label_stack=label_stack,
             raw_imgs=self.original_images,
             segmentations=self.segmented_images,
+            compression=compression,
         )
 
         # remove the strack output if necessary
@@ -171,130 +153,15 @@ class STrackLineage(object):
 
         return data_file, csv_file
 
-    def _track_cell(
-        self,
-        frame_index: int,
-        cell_label: int,
-        global_id: int,
-        track_id: int,
-        lineage_dicts: list,
-        first_frame: Optional[int] = None,
-        lineage_id: Optional[int] = None,
-        mother_id: Optional[int] = None,
-    ):
+    def get_daughters(self, frame_index: int, cell_label: int):
         """
-        Tracks a cell through the results recursively
+        Returns the labels of the cell in the next frame given by the STrack output
         :param frame_index: The index of the frame where the cell is located
         :param cell_label: The label of the cell in the frame given by frame_index
-        :param global_id: The global ID for this cell
-        :param track_id: The tracking ID for this cell
-        :param lineage_dicts: A list of dicts that map the old label id to the new label id
-        :param first_frame: The frame index of the first frame the cell appeared, defaults to frame_index
-        :param lineage_id: The lineage ID of the current lineage
-        :param mother_id: The optional tracking ID of the mother cell if the cell resulted from a split
-        :return: The next unique global and tracking id
+        :return: A list of labels in the next frame, empty if the cell disappears and two labels if the cell splits
         """
 
-        # set the lineage ID if necessary
-        if lineage_id is None:
-            lineage_id = track_id
-        # get the frist frame if necessary
-        if first_frame is None:
-            first_frame = frame_index
-
-        # add cell to output
-        self.track_df.loc[global_id, "frame"] = frame_index
-        self.track_df.loc[global_id, "labelID"] = cell_label
-        self.track_df.loc[global_id, "trackID"] = track_id
-        self.track_df.loc[global_id, "lineageID"] = lineage_id
-        self.track_df.loc[global_id, "first_frame"] = first_frame
-        if mother_id is not None:
-            self.track_df.loc[global_id, "trackID_mother"] = mother_id
-
-        # last frame
-        if frame_index == self.n_frames - 1:
-            # no split
-            self.track_df.loc[global_id, "split"] = 0
-            # update the last frame for all previous cells
-            self.track_df.loc[
-                self.track_df["trackID"] == track_id, "last_frame"
-            ] = frame_index
-
-            # return new global id and track id
-            return global_id + 1, track_id + 1
-
-        # Case 1: only daughter 1 is present
-        if len(lineage_dicts[frame_index][cell_label]) == 1:
-            # no split occured
-            self.track_df.loc[global_id, "split"] = 0
-            # get the local ID in the next frame
-            new_local_id = lineage_dicts[frame_index][cell_label][0]
-            global_id, track_id = self._track_cell(
-                frame_index=frame_index + 1,
-                cell_label=new_local_id,
-                global_id=global_id + 1,
-                first_frame=first_frame,
-                track_id=track_id,
-                lineage_id=lineage_id,
-                lineage_dicts=lineage_dicts,
-            )
-
-        # Case 2: cell split: both daughters are present
-        elif len(lineage_dicts[frame_index][cell_label]) == 2:
-            # split occured
-            self.track_df.loc[global_id, "split"] = 1
-            # update the last frame for all previous cells
-            self.track_df.loc[
-                self.track_df["trackID"] == track_id, "last_frame"
-            ] = frame_index
-
-            # mother id for both cells
-            mother_id = track_id
-
-            # deal with daughter 1, get new local ID, set trackID of daughter for previous cells, tracl
-            new_local_id = lineage_dicts[frame_index][cell_label][0]
-            self.track_df.loc[self.track_df["trackID"] == mother_id, "trackID_d1"] = (
-                track_id + 1
-            )
-            global_id, track_id = self._track_cell(
-                frame_index=frame_index + 1,
-                cell_label=new_local_id,
-                global_id=global_id + 1,
-                track_id=track_id + 1,
-                lineage_id=lineage_id,
-                mother_id=mother_id,
-                lineage_dicts=lineage_dicts,
-            )
-
-            # deal with daughter 2, get new local ID, set trackID of daughter for previous cells, track
-            new_local_id = lineage_dicts[frame_index][cell_label][1]
-            # we do not need to increment track and global id here, since the previous call did that
-            self.track_df.loc[
-                self.track_df["trackID"] == mother_id, "trackID_d2"
-            ] = track_id
-            global_id, track_id = self._track_cell(
-                frame_index=frame_index + 1,
-                cell_label=new_local_id,
-                global_id=global_id,
-                track_id=track_id,
-                lineage_id=lineage_id,
-                mother_id=mother_id,
-                lineage_dicts=lineage_dicts,
-            )
-
-        # case 3: cell disappears
-        elif len(lineage_dicts[frame_index][cell_label]) == 0:
-            # no split occured
-            self.track_df.loc[global_id, "split"] = 0
-            # update the last frame for all previous cells
-            self.track_df.loc[
-                self.track_df["trackID"] == track_id, "last_frame"
-            ] = frame_index
-            # update global and track id
-            global_id += 1
-            track_id += 1
-
-        return global_id, track_id
+        return self.lineage_dicts[frame_index][cell_label]
 
     def store_lineages(
         self,
@@ -303,6 +170,7 @@ class STrackLineage(object):
         label_stack: np.ndarray,
         segmentations: np.ndarray,
         raw_imgs: np.ndarray,
+        compression: Optional[str] = None,
     ):
         """
         Store tracking output files: labeled stack, tracking output, input files.
@@ -311,6 +179,8 @@ class STrackLineage(object):
         :param label_stack: The labelstack array to store
         :param segmentations: The segmentation array to store
         :param raw_imgs: The raw image array to store
+        :param compression: The lossless filter of the h5 files, either None (no compression), "gzip", "lzf" or
+                            "blosc", compressed datasets are chunked frame by frame
         :return: The data file name and csv file name
         """
 
@@ -323,16 +193,31 @@ class STrackLineage(object):
 
         data_file = output_folder.joinpath("tracking_strack.h5")
         with h5py.File(data_file, "w") as hf:
-            hf.create_dataset(
-                "images", data=raw_imgs.astype(np.float32), dtype=np.float32
+            create_frame_dataset(
+                hf,
+                "images",
+                shape=raw_imgs.shape,
+                dtype=IMAGE_DTYPE,
+                data=raw_imgs.astype(IMAGE_DTYPE),
+                compression=compression,
             )
-            hf.create_dataset(
-                "labels", data=label_stack.astype(np.int32), dtype=np.int32
+            create_frame_dataset(
+                hf,
+                "labels",
+                shape=label_stack.shape,
+                dtype=LABEL_DTYPE,
+                data=label_stack.astype(LABEL_DTYPE),
+                compression=compression,
             )
 
         with h5py.File(output_folder.joinpath("segmentations_strack.h5"), "w") as hf:
-            hf.create_dataset(
-                "segmentations", data=segmentations.astype(np.int32), dtype=np.int32
+            create_frame_dataset(
+                hf,
+                "segmentations",
+                shape=segmentations.shape,
+                dtype=LABEL_DTYPE,
+                data=segmentations.astype(LABEL_DTYPE),
+                compression=compression,
             )
 
         return data_file, csv_file
@@ -1,6 +1,6 @@
 import os
 from pathlib import Path
-from typing import Union
+from typing import Optional, Union
 
 import numpy as np
 
@@ -28,38 +28,61 @@ class STrack(Tracking):
         raws = []
         segs = []
         for i in range(self.num_time_steps):
-            r, _, s, _ = self.load_data(i, label=True)
+            r, s = self.load_frame(i, label=True)
             raws.append(r)
             segs.append(s)
         self.seg_imgs = np.array(segs)
         self.raw_imgs = np.array(raws)
 
+        # the frames are loaded
+        self.frame_cache.close()
+
     def track_all_frames(
         self,
         output_folder: Union[str, bytes, os.PathLike],
         max_dist=50.0,
         max_angle=30.0,
+        compression: Optional[str] = None,
+        save_tables=False,
+        save_figures=False,
+        num_workers=1,
     ):  # 40
         """
         Tracks all frames and converts output to standard format.
         :param output_folder: Folder for the output
         :param max_dist: Maximum distance for linking (defaults to STrack default 50.0)
         :param max_angle: Maximum angle for linking (defaults to STrack default 30.0)
+        :param compression: The lossless filter of the output h5 files, either None (no compression), "gzip",
+                            "lzf" or "blosc"
+        :param save_tables: If True, the STrack tracking tables of all frames are kept in the STrack directory
+        :param save_figures: If True, the links of all frames are plotted into the STrack directory
+        :param num_workers: The number of processes that compute the links of the frame pairs
         """
 
-        # create the strack directory
+        # the links are kept in memory, the strack directory is only created for the tables and figures
         output_folder = Path(output_folder)
         strack_dir = output_folder.joinpath("STrack")
-        os.makedirs(strack_dir, exist_ok=True)
-        run_strack(
+        keep_output = save_tables or save_figures
+        if keep_output:
+            os.makedirs(strack_dir, exist_ok=True)
+        links = run_strack(
             files_list=self.segs,
             output_dir=strack_dir,
             max_dist=max_dist,
             max_angle=max_angle,
+            save_tables=save_tables,
+            save_figures=save_figures,
+            num_workers=num_workers,
         )
         strack_lineages = STrackLineage(
-            output_folder, imgs=self.raw_imgs, segs=self.seg_imgs
+            output_folder,
+            imgs=self.raw_imgs,
+            segs=self.seg_imgs,
+            links=links,
+            remove_strack_output=not keep_output,
+        )
+        data_file, csv_file = strack_lineages.generate_midap_output(
+            compression=compression
         )
-        data_file, csv_file = strack_lineages.generate_midap_output()
 
         return data_file, csv_file
@@ -3,11 +3,13 @@ import h5py
 import numpy as np
 import os
 import pandas as pd
+from contextlib import ExitStack
 from pathlib import Path
-from typing import Tuple, Union, List
-from skimage.measure import regionprops_table
+from typing import Iterable, Iterator, Optional, Tuple, Union, List
 from skimage import io
 
+from .tracking_data import IMAGE_DTYPE, LABEL_DTYPE, load_tracking_data
+
 
 class FluoChangeAnalysis:
     def __init__(self, path, channels, tracking_class) -> None:
@@ -54,16 +56,39 @@ class FluoChangeAnalysis:
             [self.open_img_folder(pf, "tif") for pf in self.path_fluo_png]
         )
 
+    def iter_frames(self) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Reads the reference labels and the images of all fluorescence channels frame by frame, only the current frame
+        is kept in memory and all h5 files are closed when the iteration ends.
+        :return: An iterator over the label image, the images (CWH) and the raw count images (CWH) of every frame.
+        """
+        file_names_raw = [
+            np.sort(glob.glob(str(pf) + "/*.tif")) for pf in self.path_fluo_png
+        ]
+        with ExitStack() as stack:
+            labels_ref = stack.enter_context(h5py.File(self.path_ref_h5, "r"))["labels"]
+            images_fluo = [
+                stack.enter_context(h5py.File(pf, "r"))["images"]
+                for pf in self.paths_fluo_h5
+            ]
+
+            for t in range(len(labels_ref)):
+                yield (
+                    labels_ref[t].astype(LABEL_DTYPE, copy=False),
+                    np.array(
+                        [img[t].astype(IMAGE_DTYPE, copy=False) for img in images_fluo]
+                    ),
+                    np.array([io.imread(fn[t]) for fn in file_names_raw]),
+                )
+
     def open_h5(
         self, h5_file: Union[str, os.PathLike]
     ) -> Tuple[np.ndarray, np.ndarray]:
         """
-        Opens h5 file
+        Opens h5 file, files of older versions with float64 images and int64 labels are supported.
         :param h5_file: Path to h5-file.
         """
-        f = h5py.File(h5_file, "r")
-        images = np.array(f["images"])
-        labels = np.array(f["labels"])
+        images, labels = load_tracking_data(h5_file)
         return images, labels
 
     def open_img_folder(self, path: Union[str, os.PathLike], ext: str) -> np.ndarray:
@@ -99,38 +124,78 @@ class FluoChangeAnalysis:
 
         return df_fluo_change
 
-    def add_fluo_intensity(self, df_fluo_change: pd.DataFrame) -> pd.DataFrame:
+    @staticmethod
+    def get_mean_intensities(
+        labels: np.ndarray, images: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
         """
-        Loops through time frames and adds mean intensities.
+        Calculates the mean intensities of all cells in all channels of a frame with labeled reductions.
+        :param labels: Label image of the frame.
+        :param images: Images of all channels of the frame (CWH).
+        :return: The labels of the cells and the mean intensities with shape (cells, channels), the intensities have
+                 the dtype np.mean would give for the images.
+        """
+        flat_labels = labels.ravel()
+        counts = np.bincount(flat_labels)
+        cells = np.flatnonzero(counts[1:]) + 1
+
+        # the sums of all labels are accumulated in float64 in a single pass per channel
+        sums = np.zeros((len(cells), len(images)))
+        for num, img in enumerate(images):
+            sums[:, num] = np.bincount(
+                flat_labels, weights=img.ravel(), minlength=len(counts)
+            )[cells]
+
+        dtype = images.dtype if np.issubdtype(images.dtype, np.floating) else float
+        return cells, (sums / counts[cells, None]).astype(dtype)
+
+    def add_fluo_intensity(
+        self,
+        df_fluo_change: pd.DataFrame,
+        frames: Optional[Iterable[Tuple[np.ndarray, np.ndarray, np.ndarray]]] = None,
+    ) -> pd.DataFrame:
+        """
+        Calculates the mean intensities of all cells per frame and adds them with a single merge on frame and trackID.
         :param df_fluo_change: Tracking output with additional columns for fluo intensity.
+        :param frames: The label image, the images (CWH) and the raw count images (CWH) of every frame, e.g. from
+                       iter_frames to stream the frames from the files, defaults to the images of load_images.
         """
-        time_frames = len(self.labels_ref)
-        for t in range(time_frames):
-            props_ref = regionprops_table(
-                self.labels_ref[t], properties=["label", "coords"]
+        if frames is None:
+            frames = (
+                (self.labels_ref[t], self.images_fluo[:, t], self.images_fluo_raw[:, t])
+                for t in range(len(self.labels_ref))
             )
 
-            df_ref = pd.DataFrame(props_ref, index=props_ref["label"])
-
-            # loop through cells
-            for l in df_ref.label:
-                coords = df_ref.loc[l].coords
-                mean_intensities = np.mean(
-                    self.images_fluo[:, t, coords[:, 0], coords[:, 1]], axis=1
-                )
-                mean_intensities_raw = np.mean(
-                    self.images_fluo_raw[:, t, coords[:, 0], coords[:, 1]], axis=1
+        df_frames = []
+        for t, (labels, images, images_raw) in enumerate(frames):
+            cells, mean_intensities = self.get_mean_intensities(labels, images)
+            _, mean_intensities_raw = self.get_mean_intensities(labels, images_raw)
+
+            df_frames.append(
+                pd.DataFrame(
+                    {
+                        "frame": t,
+                        "trackID": cells,
+                        **dict(zip(self.new_columns, mean_intensities.T)),
+                        **dict(zip(self.new_columns_raw, mean_intensities_raw.T)),
+                    }
                 )
+            )
+
+        # without frames there are no cells
+        if len(df_frames) == 0:
+            for nc in self.new_columns + self.new_columns_raw:
+                df_fluo_change[nc] = np.nan
+            return df_fluo_change
 
-                for nc, mi in zip(self.new_columns, mean_intensities):
-                    df_fluo_change.loc[
-                        (df_fluo_change.trackID == l) & (df_fluo_change.frame == t), nc
-                    ] = mi
+        df_intensities = pd.concat(df_frames, ignore_index=True)
 
-                for nc, mi in zip(self.new_columns_raw, mean_intensities_raw):
-                    df_fluo_change.loc[
-                        (df_fluo_change.trackID == l) & (df_fluo_change.frame == t), nc
-                    ] = mi
+        # cells without rows are dropped, rows without cells keep NaN
+        df_intensities = df_fluo_change[["frame", "trackID"]].merge(
+            df_intensities, on=["frame", "trackID"], how="left"
+        )
+        for nc in df_intensities.columns[2:]:
+            df_fluo_change[nc] = df_intensities[nc].to_numpy(dtype=float)
 
         return df_fluo_change
 
@@ -0,0 +1,108 @@
+import os
+from typing import Optional, Tuple, Union
+
+import h5py
+import numpy as np
+
+# blosc is only available if the optional hdf5plugin package is installed
+try:
+    import hdf5plugin
+except ImportError:
+    hdf5plugin = None
+
+# The dtypes used for the intermediate arrays and the h5 outputs of the tracking
+################################################################################
+
+# images, e.g. the raw images and the inputs of the tracking networks
+IMAGE_DTYPE = np.float32
+# labels that are unique over all frames, e.g. the track IDs of the label stacks
+LABEL_DTYPE = np.int32
+# labels that are only unique within a single frame, e.g. the cell IDs of the tracking results
+FRAME_LABEL_DTYPE = np.uint16
+# binary masks, e.g. the seeds and the segmentations of the network inputs
+MASK_DTYPE = bool
+
+
+def get_frame_label_dtype(max_label: int):
+    """
+    Returns the dtype for labels that are only unique within a frame, the frame label dtype is used if possible
+    :param max_label: The maximum label of the frame
+    :return: The smallest dtype of the policy that can hold the label
+    """
+
+    if max_label <= np.iinfo(FRAME_LABEL_DTYPE).max:
+        return FRAME_LABEL_DTYPE
+    return LABEL_DTYPE
+
+
+def get_compression_options(compression: Optional[str]) -> dict:
+    """
+    Returns the keyword arguments for h5py.File.create_dataset to use a lossless filter
+    :param compression: The filter, either None (no compression), "gzip", "lzf" or "blosc"
+    :return: A dict with the keyword arguments
+    """
+
+    if compression is None:
+        return {}
+    if compression == "gzip":
+        return {"compression": "gzip", "compression_opts": 4, "shuffle": True}
+    if compression == "lzf":
+        return {"compression": "lzf", "shuffle": True}
+    if compression == "blosc":
+        if hdf5plugin is None:
+            raise ImportError(
+                "The blosc compression requires the hdf5plugin package, install it or use gzip or lzf!"
+            )
+        return dict(
+            hdf5plugin.Blosc(cname="zstd", clevel=5, shuffle=hdf5plugin.Blosc.SHUFFLE)
+        )
+    raise ValueError(f"Unknown compression: {compression}")
+
+
+def create_frame_dataset(
+    hf: h5py.File,
+    name: str,
+    shape: Tuple[int, ...],
+    dtype: type,
+    data: Optional[np.ndarray] = None,
+    compression: Optional[str] = None,
+) -> h5py.Dataset:
+    """
+    Creates a dataset of a tracking output file whose first dimension are the frames. Without compression the dataset
+    is stored contiguously, otherwise every frame is stored in its own chunk such that a single frame can be read
+    with a single chunk read.
+    :param hf: The h5 file to create the dataset in
+    :param name: The name of the dataset
+    :param shape: The shape of the dataset (TWH)
+    :param dtype: The dtype of the dataset
+    :param data: Optional data to write into the dataset
+    :param compression: The lossless filter, either None (no compression), "gzip", "lzf" or "blosc"
+    :return: The created dataset
+    """
+
+    options = get_compression_options(compression)
+    if compression is not None:
+        options["chunks"] = (1,) + tuple(shape[1:])
+
+    return hf.create_dataset(name, shape=shape, dtype=dtype, data=data, **options)
+
+
+def load_tracking_data(
+    h5_file: Union[str, bytes, os.PathLike], frames: Optional[slice] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Loads the images and the label stack of a tracking output file (e.g. tracking_delta.h5). Files written with older
+    versions stored the images as float64 and the labels as int64, they are converted to the current dtypes.
+    :param h5_file: Path to the h5 file
+    :param frames: A slice selecting the frames to load, defaults to all frames
+    :return: The images and labels as arrays of shape TWH
+    """
+
+    if frames is None:
+        frames = slice(None)
+
+    with h5py.File(h5_file, "r") as f:
+        images = f["images"][frames].astype(IMAGE_DTYPE, copy=False)
+        labels = f["labels"][frames].astype(LABEL_DTYPE, copy=False)
+
+    return images, labels
@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+import pytest
+import skimage.io as io
+from skimage.measure import regionprops
+
+from midap.apps.seg_fluo_change_analysis import fluo_analysis_per_channel, main
+
+# Fixtures
+##########
+
+
+@pytest.fixture()
+def fluo_dirs(tmp_path):
+    """
+    A fixture that writes the segmentations of a reference channel and the images of two additional channels
+    :param tmp_path: The pytest tmp_path fixture
+    :return: The path, the channels, the segmentations and the images and raw counts of the additional channels
+    """
+
+    rng = np.random.default_rng(42)
+    channels = ["PH", "GFP", "mCherry"]
+    segs = rng.integers(0, 5, size=(3, 16, 16)).astype(np.uint16)
+    segs[1][segs[1] == 2] = 0
+    images = rng.random((2,) + segs.shape).astype(np.float32)
+    images_raw = rng.integers(0, 2**16, size=(2,) + segs.shape).astype(np.uint16)
+
+    for d in ["seg_im", "cut_im", "cut_im_rawcounts"]:
+        for channel in channels:
+            tmp_path.joinpath(channel, d).mkdir(parents=True)
+    for frame, seg in enumerate(segs):
+        io.imsave(
+            tmp_path.joinpath(channels[0], "seg_im", f"pos_{frame:03d}_seg.tif"),
+            seg,
+            check_contrast=False,
+        )
+        for num, channel in enumerate(channels[1:]):
+            io.imsave(
+                tmp_path.joinpath(channel, "cut_im", f"pos_{frame:03d}_cut.tif"),
+                images[num, frame],
+                check_contrast=False,
+            )
+            io.imsave(
+                tmp_path.joinpath(channel, "cut_im_rawcounts", f"pos_{frame:03d}.tif"),
+                images_raw[num, frame],
+                check_contrast=False,
+            )
+
+    return tmp_path, channels, segs, images, images_raw
+
+
+# Tests
+#######
+
+
+def test_main(fluo_dirs):
+    """
+    Tests the morphology and the intensities of all channels against regionprops and the masks of the cells
+    :param fluo_dirs: The fluo_dirs fixture
+    """
+
+    # unpack
+    path, channels, segs, images, images_raw = fluo_dirs
+
+    # run the main
+    main(path=path, channels=channels)
+    df = pd.read_csv(path.joinpath(channels[0], "fluo_intensities.csv"))
+
+    # the columns of the first channel are followed by the frame number
+    assert df.columns.tolist() == [
+        "label",
+        "area",
+        "min_row",
+        "min_col",
+        "max_row",
+        "max_col",
+        "intensity_max",
+        "intensity_mean",
+        "intensity_min",
+        "minor_axis_length",
+        "major_axis_length",
+        "y",
+        "x",
+        "intensity_GFP",
+        "intensity_raw_GFP",
+        "frame_number",
+        "intensity_mCherry",
+        "intensity_raw_mCherry",
+    ]
+
+    props = [
+        (frame, p)
+        for frame, seg in enumerate(segs)
+        for p in regionprops(seg, intensity_image=images_raw[0, frame])
+    ]
+    assert len(df) == len(props)
+    for (_, row), (frame, p) in zip(df.iterrows(), props):
+        assert row["frame_number"] == frame and row["label"] == p.label
+        assert row["area"] == p.area
+        assert np.allclose(row[["min_row", "min_col", "max_row", "max_col"]], p.bbox)
+        assert np.allclose(row[["y", "x"]], p.centroid)
+        assert np.isclose(row["intensity_mean"], p.intensity_mean)
+        mask = segs[frame] == p.label
+        for num, channel in enumerate(channels[1:]):
+            assert np.isclose(
+                row[f"intensity_{channel}"], images[num, frame][mask].mean()
+            )
+            assert np.isclose(
+                row[f"intensity_raw_{channel}"], images_raw[num, frame][mask].mean()
+            )
+
+    # a single channel gives the same values
+    df_gfp = fluo_analysis_per_channel(
+        path=path, ref_channel=channels[0], add_channel=channels[1]
+    )
+    assert np.allclose(df_gfp.reset_index(), df.iloc[:, :16])
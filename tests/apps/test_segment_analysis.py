@@ -5,9 +5,15 @@ import numpy as np
 import pandas as pd
 import pytest
 from pytest import mark
+from skimage.measure import label, regionprops
 
-from midap.apps.segment_analysis import main
-
+from midap.apps.segment_analysis import (
+    count_cells,
+    count_killed,
+    get_axis_lengths,
+    get_frame_stats,
+    main,
+)
 
 # Fixtures
 ##########
@@ -40,6 +46,37 @@ def prep_dirs(setup_dir):
 #######
 
 
+def test_get_frame_stats():
+    """
+    Tests the axis lengths and the stats of a segmentation against regionprops
+    """
+
+    # random cells with single pixels and lines, the labels are not contiguous
+    rng = np.random.default_rng(42)
+    seg = label(rng.random((64, 64)) > 0.6, connectivity=1) * 3
+    minor, major = get_axis_lengths(seg)
+
+    regions = regionprops(seg)
+    assert np.allclose(minor, [r.minor_axis_length for r in regions])
+    assert np.allclose(major, [r.major_axis_length for r in regions])
+
+    ratios = [
+        r.minor_axis_length / r.major_axis_length
+        for r in regions
+        if r.major_axis_length > 0
+    ]
+    assert get_frame_stats(seg) == (len(regions), np.sum(np.array(ratios) > 0.7))
+    assert count_cells(seg) == len(np.unique(seg)) - 1
+    assert count_killed(seg) == np.sum(np.array(ratios) > 0.7)
+
+    # a square cell is killed, a line is not
+    seg = np.zeros((16, 16), dtype=np.uint16)
+    seg[2:6, 2:6] = 70
+    seg[10, 2:12] = 2
+    assert get_frame_stats(seg) == (2, 1)
+    assert get_frame_stats(np.zeros_like(seg)) == (0, 0)
+
+
 def test_main(prep_dirs):
     """
     Tests the main routine of the segment_analysis app
@@ -55,3 +92,45 @@ def test_main(prep_dirs):
     # compare
     res_df = pd.read_csv(path_result.joinpath("cell_number.csv"))
     assert np.allclose(res_df["all cells"].values, [28, 30, 28])
+
+
+def test_num_workers(prep_dirs):
+    """
+    Tests the analysis of the frames in a process pool
+    :param prep_dirs: The prep dirs fixtures which creates everything necessary for the analyzation
+    """
+
+    # unpack args
+    path_seg, path_result = prep_dirs
+
+    # run the main serial and parallel
+    main(path_seg=path_seg, path_result=path_result)
+    serial_df = pd.read_csv(path_result.joinpath("cell_number.csv"))
+    main(path_seg=path_seg, path_result=path_result, num_workers=2)
+    res_df = pd.read_csv(path_result.joinpath("cell_number.csv"))
+
+    # compare
+    assert res_df.equals(serial_df)
+    assert np.all(
+        res_df["all cells"] == res_df["living cells"] + res_df["killed cells"]
+    )
+
+
+def test_parquet(prep_dirs):
+    """
+    Tests the additional parquet output, parquet is only available if the optional pyarrow package is installed
+    :param prep_dirs: The prep dirs fixtures which creates everything necessary for the analyzation
+    """
+
+    pytest.importorskip("pyarrow")
+
+    # unpack args
+    path_seg, path_result = prep_dirs
+
+    # run the main
+    main(path_seg=path_seg, path_result=path_result, parquet=True)
+
+    # compare
+    res_df = pd.read_csv(path_result.joinpath("cell_number.csv"), index_col=0)
+    parquet_df = pd.read_parquet(path_result.joinpath("cell_number.parquet"))
+    assert parquet_df.equals(res_df)
@@ -7,7 +7,9 @@ from pytest import mark
 from skimage import io
 
 from midap.apps.segment_cells import main
-
+from midap.segmentation.hybrid_segmentator import HybridSegmentation
+from midap.segmentation.omni_segmentator import OmniSegmentation
+from midap.segmentation.unet_segmentator import UNetSegmentation
 
 # Fixtures
 ##########
@@ -133,3 +135,45 @@ def test_main(prep_dirs):
         assert network_name_new == network_name
     except ImportError:
         pass
+
+
+def test_segmentation_engine(prep_dirs, monkeypatch):
+    """
+    Tests that the batch size and the tiles are only passed to the UNet type segmentations
+    :param prep_dirs: The prep dirs fixtures which creates everything necessary to segment the cells on test images
+    :param monkeypatch: The monkeypatch fixture from pytest to override methods
+    """
+
+    # unpack
+    path_pos, path_channel, _ = prep_dirs
+
+    # we only need the predictors
+    preds = []
+    for segmentation_class in [UNetSegmentation, HybridSegmentation, OmniSegmentation]:
+        monkeypatch.setattr(
+            segmentation_class,
+            "set_segmentation_method",
+            lambda self, path: preds.append(self),
+        )
+
+    for segmentation_class in [
+        "UNetSegmentation",
+        "HybridSegmentation",
+        "OmniSegmentation",
+    ]:
+        main(
+            path_model_weights=path_pos,
+            path_pos=path_pos,
+            path_channel=path_channel,
+            segmentation_class=segmentation_class,
+            postprocessing=False,
+            clean_border=False,
+            just_select=True,
+            batch_size=4,
+            tile_size=64,
+            tile_overlap=16,
+        )
+
+    for pred in preds[:2]:
+        assert (pred.batch_size, pred.tile_size, pred.tile_overlap) == (4, 64, 16)
+    assert not hasattr(preds[2], "batch_size")
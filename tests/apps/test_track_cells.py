@@ -7,7 +7,8 @@ import pytest
 from pytest import mark
 
 from midap.apps.track_cells import main
-
+from midap.tracking.bayesian_tracking import BayesianCellTracking
+from midap.tracking.deltav2_tracking import DeltaV2Tracking
 
 # Fixtures
 ##########
@@ -86,3 +87,27 @@ def test_main(prep_dirs):
     res_df = pd.read_csv(bayes_track_file)
     assert np.unique(res_df["frame"]).size == 2
     assert len(res_df) == 58
+
+
+def test_streaming(prep_dirs, monkeypatch):
+    """
+    Tests that the streaming is only passed to the Delta type trackings
+    :param prep_dirs: The prep dirs fixtures which creates everything necessary for the analyzation
+    :param monkeypatch: The monkeypatch fixture from pytest to override methods
+    """
+
+    calls = []
+
+    def fake_track_all_frames(self, output_folder, **kwargs):
+        calls.append((type(self).__name__, kwargs))
+        return None, None
+
+    for tracking_class in [DeltaV2Tracking, BayesianCellTracking]:
+        monkeypatch.setattr(tracking_class, "track_all_frames", fake_track_all_frames)
+
+    main(path=prep_dirs, tracking_class="DeltaV2Tracking", streaming=True)
+    main(path=prep_dirs, tracking_class="BayesianCellTracking", streaming=True)
+    assert calls == [
+        ("DeltaV2Tracking", {"compression": None, "streaming": True}),
+        ("BayesianCellTracking", {"compression": None}),
+    ]
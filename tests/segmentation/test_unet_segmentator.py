@@ -3,8 +3,10 @@ import tempfile
 import numpy as np
 import skimage.io as io
 
+from midap.segmentation import unet_segmentator
 from midap.segmentation.unet_segmentator import UNetSegmentation
 from skimage.io import imread
+import pytest
 from pytest import fixture
 from pathlib import Path
 from os import listdir
@@ -93,6 +95,58 @@ def segmentation_instance(monkeypatch, img1):
     tmpdir.cleanup()
 
 
+class FakeUNet:
+    """
+    A UNet that returns the first channel of the input and records the built models and the predicted batches
+    """
+
+    built = []
+
+    def __init__(self, input_size, inference=False):
+        """
+        Initializes the model
+        :param input_size: The input size of the model
+        :param inference: Ignored
+        """
+
+        self.input_size = input_size
+        self.batches = []
+        self.built.append(self)
+
+    def load_weights(self, weights):
+        """
+        Does not load anything
+        :param weights: Ignored
+        """
+
+        pass
+
+    def predict_on_batch(self, x):
+        """
+        Returns the first channel of the input
+        :param x: The input batch
+        :return: The first channel of the input
+        """
+
+        assert x.shape[1:] == self.input_size
+        self.batches.append(len(x))
+        return x[..., :1]
+
+
+@fixture()
+def fake_unet(monkeypatch):
+    """
+    Replaces the UNet of the segmentation by a fake model
+    :param monkeypatch: The monkypatch fixture from pytest to override methods
+    :return: The list of the built models
+    """
+
+    FakeUNet.built = []
+    monkeypatch.setattr(unet_segmentator, "UNetv1", FakeUNet)
+
+    return FakeUNet.built
+
+
 # Tests
 #######
 
@@ -141,3 +195,80 @@ def test_run_image_stack(segmentation_instance):
         img = imread(fpath)
         # same as for watershed it fails now because of border cell removal
         assert np.unique(img).size == 1
+
+
+def test_predict_batches(fake_unet):
+    """
+    Tests that the inputs are streamed in batches of the same shape and that every model is only built once
+    :param fake_unet: A pytest fixture replacing the UNet by a fake model
+    """
+
+    unet = UNetSegmentation(
+        path_model_weights=".", postprocessing=False, model_weights="fake", batch_size=2
+    )
+
+    rng = np.random.default_rng(42)
+    inputs = [rng.random((16, 32, 1)) for _ in range(3)]
+    inputs += [rng.random((32, 16, 1)) for _ in range(2)]
+    inputs += [rng.random((16, 32, 1))]
+
+    # a generator is consumed lazily
+    preds = list(unet.predict_batches(x for x in inputs))
+    assert len(preds) == len(inputs)
+    for x, y in zip(inputs, preds):
+        assert np.allclose(x[..., 0], y)
+
+    # one model per input size that is reused
+    assert [m.input_size for m in fake_unet] == [(16, 32, 1), (32, 16, 1)]
+    assert fake_unet[0].batches == [2, 1, 1]
+    assert fake_unet[1].batches == [2]
+
+
+def test_predict_tiled(fake_unet):
+    """
+    Tests that the blended tiles reproduce the untiled prediction and that all tiles use the same model
+    :param fake_unet: A pytest fixture replacing the UNet by a fake model
+    """
+
+    # the tiles have to be divisible by the divisor
+    with pytest.raises(ValueError):
+        UNetSegmentation(path_model_weights=".", postprocessing=False, tile_size=20)
+    with pytest.raises(ValueError):
+        UNetSegmentation(
+            path_model_weights=".", postprocessing=False, tile_size=32, tile_overlap=32
+        )
+
+    unet = UNetSegmentation(
+        path_model_weights=".",
+        postprocessing=False,
+        model_weights="fake",
+        batch_size=4,
+        tile_size=32,
+        tile_overlap=8,
+    )
+
+    # the tiles cover the image and end at the border
+    tiles, weights = unet.get_tiles((80, 48))
+    assert weights.shape == (32, 32) and np.all(weights > 0)
+    assert [t[0].start for t in tiles[::2]] == [0, 24, 48]
+    assert [t[1].start for t in tiles[:2]] == [0, 16]
+
+    # images smaller than the tiles are a single tile
+    tiles, weights = unet.get_tiles((16, 48))
+    assert [(t[0].stop, t[1].stop) for t in tiles] == [(16, 32), (16, 48)]
+    assert weights.shape == (16, 32)
+
+    rng = np.random.default_rng(42)
+    x = rng.random((80, 48, 2)).astype(np.float32)
+    y = unet.predict_tiled(x)
+    assert np.allclose(x[..., 0], y)
+
+    # a single model for all tiles
+    assert len(fake_unet) == 1
+    assert fake_unet[0].batches == [4, 2]
+
+    # the segmentation removes the padding
+    imgs = [rng.random((70, 40)), rng.random((33, 47))]
+    segs = unet.seg_method_unet(img for img in imgs)
+    for img, seg in zip(imgs, segs):
+        assert np.array_equal(seg, unet.scale_pixel_vals(img) > 0.5)
@@ -0,0 +1,31 @@
+import numpy as np
+
+from midap.tracking.base_lineages import label_transform
+
+# Tests
+#######
+
+
+def test_label_transform():
+    """
+    Tests the transformation of the labels of a label stack
+    """
+
+    labels = np.zeros((3, 4, 4), dtype=np.int32)
+    labels[:, :2] = 1
+    labels[:, 2:] = 2
+
+    # unsorted frames, the same label is transformed twice in the last frame
+    transformations = np.array(
+        [[2, 1, 5], [0, 1, 3], [0, 2, 4], [2, 1, 6]], dtype=np.int32
+    )
+    label_transform(labels, transformations)
+
+    assert np.all(labels[0, :2] == 3)
+    assert np.all(labels[0, 2:] == 4)
+    # no transformations for this frame
+    assert np.all(labels[1, :2] == 1)
+    assert np.all(labels[1, 2:] == 2)
+    # last transformation wins, transformations are not chained
+    assert np.all(labels[2, :2] == 6)
+    assert np.all(labels[2, 2:] == 2)
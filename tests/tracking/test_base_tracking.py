@@ -1,5 +1,10 @@
+import threading
+import time
+
+import numpy as np
 import pytest
-from midap.tracking.base_tracking import Tracking
+import skimage.io as io
+from midap.tracking.base_tracking import FrameCache, Tracking
 
 
 def test_base_cutout():
@@ -16,3 +21,101 @@ def test_base_cutout():
             target_size=None,
             connectivity=1,
         )
+
+
+def test_frame_cache():
+    """
+    Tests the LRU cache for the loaded frames
+    """
+
+    loads = []
+
+    def loader(key):
+        loads.append(key)
+        return key
+
+    cache = FrameCache(max_size=2)
+    assert cache.get(1, lambda: loader(1)) == 1
+    assert cache.get(2, lambda: loader(2)) == 2
+    assert cache.get(1, lambda: loader(1)) == 1
+    assert (cache.hits, cache.misses) == (1, 2)
+
+    # 2 is the least recently used and removed
+    assert cache.get(3, lambda: loader(3)) == 3
+    assert cache.get(1, lambda: loader(1)) == 1
+    assert cache.get(2, lambda: loader(2)) == 2
+    assert loads == [1, 2, 3, 2]
+
+    # a frame that is read ahead is a hit
+    cache.clear()
+    cache.read_ahead(4, lambda: loader(4))
+    assert cache.get(4, lambda: loader(4)) == 4
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert loads == [1, 2, 3, 2, 4]
+
+    # the background thread is shut down at the end of the context, the frames are kept
+    with cache:
+        cache.read_ahead(5, lambda: loader(5))
+        assert cache._pool is not None
+    assert cache._pool is None
+    assert cache.get(5, lambda: loader(5)) == 5
+    assert loads == [1, 2, 3, 2, 4, 5]
+
+
+def test_frame_cache_threads():
+    """
+    Tests that a frame that is requested by several threads at the same time is only loaded once
+    """
+
+    loads = []
+
+    def loader():
+        loads.append(1)
+        time.sleep(0.05)
+        return 42
+
+    cache = FrameCache()
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get("frame", loader)))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [42] * 4
+    assert len(loads) == 1
+
+
+def test_load_data(monkeypatch, tracking_instance):
+    """
+    Tests that the frames of consecutive frame pairs are only read once
+    :param monkeypatch: The monkeypatch fixture from pytest to override methods
+    :param tracking_instance: A pytest fixture of an DeltaV2Tracking instance
+    """
+
+    # count the reads of all files
+    reads = []
+    fake_load = io.imread
+
+    def count_load(path):
+        reads.append(path)
+        return fake_load(path)
+
+    monkeypatch.setattr(io, "imread", count_load)
+
+    _, img_prev_frame, _, seg_prev_frame = tracking_instance.load_data(2)
+    img_cur_frame, _, seg_cur_frame, _ = tracking_instance.load_data(1)
+
+    # the second call only reads the first frame
+    assert len(reads) == 6
+    assert sorted(reads) == sorted(tracking_instance.imgs + tracking_instance.segs)
+    assert tracking_instance.frame_cache.hits == 1
+    assert tracking_instance.frame_cache.misses == 3
+
+    # the cached arrays are shared and read-only
+    assert img_cur_frame is img_prev_frame
+    assert not seg_cur_frame.flags.writeable
+    assert np.array_equal(seg_cur_frame, seg_prev_frame)
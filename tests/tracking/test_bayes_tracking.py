@@ -1,11 +1,18 @@
 from pathlib import Path
 
+import h5py
 import numpy as np
 import skimage.io as io
 from pytest import fixture
+from skimage.measure import label
 
-from midap.tracking.bayesian_tracking import BayesianCellTracking
-
+import btrack
+from midap.tracking.bayesian_tracking import (
+    FRAME_PROPERTIES,
+    BayesianCellTracking,
+    get_frame_localizations,
+)
+from midap.tracking.tracking_data import LABEL_DTYPE
 
 # Fixtures
 ##########
@@ -114,3 +121,208 @@ def test_run_model_crop(tracking_instance):
 
     # make sure the labelstack says the same
     assert np.unique(label_stack).size == 3
+
+
+def test_generate_midap_output(tracking_instance):
+    """
+    Tests the conversion of the tracks to the midap data frame with a split event
+    :param tracking_instance: A pytest fixture of an BayesianCellTracking instance
+    """
+
+    # track 1 splits into 2 and 3, the daughter 4 comes before its parent 5, the first step of 2 is a dummy
+    tracks = [
+        {
+            "ID": 1,
+            "parent": 1,
+            "t": [0, 1],
+            "dummy": [False, False],
+            "class_id": [1, 1],
+        },
+        {"ID": 2, "parent": 1, "t": [2, 3], "dummy": [True, False], "class_id": [1, 1]},
+        {
+            "ID": 3,
+            "parent": 1,
+            "t": [2, 3],
+            "dummy": [False, False],
+            "class_id": [2, 2],
+        },
+        {"ID": 4, "parent": 5, "t": [3], "dummy": [False], "class_id": [3]},
+        {
+            "ID": 5,
+            "parent": 5,
+            "t": [0, 1, 2],
+            "dummy": [False] * 3,
+            "class_id": [2] * 3,
+        },
+    ]
+    df, label_stack = tracking_instance.generate_midap_output(tracks=tracks)
+
+    assert len(df) == 9
+    assert list(df.index) == list(range(1, 10))
+    assert df["frame"].tolist() == [0, 1, 3, 2, 3, 3, 0, 1, 2]
+
+    # the split of track 1
+    mother = df[df["trackID"] == 1]
+    assert mother["split"].tolist() == [0, 1]
+    assert (mother["trackID_d1"] == 2).all() and (mother["trackID_d2"] == 3).all()
+    daughters = df[df["trackID"].isin([2, 3])]
+    assert (daughters["trackID_mother"] == 1).all()
+    assert (daughters["lineageID"] == 1).all()
+    assert daughters["first_frame"].tolist() == [2, 2, 2]
+
+    # the parent of track 4 was not known when it was processed
+    assert df.loc[df["trackID"] == 4, "lineageID"].isna().all()
+    assert df.loc[df["trackID"] == 4, "trackID_mother"].isna().all()
+    assert (df.loc[df["trackID"] == 5, "lineageID"] == 2).all()
+    assert df.loc[df["trackID"] == 5, "trackID_d1"].isna().all()
+
+    # the labels are the track IDs
+    assert np.all(np.isin(np.unique(label_stack), [0, 1, 2, 3, 5]))
+
+
+def test_store_lineages(monkeypatch, tmp_path, tracking_instance):
+    """
+    Tests that the output files contain the raw images and that no file is read again
+    :param monkeypatch: The monkeypatch fixture from pytest to override methods
+    :param tmp_path: The tmp_path fixture from pytest
+    :param tracking_instance: A pytest fixture of an BayesianCellTracking instance
+    """
+
+    tracks = tracking_instance.run_model()
+    df, label_stack = tracking_instance.generate_midap_output(tracks=tracks)
+
+    # count the reads of all files
+    reads = []
+    fake_load = io.imread
+
+    def count_load(path):
+        reads.append(path)
+        return fake_load(path)
+
+    monkeypatch.setattr(io, "imread", count_load)
+
+    data_file, _ = tracking_instance.store_lineages(
+        output_folder=tmp_path, df=df, label_stack=label_stack
+    )
+    assert reads == []
+
+    with h5py.File(data_file, "r") as f:
+        images = f["images"][:]
+        assert np.array_equal(f["labels"][:], label_stack)
+    for frame, path in enumerate(tracking_instance.imgs):
+        assert np.array_equal(images[frame], fake_load(path))
+
+
+def test_get_frame_localizations():
+    """
+    Tests that the localizations of a single frame are the same as the ones of btrack
+    """
+
+    rng = np.random.default_rng(42)
+    segmentation = np.zeros((64, 64), dtype=np.int32)
+    segmentation[5:20, 5:10] = 3
+    segmentation[30:40, 20:30] = 7
+    # a label with two separate parts gives two objects
+    segmentation[50:55, 50:55] = 1
+    segmentation[50:55, 60:63] = 1
+    intensity_image = rng.random((64, 64)).astype(np.float32)
+
+    localizations = get_frame_localizations(segmentation, intensity_image, frame=2)
+    objects = btrack.utils.segmentation_to_objects(
+        segmentation=segmentation[None],
+        intensity_image=intensity_image[None],
+        properties=FRAME_PROPERTIES,
+        assign_class_ID=True,
+    )
+
+    assert len(localizations["t"]) == len(objects) == 4
+    for num, obj in enumerate(objects):
+        assert localizations["t"][num] == 2
+        assert localizations["x"][num] == obj.x
+        assert localizations["y"][num] == obj.y
+        assert localizations["class_id"][num] == obj.properties["class_id"]
+        for prop in FRAME_PROPERTIES:
+            assert localizations[prop][num] == obj.properties[prop]
+
+    # empty frames have no localizations
+    assert get_frame_localizations(np.zeros((8, 8)), np.ones((8, 8)), frame=0) == {}
+
+
+def test_num_workers(tmp_path, img1, img2):
+    """
+    Tests that the objects extracted in worker processes are the same as the ones extracted in the main process
+    :param tmp_path: The tmp_path fixture from pytest
+    :param img1: A test image fixture (single cell)
+    :param img2: A test image fixture (two cells)
+    """
+
+    # write the frames with labeled segmentations
+    imgs, segs = [], []
+    for frame, img in enumerate([img1, img1, img2, img2, np.zeros_like(img1)]):
+        imgs.append(str(tmp_path.joinpath(f"img_{frame}.tif")))
+        segs.append(str(tmp_path.joinpath(f"seg_{frame}.tif")))
+        io.imsave(imgs[-1], (img * 0.5 + 0.1).astype(np.float32), check_contrast=False)
+        io.imsave(segs[-1], label(img > 0).astype(np.uint8), check_contrast=False)
+
+    serial = BayesianCellTracking(imgs=imgs, segs=segs, model_weights=None)
+    parallel = BayesianCellTracking(
+        imgs=imgs, segs=segs, model_weights=None, num_workers=2
+    )
+
+    assert serial.num_cells == parallel.num_cells == 6
+    assert np.array_equal(serial.seg_imgs, parallel.seg_imgs)
+    assert serial.localizations.keys() == parallel.localizations.keys()
+    for key, values in serial.localizations.items():
+        assert np.array_equal(values, parallel.localizations[key])
+    assert serial.localizations["t"].tolist() == [0, 1, 2, 2, 3, 3]
+
+
+def test_read_once(monkeypatch, tmp_path, img1, img2):
+    """
+    Tests that every file of a tracking run is read exactly once
+    :param monkeypatch: The monkeypatch fixture from pytest to override methods
+    :param tmp_path: The tmp_path fixture from pytest
+    :param img1: A test image fixture (single cell)
+    :param img2: A test image fixture (two cells)
+    """
+
+    imgs, segs = [], []
+    for frame, img in enumerate([img1, img1, img2, img2]):
+        imgs.append(str(tmp_path.joinpath(f"img_{frame}.tif")))
+        segs.append(str(tmp_path.joinpath(f"seg_{frame}.tif")))
+        io.imsave(imgs[-1], (img * 0.5 + 0.1).astype(np.float32), check_contrast=False)
+        io.imsave(segs[-1], label(img > 0).astype(np.uint8), check_contrast=False)
+
+    # count the reads of all files
+    reads = []
+    imread = io.imread
+
+    def count_load(path):
+        reads.append(path)
+        return imread(path)
+
+    monkeypatch.setattr(io, "imread", count_load)
+
+    tracking = BayesianCellTracking(imgs=imgs, segs=segs, model_weights=None)
+    data_file, _ = tracking.track_all_frames(tmp_path)
+    assert sorted(reads) == sorted(imgs + segs)
+
+    with h5py.File(data_file, "r") as f:
+        for frame, path in enumerate(imgs):
+            assert np.array_equal(f["images"][frame], imread(path))
+
+
+def test_no_frames(tmp_path):
+    """
+    Tests the tracking without frames
+    :param tmp_path: The tmp_path fixture from pytest
+    """
+
+    tracking = BayesianCellTracking(imgs=[], segs=[], model_weights=None)
+    assert tracking.seg_imgs.shape == (0, 0, 0)
+    assert tracking.seg_imgs.dtype == LABEL_DTYPE
+
+    data_file, csv_file = tracking.track_all_frames(tmp_path)
+    with h5py.File(data_file, "r") as f:
+        assert f["labels"].shape == (0, 0, 0)
+        assert f["images"].shape == (0, 0, 0)
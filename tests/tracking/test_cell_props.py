@@ -1,9 +1,28 @@
 import tempfile
 from pathlib import Path
 
+import h5py
+import numpy as np
+import pandas as pd
 import pytest
+from skimage.measure import regionprops
 
-from midap.tracking.cell_props import CellProps
+from midap.tracking import cell_props
+from midap.tracking.cell_props import CellProps, register_cell_property
+
+# Functions
+###########
+
+
+def intensity_sum(regionmask, intensity_image):
+    """
+    A custom cell property, it is defined on module level such that it can be used in a process pool
+    :param regionmask: The mask of the cell
+    :param intensity_image: The intensity image of the cell
+    :return: The sum of the intensities of the cell
+    """
+
+    return np.sum(intensity_image[regionmask])
 
 
 # Fixtures
@@ -49,3 +68,147 @@ def test_cell_props(tmpdir):
         _ = CellProps(csv_file=csv_file, data_file=data_file)
     data_file.touch()
     _ = CellProps(csv_file=csv_file, data_file=data_file)
+
+
+def test_add_cell_probs(tmpdir):
+    """
+    Tests that the properties of every cell end up in the row of its frame and trackID
+    :param tmpdir: A fixture providing a temporary directory
+    """
+
+    # two frames with the track IDs as labels, the second frame is empty
+    labels = np.zeros((2, 16, 16), dtype=np.int32)
+    labels[0, 1:5, 2:8] = 7
+    labels[0, 8:15, 9:12] = 3
+    images = np.random.default_rng(42).random(labels.shape).astype(np.float32)
+    data_file = tmpdir.joinpath("tracking.h5")
+    with h5py.File(data_file, "w") as f:
+        f.create_dataset("labels", data=labels)
+        f.create_dataset("images", data=images)
+
+    # the table is not sorted and has a cell without pixels
+    csv_file = tmpdir.joinpath("track_output.csv")
+    df = pd.DataFrame({"frame": [0, 1, 0], "trackID": [3, 3, 7]})
+    df.index.name = "globalID"
+    df.to_csv(csv_file)
+
+    out_file = tmpdir.joinpath("props.csv")
+    CellProps(csv_file=csv_file, data_file=data_file).add_cell_probs(out_file)
+    out = pd.read_csv(out_file, index_col=0)
+
+    assert list(out["trackID"]) == [3, 3, 7]
+    assert out.columns[-2:].tolist() == ["x", "y"]
+    assert out.loc[1].drop(["globalID", "frame", "trackID"]).isna().all()
+    for row, prop in zip([0, 2], regionprops(labels[0], intensity_image=images[0])):
+        assert out.loc[row, "trackID"] == prop.label
+        assert np.allclose(out.loc[row, ["x", "y"]], prop.centroid)
+        assert np.allclose(
+            out.loc[
+                row,
+                ["edges_min_row", "edges_min_col", "edges_max_row", "edges_max_col"],
+            ],
+            prop.bbox,
+        )
+        assert np.isclose(out.loc[row, "area"], prop.area)
+        assert np.isclose(out.loc[row, "intensity_mean"], prop.intensity_mean)
+        assert np.isclose(out.loc[row, "major_axis_length"], prop.major_axis_length)
+
+    # a cell without a row in the table
+    df.drop(index=2).to_csv(csv_file)
+    with pytest.raises(AssertionError):
+        CellProps(csv_file=csv_file, data_file=data_file).add_cell_probs(out_file)
+
+
+def test_add_cell_probs_empty(tmpdir):
+    """
+    Tests that a tracking without frames gives the empty columns
+    :param tmpdir: A fixture providing a temporary directory
+    """
+
+    data_file = tmpdir.joinpath("tracking.h5")
+    with h5py.File(data_file, "w") as f:
+        f.create_dataset("labels", shape=(0, 16, 16), dtype=np.int32)
+        f.create_dataset("images", shape=(0, 16, 16), dtype=np.float32)
+    csv_file = tmpdir.joinpath("track_output.csv")
+    pd.DataFrame({"frame": [], "trackID": []}).to_csv(
+        csv_file, index=True, index_label="globalID"
+    )
+
+    for num_workers in [1, 2]:
+        out_file = tmpdir.joinpath(f"props_{num_workers}.csv")
+        CellProps(csv_file=csv_file, data_file=data_file).add_cell_probs(
+            out_file, num_workers=num_workers
+        )
+        out = pd.read_csv(out_file, index_col=0)
+        assert len(out) == 0
+        assert out.columns[-2:].tolist() == ["x", "y"]
+
+    assert cell_props.get_chunk_props(
+        data_file, 0, 0, cell_props.CELL_PROPERTIES, {}
+    ).columns.tolist() == ["frame", "trackID"] + [
+        col for columns in cell_props.CELL_PROPERTIES.values() for col in columns
+    ]
+
+
+def test_register_cell_property(tmpdir, monkeypatch):
+    """
+    Tests custom properties of the registry and the properties calculated in a process pool
+    :param tmpdir: A fixture providing a temporary directory
+    :param monkeypatch: The pytest monkeypatch fixture to restore the registry
+    """
+
+    monkeypatch.setattr(cell_props, "CELL_PROPERTIES", dict(cell_props.CELL_PROPERTIES))
+    monkeypatch.setattr(cell_props, "EXTRA_PROPERTIES", {})
+
+    # a custom property needs the name of its function
+    with pytest.raises(ValueError):
+        register_cell_property("sum", func=intensity_sum)
+    register_cell_property("intensity_sum", func=intensity_sum)
+    register_cell_property("eccentricity")
+    register_cell_property("inertia_tensor_eigvals", columns=("eig_0", "eig_1"))
+
+    # five frames with a growing cell that gets a new track ID in every frame
+    labels = np.zeros((5, 16, 16), dtype=np.int32)
+    for frame in range(len(labels)):
+        labels[frame, 2 : 4 + frame, 3:9] = frame + 1
+    images = np.random.default_rng(42).random(labels.shape).astype(np.float32)
+    data_file = tmpdir.joinpath("tracking.h5")
+    with h5py.File(data_file, "w") as f:
+        f.create_dataset("labels", data=labels)
+        f.create_dataset("images", data=images)
+    csv_file = tmpdir.joinpath("track_output.csv")
+    df = pd.DataFrame({"frame": np.arange(5), "trackID": np.arange(1, 6)})
+    df.to_csv(csv_file, index=True, index_label="globalID")
+
+    # serial and parallel give the same table
+    outputs = []
+    for num_workers in [1, 2]:
+        out_file = tmpdir.joinpath(f"props_{num_workers}.csv")
+        CellProps(csv_file=csv_file, data_file=data_file).add_cell_probs(
+            out_file, num_workers=num_workers
+        )
+        outputs.append(out_file.read_text())
+    assert outputs[0] == outputs[1]
+
+    out = pd.read_csv(out_file, index_col=0)
+    assert out.columns[-5:].tolist() == [
+        "y",
+        "intensity_sum",
+        "eccentricity",
+        "eig_0",
+        "eig_1",
+    ]
+    for frame, prop in enumerate(
+        [regionprops(l, intensity_image=i)[0] for l, i in zip(labels, images)]
+    ):
+        assert np.isclose(out.loc[frame, "area"], prop.area)
+        assert np.isclose(out.loc[frame, "intensity_sum"], np.sum(prop.image_intensity))
+        assert np.isclose(out.loc[frame, "eccentricity"], prop.eccentricity)
+        assert np.allclose(
+            out.loc[frame, ["eig_0", "eig_1"]], prop.inertia_tensor_eigvals
+        )
+
+    # the number of columns needs to match the property
+    register_cell_property("inertia_tensor_eigvals")
+    with pytest.raises(ValueError):
+        CellProps(csv_file=csv_file, data_file=data_file).add_cell_probs(out_file)
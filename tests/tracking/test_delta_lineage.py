@@ -1,4 +1,5 @@
 import os
+import sys
 import tempfile
 from pathlib import Path
 
@@ -6,11 +7,11 @@ import h5py
 import numpy as np
 import pandas as pd
 from pytest import fixture, mark
+from skimage import io
 
 from midap.tracking.delta_lineage import DeltaTypeLineages
 from midap.tracking.tracking_analysis import FluoChangeAnalysis
 
-
 # Fixtures
 ##########
 
@@ -44,6 +45,36 @@ def fake_data_output(tracking_instance):
     tmp_dir.cleanup()
 
 
+@fixture()
+def split_lineage():
+    """
+    Creates a fake tracking output of a single cell that splits between the second and the third frame
+    :return: The inputs and results in the format of the DeltaTypeTracking
+    """
+
+    # the segmentations
+    seg_1 = np.zeros((32, 32))
+    seg_1[5:25, 10:15] = 1
+    seg_2 = seg_1.copy()
+    seg_2[14:16] = 0
+
+    inputs = np.zeros((2, 32, 32, 4))
+    results = np.zeros((2, 32, 32, 2))
+
+    # first transition, no split
+    inputs[0, ..., 1] = seg_1
+    inputs[0, ..., 3] = seg_1
+    results[0, ..., 0] = seg_1
+
+    # second transition, split
+    inputs[1, ..., 1] = seg_1
+    inputs[1, ..., 3] = seg_2
+    results[1, :15, :, 0] = seg_2[:15]
+    results[1, 15:, :, 1] = seg_2[15:]
+
+    return inputs, results
+
+
 @fixture()
 def example_data_output():
     """
@@ -75,7 +106,7 @@ def example_data_output():
     lin.track_output.to_csv(out_file)
 
     # save lineage to file
-    raw_inputs = lin.inputs[:, :, :, 0]
+    raw_inputs = np.array([lin.get_input_frame(i)[..., 0] for i in range(lin.n_frames)])
     data_file = os.path.join(tmp_dir.name, "tracking_delta.h5")
     with h5py.File(data_file, "w") as hf:
         hf.create_dataset("images", data=raw_inputs.astype(float), dtype=float)
@@ -137,6 +168,62 @@ def test_fake_lineage(fake_data_output):
     assert np.all(df["trackID_mother"][2:] == np.array([1, 1]))
 
 
+def test_generate_lineages(split_lineage):
+    """
+    Tests the lineage generation without the tracking network
+    :param split_lineage: A fixture with the fake tracking output of a single cell that splits
+    """
+
+    inputs, results = split_lineage
+    lin = DeltaTypeLineages(inputs, results, connectivity=1)
+    df = lin.track_output
+
+    assert np.all(df.index == np.arange(1, 5))
+    assert np.all(df["frame"] == np.array([0, 1, 2, 2]))
+    assert np.all(df["trackID"] == np.array([1, 1, 2, 3]))
+    assert np.all(df["lineageID"] == 1)
+    assert np.all(df["split"] == np.array([0, 1, 0, 0]))
+    assert np.all(df["first_frame"] == np.array([0, 0, 2, 2]))
+    assert np.all(df["last_frame"] == np.array([1, 1, 2, 2]))
+    assert np.all(df["trackID_d1"][:2] == 2)
+    assert np.all(df["trackID_d2"][:2] == 3)
+    assert df["trackID_d1"][2:].isna().all()
+    assert df["trackID_mother"][:2].isna().all()
+    assert np.all(df["trackID_mother"][2:] == 1)
+
+    # the label stack
+    assert np.all(np.unique(lin.label_stack[1]) == np.array([0, 1]))
+    assert np.all(np.unique(lin.label_stack[2]) == np.array([0, 2, 3]))
+
+    # generating the lineages again does not change anything
+    lin.generate_lineages()
+    assert lin.track_output.equals(df)
+
+
+def test_long_lineage():
+    """
+    Tests that a cell can be tracked through more frames than the Python recursion limit
+    """
+
+    n_frames = sys.getrecursionlimit() + 100
+    seg = np.zeros((8, 8))
+    seg[2:6, 3:5] = 1
+
+    inputs = np.zeros((n_frames - 1, 8, 8, 4))
+    inputs[..., 1] = seg
+    inputs[..., 3] = seg
+    results = np.zeros((n_frames - 1, 8, 8, 2))
+    results[..., 0] = seg
+
+    lin = DeltaTypeLineages(inputs, results, connectivity=1)
+    df = lin.track_output
+
+    assert len(df) == n_frames
+    assert np.all(df["trackID"] == 1)
+    assert np.all(df["last_frame"] == n_frames - 1)
+    assert np.all(lin.label_stack[:, 2:6, 3:5] == 1)
+
+
 def test_fluo_change_analysis(example_data_output):
     path = Path(example_data_output).parent
     channels = ["ph", "gfp", "mcherry"]
@@ -162,4 +249,98 @@ def test_fluo_change_analysis(example_data_output):
     ].mean_norm_intensity_gfp.values[0]
     val_img = fca.images_fluo[0][0][fca.labels_ref[0] == 1].mean()
 
-    assert val_df == val_img
+    assert np.isclose(val_df, val_img)
+
+
+def test_add_fluo_intensity():
+    """
+    Tests the mean intensities of all cells against a loop over the cells with duplicate and unmatched rows
+    """
+
+    rng = np.random.default_rng(42)
+    labels = rng.integers(0, 6, size=(3, 16, 16)).astype(np.int32)
+    labels[1] = 0
+    labels[2][labels[2] == 4] = 0
+
+    fca = FluoChangeAnalysis(Path("."), ["ph", "gfp", "mcherry"], "delta")
+    fca.gen_column_names()
+    fca.labels_ref = labels
+    fca.images_fluo = rng.random((2,) + labels.shape).astype(np.float32)
+    fca.images_fluo_raw = rng.integers(0, 2**16, size=(2,) + labels.shape).astype(
+        np.uint16
+    )
+
+    # a cell without pixels, a duplicate row and cells without rows
+    df = pd.DataFrame(
+        {"frame": [2, 0, 1, 2, 0, 2], "trackID": [4, 1, 3, 1, 5, 1]},
+        index=np.arange(10, 16),
+    )
+    for nc in fca.new_columns + fca.new_columns_raw:
+        df[nc] = np.nan
+    df = fca.add_fluo_intensity(df)
+
+    assert df.loc[[10, 12], fca.new_columns + fca.new_columns_raw].isna().all(axis=None)
+    for row in [11, 13, 14, 15]:
+        t = df.loc[row, "frame"]
+        mask = labels[t] == df.loc[row, "trackID"]
+        # the means of all channels are taken at once like in the loop over the cells before
+        assert np.allclose(
+            df.loc[row, fca.new_columns].to_numpy(dtype=float),
+            np.mean(fca.images_fluo[:, t][:, mask], axis=1),
+        )
+        assert np.allclose(
+            df.loc[row, fca.new_columns_raw].to_numpy(dtype=float),
+            np.mean(fca.images_fluo_raw[:, t][:, mask], axis=1),
+        )
+
+    # without frames all intensities are NaN
+    df = fca.add_fluo_intensity(df, frames=[])
+    assert df[fca.new_columns + fca.new_columns_raw].isna().all(axis=None)
+
+
+def test_iter_frames(tmp_path):
+    """
+    Tests that the streamed frames give the same intensities as the loaded images
+    :param tmp_path: The pytest tmp_path fixture
+    """
+
+    rng = np.random.default_rng(42)
+    labels = rng.integers(0, 6, size=(4, 16, 16)).astype(np.int32)
+    fca = FluoChangeAnalysis(tmp_path, ["ph", "gfp", "mcherry"], "delta")
+    fca.gen_pathnames()
+    fca.gen_column_names()
+
+    # the tracking outputs of all channels and the raw counts of the fluorescence channels
+    for path_h5 in [fca.path_ref_h5] + fca.paths_fluo_h5:
+        path_h5.parent.mkdir(parents=True)
+        with h5py.File(path_h5, "w") as f:
+            f.create_dataset("images", data=rng.random(labels.shape))
+            f.create_dataset("labels", data=labels.astype(np.int64))
+    for path_raw in fca.path_fluo_png:
+        path_raw.mkdir()
+        for t in range(len(labels)):
+            io.imsave(
+                path_raw.joinpath(f"frame_{t:03d}.tif"),
+                rng.integers(0, 2**16, size=labels.shape[1:]).astype(np.uint16),
+                check_contrast=False,
+            )
+    df = pd.DataFrame(
+        {"frame": np.repeat(np.arange(4), 5), "trackID": [1, 2, 3, 4, 5] * 4}
+    )
+    df.to_csv(fca.path_ref_csv)
+
+    # the streamed frames are the frames of the loaded images
+    fca.load_images()
+    for t, (l, images, images_raw) in enumerate(fca.iter_frames()):
+        assert l.dtype == fca.labels_ref.dtype and np.array_equal(l, fca.labels_ref[t])
+        assert images.dtype == fca.images_fluo.dtype
+        assert np.array_equal(images, fca.images_fluo[:, t])
+        assert np.array_equal(images_raw, fca.images_fluo_raw[:, t])
+    assert t == len(labels) - 1
+
+    df_loaded = fca.add_fluo_intensity(fca.create_output_df(fca.path_ref_csv))
+    df_streamed = fca.add_fluo_intensity(
+        fca.create_output_df(fca.path_ref_csv), frames=fca.iter_frames()
+    )
+    assert df_loaded.equals(df_streamed)
+    assert not df_streamed[fca.new_columns + fca.new_columns_raw].isna().any(axis=None)
@@ -1,7 +1,14 @@
+import threading
+
 import skimage.io as io
+import h5py
 import numpy as np
+from scipy.ndimage import binary_dilation
+from skimage.measure import label, regionprops
 
+from midap.tracking.base_tracking import read_frame
 from midap.tracking.deltav2_tracking import DeltaV2Tracking
+from midap.tracking.tracking_data import MASK_DTYPE
 from pytest import fixture
 from pathlib import Path
 
@@ -117,3 +124,334 @@ def test_run_model_crop(tracking_instance):
     assert second_res.shape == (512, 512, 2)
     assert second_res[..., 0].sum() != 0
     assert second_res[..., 1].sum() != 0
+
+
+def test_track_all_frames_streaming(monkeypatch, tmp_path, tracking_instance):
+    """
+    Tests that the streaming of the tracking output to a h5 file gives the same lineages as the in-memory tracking
+    :param monkeypatch: The monkeypatch fixture from pytest to override methods
+    :param tmp_path: The tmp_path fixture from pytest to get a temporary directory
+    :param tracking_instance: A pytest fixture of an DeltaV2Tracking instance
+    """
+
+    class FakeModel:
+        def predict(self, x, **kwargs):
+            """
+            Predicts the candidates overlapping with the seed as first daughter
+            """
+            return x[..., 3:4] * x[..., 1:2].max(axis=(1, 2), keepdims=True)
+
+    # the model weights are not needed to compare the outputs
+    monkeypatch.setattr(
+        tracking_instance,
+        "load_model",
+        lambda: setattr(tracking_instance, "model", FakeModel()),
+    )
+
+    outputs = []
+    for streaming in [False, True]:
+        output_folder = tmp_path.joinpath(f"streaming_{streaming}")
+        output_folder.mkdir()
+        data_file, csv_file = tracking_instance.track_all_frames(
+            output_folder, streaming=streaming
+        )
+        outputs.append((data_file, csv_file))
+
+    # the intermediate results are only written to the h5 file
+    assert tmp_path.joinpath("streaming_True", "inputs_results_all_red.h5").exists()
+    assert not tmp_path.joinpath("streaming_True", "results_all_red.npz").exists()
+
+    # the lineages are the same
+    (data_mem, csv_mem), (data_stream, csv_stream) = outputs
+    assert Path(csv_mem).read_text() == Path(csv_stream).read_text()
+    with h5py.File(data_mem, "r") as f_mem, h5py.File(data_stream, "r") as f_stream:
+        for key in ["images", "labels"]:
+            assert np.array_equal(f_mem[key][:], f_stream[key][:])
+
+
+def test_track_all_frames_single_frame(monkeypatch, tmp_path, tracking_instance):
+    """
+    Tests that the streaming creates the datasets of the tracking output even if there is no frame pair
+    :param monkeypatch: The monkeypatch fixture from pytest to override methods
+    :param tmp_path: The tmp_path fixture from pytest to get a temporary directory
+    :param tracking_instance: A pytest fixture of an DeltaV2Tracking instance
+    """
+
+    class FakeModel:
+        def predict(self, x, **kwargs):
+            """
+            Predicts the candidates
+            """
+            return x[..., 3:4]
+
+    monkeypatch.setattr(
+        tracking_instance,
+        "load_model",
+        lambda: setattr(tracking_instance, "model", FakeModel()),
+    )
+
+    # a single frame
+    tracking_instance.imgs = tracking_instance.imgs[:1]
+    tracking_instance.segs = tracking_instance.segs[:1]
+    tracking_instance.num_time_steps = 1
+
+    data_file, csv_file = tracking_instance.track_all_frames(tmp_path, streaming=True)
+    assert data_file is None and csv_file is None
+    with h5py.File(tmp_path.joinpath("inputs_results_all_red.h5"), "r") as f:
+        assert f["inputs_all_red"].shape == (0, 512, 512, 4)
+        assert f["results_all_red"].shape == (0, 512, 512, 2)
+
+
+def test_get_label_table(tracking_instance):
+    """
+    Tests that the vectorized cell properties are the same as the ones of regionprops
+    :param tracking_instance: A pytest fixture of an DeltaV2Tracking instance
+    """
+
+    # random blobs of different shapes
+    rng = np.random.default_rng(42)
+    seg = binary_dilation(rng.random((128, 96)) > 0.99, iterations=3)
+    label_img = label(seg, connectivity=1)
+
+    props = tracking_instance.get_label_table(label_img)
+    regions = regionprops(label_img)
+    assert len(props["area"]) == len(regions)
+    for num, r in enumerate(regions):
+        assert props["area"][num] == r.area
+        assert tuple(props["bbox"][num]) == r.bbox
+        assert tuple(props["centroid"][num]) == r.centroid
+        assert np.isclose(props["axis_major_length"][num], r.axis_major_length)
+
+
+def test_clean_crop(tracking_instance):
+    """
+    Tests that the cells that are cut by the crop are removed
+    :param tracking_instance: A pytest fixture of an DeltaV2Tracking instance
+    """
+
+    label_img = np.zeros((64, 64), dtype=int)
+    label_img[2:10, 2:10] = 1
+    label_img[20:30, 20:24] = 2
+    label_img[28:40, 30:34] = 3
+
+    props = tracking_instance.get_label_table(label_img)
+    crop_box = (16, 16, 32, 48)
+    seg_crop = label_img[16:32, 16:48]
+    seg_clean = tracking_instance.clean_crop(
+        bboxes=props["bbox"], seg_crops=seg_crop[None], crop_boxes=np.array([crop_box])
+    )[0]
+
+    # only the second cell is completely inside the crop
+    assert seg_clean.dtype == bool
+    assert np.array_equal(seg_clean, seg_crop == 2)
+
+
+def test_extract_crops(tracking_instance):
+    """
+    Tests that the crops of all cells are extracted at the right positions
+    :param tracking_instance: A pytest fixture of an DeltaV2Tracking instance
+    """
+
+    rng = np.random.default_rng(42)
+    image = rng.random((512, 512, 4))
+    n_rows, n_cols = tracking_instance.input_size[:2]
+
+    # centroids in the middle and close to the borders
+    centroids = np.array([[256.0, 256.0], [3.5, 500.2], [510.0, 10.0]])
+    crop_boxes = tracking_instance.get_crop_boxes(
+        centroids=centroids, frame_shape=image.shape[:2]
+    )
+    crops = tracking_instance.extract_crops(image, crop_boxes=crop_boxes)
+    assert crops.shape == (3, n_rows, n_cols, 4)
+
+    for (row, col), crop_box, crop in zip(centroids, crop_boxes, crops):
+        min_row = min(max(0, int(row - n_rows / 2)), image.shape[0] - n_rows)
+        min_col = min(max(0, int(col - n_cols / 2)), image.shape[1] - n_cols)
+        assert tuple(crop_box) == (min_row, min_col, min_row + n_rows, min_col + n_cols)
+        assert np.array_equal(
+            crop, image[min_row : min_row + n_rows, min_col : min_col + n_cols]
+        )
+
+
+def test_transfer_results(tracking_instance):
+    """
+    Tests that the candidates are assigned to the cells with the largest overlap and that a candidate that was
+    already assigned to a previous cell is not reassigned
+    :param tracking_instance: A pytest fixture of an DeltaV2Tracking instance
+    """
+
+    label_frame = np.zeros((32, 32), dtype=int)
+    label_frame[2:10, 2:6] = 1
+    label_frame[12:20, 2:6] = 2
+    label_frame[2:10, 20:24] = 3
+
+    # all cells are inside both crops
+    crop_boxes = np.array([[0, 0, 32, 32], [0, 0, 32, 32]])
+    inp = np.zeros((2, 32, 32, 4), dtype=np.float32)
+    inp[..., 3] = label_frame > 0
+    res = np.zeros((2, 32, 32, 1), dtype=np.float32)
+
+    # the first cell divides into the cells 1 and 2, cell 2 has the larger overlap
+    res[0, 2:5, 2:6] = 1.0
+    res[0, 12:20, 2:6] = 1.0
+    # the second cell overlaps mostly with cell 1 that is already taken and a bit with cell 3
+    res[1, 2:10, 2:6] = 1.0
+    res[1, 2:4, 20:24] = 1.0
+
+    target = tracking_instance.transfer_results(
+        full_shape=(32, 32, 2),
+        inp=inp,
+        res=res,
+        crop_boxes=crop_boxes,
+        label_frame=label_frame,
+    )
+
+    # the largest overlap goes into the first channel
+    assert np.all(target[label_frame == 2, 0] == 1)
+    assert np.all(target[label_frame == 1, 1] == 1)
+    # the second cell only gets cell 3 in the first channel
+    assert np.all(target[label_frame == 3, 0] == 2)
+    assert np.all(target[label_frame == 3, 1] == 0)
+    assert np.all(target[label_frame == 0] == 0)
+
+
+def test_estimate_input_size(monkeypatch, tracking_instance):
+    """
+    Tests that the input size is chosen before the tracking and that the model is only built once
+    :param monkeypatch: The monkeypatch fixture from pytest to override methods
+    :param tracking_instance: A pytest fixture of an DeltaV2Tracking instance
+    """
+
+    class FakeModel:
+        def __init__(self, input_size):
+            self.input_size = input_size
+
+        def predict(self, x, **kwargs):
+            """
+            Checks the input size and predicts the candidates
+            """
+            assert x.shape[1:] == self.input_size
+            return x[..., 3:4]
+
+    built = []
+
+    def fake_load_model():
+        # keras models are only built in the main thread
+        assert threading.current_thread() is threading.main_thread()
+        built.append(tracking_instance.input_size)
+        tracking_instance.model = FakeModel(tracking_instance.input_size)
+
+    monkeypatch.setattr(tracking_instance, "load_model", fake_load_model)
+
+    # the cells are longer than the default crops
+    input_size = tracking_instance.estimate_input_size()
+    assert input_size[0] > 32 and input_size[0] % 32 == 0
+    assert input_size[0] == input_size[1]
+
+    # the time estimate and the tracking use the same model
+    tracking_instance.check_process_time()
+    inputs, results = tracking_instance.run_model_crop()
+    assert len(results) == 2
+    assert built == [input_size]
+
+
+def test_predict_frames(monkeypatch, tracking_instance):
+    """
+    Tests that every frame is loaded once and that the crops of several frames are predicted together
+    :param monkeypatch: The monkeypatch fixture from pytest to override methods
+    :param tracking_instance: A pytest fixture of an DeltaV2Tracking instance
+    """
+
+    batches = []
+
+    class FakeModel:
+        def predict(self, x, **kwargs):
+            """
+            Records the number of crops and predicts the candidates
+            """
+            batches.append(len(x))
+            return x[..., 3:4]
+
+    monkeypatch.setattr(
+        tracking_instance,
+        "load_model",
+        lambda: setattr(tracking_instance, "model", FakeModel()),
+    )
+
+    # count the reads of all files, including the pre-pass
+    reads = []
+    fake_load = io.imread
+
+    def count_load(path):
+        reads.append(path)
+        return fake_load(path)
+
+    monkeypatch.setattr(io, "imread", count_load)
+
+    # every frame pair has a single cell, so both frames go into one batch
+    inputs, results = tracking_instance.run_model_crop(batch_size=2)
+    assert batches == [2]
+    assert len(results) == 2
+    assert sorted(reads) == sorted(tracking_instance.imgs + tracking_instance.segs)
+
+    # the segmentations of the pre-pass are the same as the read ones
+    for frame in range(tracking_instance.num_time_steps):
+        _, seg = tracking_instance._read_frame(frame)
+        assert seg.dtype == MASK_DTYPE
+        _, seg_read = read_frame(
+            img_file=tracking_instance.imgs[frame],
+            seg_file=tracking_instance.segs[frame],
+            target_size=tracking_instance.target_size,
+        )
+        assert np.array_equal(seg, seg_read)
+
+
+def test_empty_frame(monkeypatch, tracking_instance):
+    """
+    Tests that frames without cells are tracked without crops
+    :param monkeypatch: The monkeypatch fixture from pytest to override methods
+    :param tracking_instance: A pytest fixture of an DeltaV2Tracking instance
+    """
+
+    class FakeModel:
+        def predict(self, x, **kwargs):
+            """
+            Predicts the candidates
+            """
+            return x[..., 3:4]
+
+    monkeypatch.setattr(
+        tracking_instance,
+        "load_model",
+        lambda: setattr(tracking_instance, "model", FakeModel()),
+    )
+
+    # the second frame has no cells
+    fake_load = io.imread
+
+    def empty_load(path):
+        img = fake_load(path)
+        return np.zeros_like(img) if "frame2" in path else img
+
+    monkeypatch.setattr(io, "imread", empty_load)
+
+    # the frame pairs with an empty frame have no crops
+    inputs, results = tracking_instance.run_model_crop()
+    assert len(inputs) == 2 and len(results) == 2
+    assert not np.any(results)
+
+    # the crop sizes are also checked without the pre-pass
+    img, seg = tracking_instance.load_frame(0)
+    empty = np.zeros_like(seg)
+    for seg_prev, seg_cur, num_crops in [
+        (seg, empty, 1),
+        (empty, seg, 0),
+        (empty, empty, 0),
+    ]:
+        crops, *_ = tracking_instance.crop_frame_pair(
+            img_cur_frame=img,
+            img_prev_frame=img,
+            seg_cur_frame=seg_cur,
+            seg_prev_frame=seg_prev,
+        )
+        assert len(crops) == num_crops
@@ -0,0 +1,42 @@
+import numpy as np
+import skimage.io as io
+
+from midap.tracking.strack.strack_script import run_strack
+from midap.tracking.strack_lineages import STrackLineage
+
+# Tests
+#######
+
+
+def test_create_lineage_dicts(tmp_path):
+    """
+    Tests that the lineage dicts are the same for links in memory and links read from the tracking tables
+    :param tmp_path: The tmp_path fixture from pytest
+    """
+
+    # a cell that splits and a new cell
+    segs = np.zeros((3, 64, 64), dtype=np.uint16)
+    segs[:2, 10:30, 10:14] = 1
+    segs[2, 10:19, 10:14] = 1
+    segs[2, 21:30, 10:14] = 2
+    segs[2, 50:55, 50:55] = 3
+    imgs = (segs > 0).astype(np.float32)
+
+    files = []
+    for frame, seg in enumerate(segs):
+        files.append(tmp_path.joinpath(f"seg_{frame}.tif"))
+        io.imsave(files[-1], seg, check_contrast=False)
+
+    output_dir = tmp_path.joinpath("STrack")
+    output_dir.mkdir()
+    links = run_strack(files, output_dir, max_dist=20.0, save_tables=True)
+
+    in_memory = STrackLineage(tmp_path, imgs=imgs, segs=segs, links=links)
+    from_tables = STrackLineage(tmp_path, imgs=imgs, segs=segs)
+    assert in_memory.n_frames == from_tables.n_frames == 3
+
+    lineage_dicts = in_memory.create_lineage_dicts()
+    assert lineage_dicts == from_tables.create_lineage_dicts()
+    assert lineage_dicts[0] == {1: [1]}
+    # STrack does not add the new cell to the table because there are no mothers left
+    assert lineage_dicts[1] == {1: [1, 2]}
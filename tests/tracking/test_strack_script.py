@@ -0,0 +1,163 @@
+import cv2
+import numpy as np
+import pandas as pd
+import skimage.io as io
+from scipy.ndimage import find_objects
+from scipy.spatial.distance import cdist
+from skimage.draw import ellipse
+from skimage.measure import regionprops
+
+from midap.tracking.strack.strack_script import (
+    get_cell_properties,
+    get_frame_links,
+    get_matching_percentages,
+    get_orientation,
+    get_tracking_table,
+    run_strack,
+)
+
+# Tests
+#######
+
+
+def test_cell_properties():
+    """
+    Tests the properties of all cells against the computation mask by mask of the original STrack script
+    """
+
+    # two frames with rotated cells and labels that are not contiguous
+    rng = np.random.default_rng(42)
+    imgs = []
+    for _ in range(2):
+        img = np.zeros((128, 128), dtype=np.uint16)
+        for cell_label in rng.choice(np.arange(1, 100), size=20, replace=False):
+            rr, cc = ellipse(
+                *rng.uniform(10, 118, size=2),
+                rng.uniform(4, 12),
+                3.5,
+                shape=img.shape,
+                rotation=rng.uniform(-np.pi, np.pi),
+            )
+            img[rr, cc] = cell_label
+        imgs.append(img)
+
+    props = [get_cell_properties(img) for img in imgs]
+    for img, (inverse, centroids, areas) in zip(imgs, props):
+        unique, counts = np.unique(img, return_counts=True)
+        assert np.array_equal(unique[inverse], img)
+        assert np.array_equal(areas, counts[1:])
+        for num, mask_tmp in enumerate(unique[1:]):
+            img_tmp = np.where(img != mask_tmp, 0, img)
+            M = cv2.moments(img_tmp)
+            assert centroids[num, 0] == int(M["m10"] / M["m00"])
+            assert centroids[num, 1] == int(M["m01"] / M["m00"])
+            orientation = regionprops((img_tmp != 0).astype(np.uint8))[0].orientation
+            mask = inverse == num + 1
+            assert get_orientation(mask) == np.degrees(orientation)
+            assert get_orientation(mask[find_objects(mask)[0]]) == np.degrees(
+                orientation
+            )
+
+    # the matching percentages of all cells that are close enough
+    dist_mat = cdist(props[0][1], props[1][1])
+    rows, cols, pctgs = get_matching_percentages(
+        props[0][0], props[1][0], props[1][2], dist_mat=dist_mat, max_dist=30.0
+    )
+    matching_pctgs = np.zeros_like(dist_mat)
+    matching_pctgs[rows, cols] = pctgs
+    for mother in range(dist_mat.shape[0]):
+        for daughter in range(dist_mat.shape[1]):
+            mask0 = props[0][0] == mother + 1
+            mask1 = props[1][0] == daughter + 1
+            pctg = 0
+            if dist_mat[mother, daughter] <= 30:
+                pctg = np.sum(mask0 & mask1) / np.sum(mask1) * 100
+            assert matching_pctgs[mother, daughter] == pctg
+
+
+def test_get_frame_links():
+    """
+    Tests the links between two frames with a split, a moved cell and a new cell
+    """
+
+    img0 = np.zeros((64, 64), dtype=np.uint16)
+    img1 = np.zeros_like(img0)
+    # the mother splits along its main axis
+    img0[10:30, 10:14] = 5
+    img1[10:19, 10:14] = 2
+    img1[21:30, 10:14] = 3
+    # a cell that moved
+    img0[40:50, 40:44] = 9
+    img1[41:51, 41:45] = 4
+    # a new cell
+    img1[5:9, 55:60] = 7
+
+    table = get_tracking_table(
+        get_frame_links(img0, img1, tp=3, max_dist=20.0, max_angle=30.0)
+    )
+
+    # the mask numbers are the positions in the sorted labels
+    assert table.index.tolist() == [1, 2, 3, 4]
+    assert (table["Timepoint"] == 3).all()
+    assert table["Mask_nb"].tolist() == [1, 2, 3, 4]
+    assert table["Mother_mask"].tolist() == [1, 1, 2, 0]
+    assert table["Pctg_matching"].tolist() == [100.0, 100.0, 67.5, 0.0]
+    assert table["Centroid_x"].tolist() == [11, 11, 42, 57]
+    assert table["Centroid_y"].tolist() == [14, 25, 45, 6]
+    assert table["Centroid_x_mother"].tolist() == [11, 11, 41, 57]
+    assert table["Centroid_y_mother"].tolist() == [19, 19, 44, 6]
+    assert table["Distance_to_mother"].tolist()[:3] == [5.0, 6.0, np.sqrt(2)]
+
+    # the new cell is close enough to be the second daughter of the moved cell
+    table = get_tracking_table(
+        get_frame_links(img0, img1, tp=3, max_dist=50.0, max_angle=30.0)
+    )
+    assert table["Mother_mask"].tolist() == [1, 1, 2, 2]
+
+    # no cells
+    table = get_frame_links(
+        img0, np.zeros_like(img1), tp=3, max_dist=50.0, max_angle=30.0
+    )
+    assert len(table) == 0
+
+
+def test_run_strack(tmp_path):
+    """
+    Tests that the links are returned in memory and that the tables and figures are only written on request
+    :param tmp_path: The tmp_path fixture from pytest
+    """
+
+    # a cell that moves and splits
+    files = []
+    for frame in range(3):
+        img = np.zeros((64, 64), dtype=np.uint16)
+        if frame < 2:
+            img[10 + frame : 30 + frame, 10:14] = 1
+        else:
+            img[11:20, 10:14] = 1
+            img[22:31, 10:14] = 2
+        files.append(tmp_path.joinpath(f"seg_{frame}.tif"))
+        io.imsave(files[-1], img, check_contrast=False)
+
+    links = run_strack(files, max_dist=50.0, max_angle=30.0)
+    assert len(links) == 2
+    assert links[0].tolist() == [[1, 1]]
+    assert links[1].tolist() == [[1, 1], [2, 1]]
+    assert len(list(tmp_path.glob("tracking_*"))) == 0
+
+    # the frame pairs can be processed in worker processes
+    parallel_links = run_strack(files, max_dist=50.0, max_angle=30.0, num_workers=2)
+    for frame_links, frame_parallel_links in zip(links, parallel_links):
+        assert np.array_equal(frame_links, frame_parallel_links)
+
+    # the tables contain the same links
+    output_dir = tmp_path.joinpath("STrack")
+    output_dir.mkdir()
+    run_strack(files, output_dir, max_dist=50.0, max_angle=30.0, save_tables=True)
+    assert len(list(output_dir.glob("tracking_figure_*.png"))) == 0
+    for tp, frame_links in enumerate(links, start=1):
+        table = pd.read_csv(output_dir.joinpath(f"tracking_table_time{tp}.csv"))
+        assert (
+            table[["Mask_nb", "Mother_mask"]].to_numpy().tolist()
+            == frame_links.tolist()
+        )
@@ -0,0 +1,109 @@
+import h5py
+import numpy as np
+import pytest
+
+from midap.tracking import tracking_data
+from midap.tracking.tracking_data import (
+    FRAME_LABEL_DTYPE,
+    IMAGE_DTYPE,
+    LABEL_DTYPE,
+    create_frame_dataset,
+    get_frame_label_dtype,
+    load_tracking_data,
+)
+
+# Tests
+#######
+
+
+def test_get_frame_label_dtype():
+    """
+    Tests the selection of the dtype for the labels of a single frame
+    """
+
+    assert get_frame_label_dtype(0) == FRAME_LABEL_DTYPE
+    assert get_frame_label_dtype(2**16 - 1) == FRAME_LABEL_DTYPE
+    assert get_frame_label_dtype(2**16) == LABEL_DTYPE
+
+
+def test_load_tracking_data(tmp_path):
+    """
+    Tests that tracking files written with the old float64/int64 dtypes are loaded with the current dtypes
+    :param tmp_path: The tmp_path fixture from pytest to get a temporary directory
+    """
+
+    images = np.random.default_rng(42).random((3, 16, 16))
+    labels = np.zeros((3, 16, 16), dtype=np.int64)
+    labels[:, 4:8, 4:8] = [[[1]], [[2]], [[3]]]
+
+    data_file = tmp_path.joinpath("tracking_delta.h5")
+    with h5py.File(data_file, "w") as hf:
+        hf.create_dataset("images", data=images, dtype=float)
+        hf.create_dataset("labels", data=labels, dtype=int)
+
+    loaded_images, loaded_labels = load_tracking_data(data_file)
+    assert loaded_images.dtype == IMAGE_DTYPE
+    assert loaded_labels.dtype == LABEL_DTYPE
+    assert np.allclose(loaded_images, images)
+    assert np.array_equal(loaded_labels, labels)
+
+    # only a selection of frames
+    loaded_images, loaded_labels = load_tracking_data(data_file, frames=slice(1, 3))
+    assert loaded_images.shape == (2, 16, 16)
+    assert np.array_equal(loaded_labels, labels[1:3])
+
+
+@pytest.mark.parametrize("compression", [None, "gzip", "lzf"])
+def test_create_frame_dataset(tmp_path, compression):
+    """
+    Tests the layout of the datasets of the tracking output files
+    :param tmp_path: The tmp_path fixture from pytest to get a temporary directory
+    :param compression: The compression to test
+    """
+
+    # a sparse label stack
+    labels = np.zeros((4, 64, 64), dtype=LABEL_DTYPE)
+    labels[:, 10:20, 10:30] = np.arange(1, 5)[:, None, None]
+
+    data_file = tmp_path.joinpath("tracking_delta.h5")
+    with h5py.File(data_file, "w") as hf:
+        dset = create_frame_dataset(
+            hf,
+            "labels",
+            shape=labels.shape,
+            dtype=LABEL_DTYPE,
+            data=labels,
+            compression=compression,
+        )
+        if compression is None:
+            # the old contiguous layout
+            assert dset.chunks is None
+            assert dset.compression is None
+        else:
+            # every frame is a chunk
+            assert dset.chunks == (1, 64, 64)
+            assert dset.compression == compression
+            assert dset.id.get_storage_size() < labels.nbytes
+
+    with h5py.File(data_file, "r") as hf:
+        assert np.array_equal(hf["labels"][2], labels[2])
+
+
+def test_create_frame_dataset_errors(tmp_path, monkeypatch):
+    """
+    Tests the errors for unknown and unavailable compressions
+    :param tmp_path: The tmp_path fixture from pytest to get a temporary directory
+    :param monkeypatch: The monkeypatch fixture from pytest to override the optional dependency
+    """
+
+    with h5py.File(tmp_path.joinpath("tracking_delta.h5"), "w") as hf:
+        with pytest.raises(ValueError):
+            create_frame_dataset(
+                hf, "labels", shape=(2, 4, 4), dtype=LABEL_DTYPE, compression="zip"
+            )
+
+        monkeypatch.setattr(tracking_data, "hdf5plugin", None)
+        with pytest.raises(ImportError):
+            create_frame_dataset(
+                hf, "labels", shape=(2, 4, 4), dtype=LABEL_DTYPE, compression="blosc"
+            )